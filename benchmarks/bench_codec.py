@@ -0,0 +1,54 @@
+# benchmarks/bench_codec.py
+"""
+core.codec vs the original core.encryption routines: times long inputs and a
+bulk profile read. That both give identical results on stored values is
+checked by core.tests.CodecEquivalenceTests (manage.py test core).
+
+    python benchmarks/bench_codec.py --profiles 2000
+"""
+import argparse, pathlib, random, sys, time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from core import codec, encryption as legacy  # noqa: E402
+
+FIELDS = 6   # chest, waist, hip, inseam, height, weight
+
+
+def _timed(fn, values, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for v in values:
+            fn(v)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--profiles", type=int, default=2000)
+    ap.add_argument("--lengths", type=int, nargs="+", default=[8, 100, 1000, 3000])
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    print(f"{'length':>8} {'legacy enc':>12} {'codec enc':>12} {'legacy dec':>12} {'codec dec':>12}")
+    for n in args.lengths:
+        plain = "".join(rng.choice("0123456789") for _ in range(n))
+        stored = legacy.encrypt(plain)
+        row = [
+            _timed(legacy.encrypt, [plain]), _timed(codec.encrypt, [plain], 5),
+            _timed(legacy.decrypt, [stored]), _timed(codec.decrypt, [stored], 5),
+        ]
+        print(f"{n:>8} " + " ".join(f"{t * 1e3:>10.3f}ms" for t in row))
+
+    # a bulk read: every measurement column of every profile
+    stored = [legacy.encrypt(f"{rng.uniform(20, 80):.0f}") for _ in range(args.profiles * FIELDS)]
+    t_legacy = _timed(legacy.decrypt, stored)
+    t_codec = _timed(codec.decrypt, stored, 3)
+    print(f"bulk read of {args.profiles} profiles x {FIELDS} fields: "
+          f"legacy {t_legacy * 1e3:.1f} ms, codec {t_codec * 1e3:.1f} ms ({t_legacy / t_codec:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
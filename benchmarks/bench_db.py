@@ -0,0 +1,136 @@
+# benchmarks/bench_db.py
+"""
+Concurrent request-shaped DB load, with and without the connection tuning in
+emergrade/db.py. Each simulated request fires request_started/request_finished
+(so CONN_MAX_AGE applies as it does in a view), reads a user and, for a share of
+requests, writes inside a transaction the way profile saves and the outbox do.
+
+    python benchmarks/bench_db.py --threads 8 --requests 300 --write-ratio 0.3
+    DATABASE_URL=postgres://... python benchmarks/bench_db.py
+
+SQLite runs on throwaway copies of a freshly migrated database in a temp dir.
+"plain" is what settings used to give: a new connection per request, rollback
+journal, FULL sync, no busy wait beyond the driver default.
+"""
+import argparse, copy, os, pathlib, random, shutil, statistics, sys, tempfile, threading, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+TMP = pathlib.Path(tempfile.mkdtemp(prefix="bench_db_"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TMP / 'template.sqlite3'}")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "emergrade.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.core.signals import request_finished, request_started  # noqa: E402
+from django.db import OperationalError, connection, connections, transaction  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+
+from core.models import OutboundEmail, User  # noqa: E402
+from emergrade.db import sqlite_pragmas  # noqa: E402
+
+SQLITE = connection.vendor == "sqlite"
+TUNED = copy.deepcopy(connections.settings["default"])
+
+
+def _configure(mode, db_file=None):
+    """Point new connections at `db_file` (SQLite) with tuned or plain settings."""
+    connections.close_all()
+    # every thread's DatabaseWrapper shares this dict, so editing it in place is enough
+    cfg = connections.settings["default"]
+    cfg.clear()
+    cfg.update(copy.deepcopy(TUNED))
+    connection_created.disconnect(dispatch_uid="emergrade-sqlite-pragmas")
+    if mode == "tuned":
+        connection_created.connect(sqlite_pragmas, dispatch_uid="emergrade-sqlite-pragmas")
+    else:
+        cfg.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False, OPTIONS={})
+    if db_file:
+        cfg["NAME"] = str(db_file)
+
+
+def _request(rng, user_ids, write_ratio):
+    request_started.send(sender=None)
+    try:
+        User.objects.filter(pk=rng.choice(user_ids)).first()
+        if rng.random() < write_ratio:
+            with transaction.atomic():
+                OutboundEmail.objects.create(subject="bench", body="x" * 200, from_email="a@b.c", to=["d@e.f"])
+                User.objects.filter(pk=rng.choice(user_ids)).update(last_login=None)
+    finally:
+        request_finished.send(sender=None)
+
+
+def run(mode, args, template):
+    db_file = None
+    if SQLITE:
+        db_file = TMP / f"{mode}.sqlite3"
+        shutil.copy(template, db_file)
+    _configure(mode, db_file)
+    if SQLITE and mode == "plain":
+        # WAL is a property of the file; make sure the plain copy isn't using it
+        with connection.cursor() as c:
+            c.execute("PRAGMA journal_mode = DELETE")
+        connection.close()
+    user_ids = list(User.objects.values_list("pk", flat=True))
+    connection.close()
+
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        mine = []
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            try:
+                _request(rng, user_ids, args.write_ratio)
+            except OperationalError:   # "database is locked"
+                with lock:
+                    errors[0] += 1
+                continue
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+        connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else float("nan")
+    print(f"{mode:>6} {len(latencies) / wall:>10.0f} {statistics.median(latencies) * 1e3:>9.2f}ms "
+          f"{p95 * 1e3:>9.2f}ms {errors[0]:>7}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=300, help="per thread")
+    ap.add_argument("--write-ratio", type=float, default=0.3)
+    ap.add_argument("--users", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    call_command("migrate", verbosity=0)
+    if not User.objects.exists():
+        User.objects.bulk_create(User(email=f"bench{i}@example.com") for i in range(args.users))
+    template = pathlib.Path(connection.settings_dict["NAME"]) if SQLITE else None
+    connection.close()
+
+    print(f"{connection.vendor}, {args.threads} threads x {args.requests} requests, "
+          f"{args.write_ratio:.0%} writes")
+    print(f"{'mode':>6} {'req/s':>10} {'p50':>11} {'p95':>11} {'locked':>7}")
+    try:
+        for mode in ("plain", "tuned"):
+            run(mode, args, template)
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_scheduler.py
+"""
+Per-session compute_band_powers vs one batched BandPowerScheduler tick, for
+many concurrent headsets. Checks every session gets the same band powers
+either way, then times a tick at each session count.
+
+    python benchmarks/bench_scheduler.py --sessions 1 10 100 500
+"""
+import argparse, asyncio, pathlib, sys, time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from impulse_monitoring import utils  # noqa: E402
+from impulse_monitoring.scheduler import BandPowerScheduler  # noqa: E402
+
+
+def _setup(rng, n_sessions, fs, channels):
+    sched = BandPowerScheduler(fs=fs)
+    got = {}
+    for i in range(n_sessions):
+        sched.add_session(i, channels, lambda p, i=i: got.__setitem__(i, p))
+        sched.push(i, rng.normal(800, 20, (fs, channels)))
+    return sched, got
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100, 500])
+    ap.add_argument("--fs", type=int, default=256)
+    ap.add_argument("--channels", type=int, default=4)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    fs, ch = args.fs, args.channels
+
+    sched, got = _setup(rng, 50, fs, ch)
+    asyncio.run(sched.tick())
+    worst = max(
+        float(np.abs(got[i] - utils.compute_band_powers(s.buffer, fs)).max())
+        for i, s in sched.sessions.items()
+    )
+    print(f"equivalence: max |log10 power difference| = {worst:.2e}")
+    assert worst < 1e-9, worst
+
+    print(f"{'sessions':>9} {'per-session':>13} {'batched':>11} {'speedup':>8}")
+    for n in args.sessions:
+        sched, _ = _setup(rng, n, fs, ch)
+        buffers = [s.buffer for s in sched.sessions.values()]
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            for b in buffers:
+                utils.compute_band_powers(b, fs)
+        t_each = (time.perf_counter() - t0) / args.repeat
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            for s in sched.sessions.values():
+                s.pending_since = 0.0
+            sched.compute()
+        t_batch = (time.perf_counter() - t0) / args.repeat
+        print(f"{n:>9} {t_each * 1e3:>11.2f}ms {t_batch * 1e3:>9.2f}ms {t_each / t_batch:>7.1f}x")
+    print("metrics after last run:", sched.metrics())
+
+
+if __name__ == "__main__":
+    main()
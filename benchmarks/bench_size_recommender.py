@@ -0,0 +1,83 @@
+# benchmarks/bench_size_recommender.py
+"""
+Latency per recommendation for the size recommender, scalar vs batch, over
+large synthetic charts. Runs offline; no Django needed.
+
+    python benchmarks/bench_size_recommender.py --charts 2000 --sizes 12 --users 500
+"""
+import argparse, pathlib, random, sys, time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from vton.services.size_recommender import (  # noqa: E402
+    ProductChart, SizeRow, USER_COLUMNS, compile_charts, recommend_size, recommend_sizes_batch,
+)
+
+CATEGORIES = ["top_knit", "top_woven", "shirt", "pants", "jeans", "skirt", "dress"]
+
+
+def synthetic_charts(n_charts, n_sizes, rng):
+    charts = []
+    for i in range(n_charts):
+        base = rng.uniform(-4, 4)
+        sizes = [
+            SizeRow(
+                label=f"S{j}", chest=84 + 5 * j + base, shoulder=37 + 1.2 * j,
+                waist=66 + 5 * j + base, hip=88 + 5 * j + base, inseam=74 + 0.8 * j,
+            )
+            for j in range(n_sizes)
+        ]
+        charts.append(ProductChart(
+            sku=f"sku{i}", name=f"Product {i}", category=rng.choice(CATEGORIES),
+            stretch=rng.random() < 0.5, units="cm", sizes=sizes,
+        ))
+    return charts
+
+
+def synthetic_users(n_users, rng):
+    return np.array([
+        [rng.uniform(80, 120), rng.uniform(36, 48), rng.uniform(62, 105),
+         rng.uniform(85, 125), rng.uniform(68, 86), rng.uniform(150, 200)]
+        for _ in range(n_users)
+    ])
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--charts", type=int, default=2000)
+    ap.add_argument("--sizes", type=int, default=12)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--scalar-users", type=int, default=20, help="users to time on the scalar path")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    charts = synthetic_charts(args.charts, args.sizes, rng)
+    users = synthetic_users(args.users, rng)
+
+    t0 = time.perf_counter()
+    index = compile_charts(charts)
+    t_compile = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for row in users[:args.scalar_users]:
+        user_cm = dict(zip(USER_COLUMNS, row))
+        for chart in charts:
+            recommend_size(user_cm, chart)
+    n_scalar = min(args.scalar_users, len(users)) * len(charts)
+    t_scalar = (time.perf_counter() - t0) / n_scalar
+
+    t0 = time.perf_counter()
+    recommend_sizes_batch(users, index)
+    t_batch = (time.perf_counter() - t0) / (len(users) * len(charts))
+
+    print(f"charts={args.charts} sizes={args.sizes} users={args.users}")
+    print(f"compile_charts:        {t_compile * 1e3:9.2f} ms")
+    print(f"scalar recommend_size: {t_scalar * 1e6:9.3f} us / recommendation")
+    print(f"recommend_sizes_batch: {t_batch * 1e6:9.3f} us / recommendation")
+    print(f"speedup:               {t_scalar / t_batch:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_spectral.py
+"""
+impulse_monitoring.spectral.BandPowerTracker vs utils.compute_band_powers on
+the recorder's live loop (1 s epoch, a new chunk every 0.2 s): times one tick
+of each. That the tracker reproduces compute_band_powers tick for tick is
+checked by impulse_monitoring.tests.BandPowerTrackerTests.
+
+    python benchmarks/bench_spectral.py --fs 256 --channels 4
+"""
+import argparse, pathlib, sys, time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from impulse_monitoring import utils  # noqa: E402
+from impulse_monitoring.spectral import BandPowerTracker  # noqa: E402
+
+TICK_S = 0.2      # EEG_recording SHIFT_LENGTH
+
+
+def synthetic(rng, fs, channels, seconds):
+    t = np.arange(int(fs * seconds)) / fs
+    alpha = 30 * np.sin(2 * np.pi * 10 * t)[:, None]
+    return rng.normal(0, 15, (len(t), channels)) + alpha + 800   # Muse-like DC offset
+
+
+def _per_tick(fn, ticks):
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+    return (time.perf_counter() - t0) / ticks
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--fs", type=int, default=256)
+    ap.add_argument("--channels", type=int, default=4)
+    ap.add_argument("--ticks", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    fs, ch = args.fs, args.channels
+
+    chunk = synthetic(rng, fs, ch, TICK_S)
+    buf = synthetic(rng, fs, ch, 5)
+    tracker = BandPowerTracker(fs, fs, ch)
+    t_fft = _per_tick(lambda: utils.compute_band_powers(utils.get_last_data(buf, fs), fs), args.ticks)
+    t_inc = _per_tick(lambda: tracker.update(chunk), args.ticks)
+    ticks_per_s = 1 / TICK_S
+    print(f"{'':>22} {'per tick':>10} {'streams/core':>14}")
+    for name, t in (("compute_band_powers", t_fft), ("BandPowerTracker", t_inc)):
+        print(f"{name:>22} {t * 1e6:>8.1f}us {1 / (t * ticks_per_s):>14.0f}")
+    print(f"speedup: {t_fft / t_inc:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
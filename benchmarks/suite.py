@@ -0,0 +1,323 @@
+# benchmarks/suite.py
+"""
+Hot-path benchmark suite with a stored baseline and a regression gate.
+
+Times the DSP helpers, the measurement codec, the size recommender and
+MuseConsumer message handling (through the Channels test communicator, on a
+throwaway SQLite database), all offline on seeded synthetic data. Each case
+is reported as the median per-operation time over --repeat runs.
+
+Only the optimized paths are gated: a gated case whose median is slower than
+baseline * --threshold is measured again (--retries), and if it is still
+slower the run fails (exit status 1). Reference cases (the legacy codec, the
+scalar recommender, DSP helpers no change has touched) are reported for
+context only.
+
+    python benchmarks/suite.py                    # run + compare
+    python benchmarks/suite.py --only dsp. codec.
+    python benchmarks/suite.py --save-baseline    # after an intended change
+
+Baselines are per environment: record one with requirements.txt installed,
+on the machine (or CI runner class) that runs the comparison. When Python,
+numpy or the machine differ from the baseline's, nothing is compared and the
+run exits with status 2.
+"""
+import argparse, asyncio, json, os, pathlib, platform, random, statistics, sys, tempfile, time, timeit
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+BASELINE = pathlib.Path(__file__).resolve().parent / "baseline.json"
+
+from bench_size_recommender import synthetic_charts, synthetic_users  # noqa: E402
+from core import codec, encryption  # noqa: E402
+from impulse_monitoring import utils  # noqa: E402
+from impulse_monitoring.scheduler import BandPowerScheduler  # noqa: E402
+from impulse_monitoring.spectral import BandPowerTracker  # noqa: E402
+from vton.services.size_recommender import (  # noqa: E402
+    USER_COLUMNS, compile_charts, recommend_top_size, recommend_top_sizes_batch,
+)
+
+FS, CHANNELS = 256, 4
+CASES = {}
+GATED = set()
+# environment a baseline is only valid for
+ENV_KEYS = ("python", "numpy", "machine")
+
+
+def case(name, gate=True):
+    """Registers a benchmark; gate=False marks a reference case that never fails the run."""
+    def register(fn):
+        CASES[name] = fn
+        if gate:
+            GATED.add(name)
+        return fn
+    return register
+
+
+def best_per_op(fn, repeat, ops=1):
+    """Median seconds per operation over `repeat` runs; fn performs `ops` operations per call."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    # many short (~50 ms) runs; the median shrugs off the ones a busy machine slowed down
+    number = max(1, number // 4)
+    return statistics.median(timer.repeat(repeat=repeat, number=number)) / (number * ops)
+
+
+def eeg(rng, seconds):
+    t = np.arange(int(FS * seconds)) / FS
+    return rng.normal(0, 15, (len(t), CHANNELS)) + 30 * np.sin(2 * np.pi * 10 * t)[:, None] + 800
+
+
+# --- DSP (impulse_monitoring.utils) ---
+
+@case("dsp.update_buffer", gate=False)
+def _(args):
+    rng = np.random.default_rng(args.seed)
+    buf, chunk = np.zeros((FS * 5, CHANNELS)), eeg(rng, 0.2)
+    state = [utils.update_buffer(buf, chunk, notch=True)[1]]
+
+    def run():
+        _buf, state[0] = utils.update_buffer(buf, chunk, notch=True, filter_state=state[0])
+    return best_per_op(run, args.repeat)
+
+
+@case("dsp.compute_band_powers", gate=False)
+def _(args):
+    window = eeg(np.random.default_rng(args.seed), 1)
+    return best_per_op(lambda: utils.compute_band_powers(window, FS), args.repeat)
+
+
+@case("dsp.epoch", gate=False)
+def _(args):
+    x = eeg(np.random.default_rng(args.seed), 60)
+    return best_per_op(lambda: utils.epoch(x, FS, int(0.8 * FS)), args.repeat)
+
+
+@case("dsp.compute_feature_matrix", gate=False)
+def _(args):
+    epochs = utils.epoch(eeg(np.random.default_rng(args.seed), 60), FS, int(0.8 * FS))
+    return best_per_op(lambda: utils.compute_feature_matrix(epochs, FS), args.repeat, epochs.shape[2])
+
+
+@case("dsp.band_power_tracker")
+def _(args):
+    # one 0.2 s tick of the sliding DFT (impulse_monitoring.spectral)
+    rng = np.random.default_rng(args.seed)
+    tracker, chunk = BandPowerTracker(FS, FS, CHANNELS), eeg(rng, 0.2)
+    tracker.update(eeg(rng, 1))
+    return best_per_op(lambda: tracker.update(chunk), args.repeat)
+
+
+@case("dsp.scheduler_tick.100")
+def _(args):
+    # one batched tick over 100 sessions, per session (impulse_monitoring.scheduler)
+    rng = np.random.default_rng(args.seed)
+    sched, chunk = BandPowerScheduler(fs=FS), eeg(rng, 0.2)
+    for i in range(100):
+        sched.add_session(i, CHANNELS, None)
+
+    def run():
+        for i in range(100):
+            sched.push(i, chunk)
+        sched.compute()
+    return best_per_op(run, args.repeat, 100)
+
+
+# --- measurement codec ---
+
+def _digits(rng, n):
+    return "".join(rng.choice("0123456789") for _ in range(n))
+
+
+for _length in (3, 12, 100):
+    # 3: a stored measurement; 12: a phone number; 100: a long free-text value
+    @case(f"codec.legacy_encrypt.{_length}", gate=False)
+    def _(args, n=_length):
+        plain = _digits(random.Random(args.seed), n)
+        return best_per_op(lambda: encryption.encrypt(plain), args.repeat)
+
+    @case(f"codec.legacy_decrypt.{_length}", gate=False)
+    def _(args, n=_length):
+        stored = encryption.encrypt(_digits(random.Random(args.seed), n))
+        return best_per_op(lambda: encryption.decrypt(stored), args.repeat)
+
+    @case(f"codec.encrypt.{_length}")
+    def _(args, n=_length):
+        plain = _digits(random.Random(args.seed), n)
+        return best_per_op(lambda: codec.encrypt(plain), args.repeat)
+
+    @case(f"codec.decrypt.{_length}")
+    def _(args, n=_length):
+        stored = codec.encrypt(_digits(random.Random(args.seed), n))
+        return best_per_op(lambda: codec.decrypt(stored), args.repeat)
+
+
+# --- size recommender ---
+
+@case("sizes.recommend_top_size", gate=False)
+def _(args):
+    rng = random.Random(args.seed)
+    charts = synthetic_charts(args.charts, 12, rng)
+    user_cm = dict(zip(USER_COLUMNS, synthetic_users(1, rng)[0]))
+
+    def run():
+        for chart in charts:
+            recommend_top_size(user_cm, chart)
+    return best_per_op(run, args.repeat, len(charts))
+
+
+@case("sizes.recommend_top_sizes_batch")
+def _(args):
+    rng = random.Random(args.seed)
+    index = compile_charts(synthetic_charts(args.charts, 12, rng))
+    users = synthetic_users(200, rng)
+    return best_per_op(lambda: recommend_top_sizes_batch(users, index), args.repeat, len(users) * args.charts)
+
+
+# --- telemetry (MuseConsumer over the Channels test communicator) ---
+
+def _django():
+    if not os.environ.get("DJANGO_SETTINGS_MODULE"):
+        tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_suite_"))
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp / 'db.sqlite3'}"
+        os.environ["DJANGO_SETTINGS_MODULE"] = "emergrade.settings"
+        import django
+        django.setup()
+        from django.core.management import call_command
+        call_command("migrate", verbosity=0)
+
+
+def _muse_throughput(args, user):
+    from channels.testing import WebsocketCommunicator
+    from vton.consumers import MuseConsumer
+
+    rng = np.random.default_rng(args.seed)
+    messages = [json.dumps({"kind": "muse_features", "ts": i, "powers": rng.normal(0, 1, 5 * CHANNELS).tolist()})
+                for i in range(args.messages)]
+
+    async def measure():
+        com = WebsocketCommunicator(MuseConsumer.as_asgi(), "/ws/muse/bench/")
+        com.scope["url_route"] = {"kwargs": {"session_id": "bench"}}
+        com.scope["user"] = user
+        await com.connect()
+        await com.receive_from()
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for text in messages:
+                await com.send_to(text_data=text)
+                await com.receive_from()
+            best = min(best, (time.perf_counter() - t0) / len(messages))
+        await com.disconnect()
+        return best
+
+    return asyncio.run(measure())
+
+
+@case("telemetry.muse_features")
+def _(args):
+    _django()
+    from django.contrib.auth.models import AnonymousUser
+    return _muse_throughput(args, AnonymousUser())
+
+
+@case("telemetry.muse_features_scored")
+def _(args):
+    # a signed-in user with a ready baseline, so every tick is z-scored
+    _django()
+    from core.models import User
+    from impulse_monitoring.baselines import BASELINE_MIN_EPOCHS, update_baseline
+    user, _created = User.objects.get_or_create(email="bench@example.com")
+    rng = np.random.default_rng(args.seed)
+    update_baseline(user, rng.normal(0, 1, (BASELINE_MIN_EPOCHS * 2, 5, CHANNELS)))
+    return _muse_throughput(args, user)
+
+
+# --- runner ---
+
+def compare(results, baseline, threshold):
+    """[(name, now, then, ratio)] for gated cases slower than baseline * threshold."""
+    slower = []
+    for name, now in results.items():
+        then = baseline.get(name) if name in GATED else None
+        if then and now > then * threshold:
+            slower.append((name, now, then, now / then))
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--only", nargs="+", metavar="PREFIX", help="run cases whose name starts with any PREFIX")
+    ap.add_argument("--repeat", type=int, default=25)
+    ap.add_argument("--charts", type=int, default=2000)
+    ap.add_argument("--messages", type=int, default=500, help="telemetry messages per repeat")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--threshold", type=float, default=1.3, help="fail when now > baseline * THRESHOLD")
+    ap.add_argument("--retries", type=int, default=2, help="re-measure a case this many times before calling it slower")
+    ap.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="write results to --baseline instead of comparing")
+    ap.add_argument("--output", type=pathlib.Path, help="also write this run's results as JSON")
+    args = ap.parse_args(argv)
+
+    names = [n for n in CASES if not args.only or n.startswith(tuple(args.only))]
+    meta = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%d"),
+    }
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        stored = json.loads(args.baseline.read_text())
+        mismatched = [k for k in ENV_KEYS if stored["meta"].get(k) != meta[k]]
+        if mismatched:
+            for k in mismatched:
+                print(f"baseline {k} is {stored['meta'].get(k)}, this run has {meta[k]}")
+            print("not comparable; install requirements.txt or re-record with --save-baseline")
+            return 2
+        baseline = stored["results"]
+
+    results = {}
+    print(f"{'case':<36} {'per op':>12} {'baseline':>12} {'ratio':>7}")
+    for name in names:
+        now = CASES[name](args)
+        then = baseline.get(name) if name in GATED else None
+        for _ in range(args.retries):
+            if not then or now <= then * args.threshold:
+                break
+            # one slow measurement on a busy machine isn't a regression yet
+            now = min(now, CASES[name](args))
+        results[name] = now
+        then = baseline.get(name)
+        ratio = f"{now / then:>6.2f}x" if then else ""
+        print(f"{name:<36} {now * 1e6:>10.2f}us " + (f"{then * 1e6:>10.2f}us {ratio}" if then else "")
+              + ("" if name in GATED else "  (reference)"))
+
+    report = {"meta": meta, "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        if args.only and args.baseline.exists():
+            # refresh just these cases
+            merged = json.loads(args.baseline.read_text())
+            merged["results"].update(results)
+            merged["meta"] = report["meta"]
+            report = merged
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"no baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    slower = compare(results, baseline, args.threshold)
+    for name, now, then, ratio in slower:
+        print(f"REGRESSION {name}: {now * 1e6:.2f}us vs {then * 1e6:.2f}us ({ratio:.2f}x > {args.threshold:.2f}x)")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# benchmarks/ws_load.py
+"""
+WebSocket load generator for /ws/muse/<session_id>/.
+
+Opens --sessions sessions. Each session gets one bridge connection and
+--browsers browser connections. Every bridge sends muse_features at --rate
+per second, plus a muse_summary every --summary-every seconds. The run
+measures:
+- connect time
+- fan-out latency: bridge send to browser receipt of the muse_tick, using
+  the `ts` the consumer echoes back
+- message loss: ticks each browser should have seen vs ticks it got
+- CPU of the server and of this client; if the client is near 100% it is
+  the bottleneck, not the server
+
+    python benchmarks/ws_load.py --sessions 50 --browsers 2 --rate 5 --duration 30
+    python benchmarks/ws_load.py --url ws://10.0.0.5:8000 --server-pid 1234 --json run.json
+    python benchmarks/ws_load.py ... --json new.json --compare run.json
+
+Without --url, a daphne server for emergrade.asgi is started on a free local
+port, using a throwaway SQLite database, and its CPU is sampled. Run it on
+another machine for numbers that don't share a CPU with the load generator.
+The spawned server is stopped (and killed if it doesn't exit within 10 s)
+however the run ends, including on Ctrl-C.
+
+Exit status is 0 when every connection opened, 1 when any connection failed
+or the spawned server did not start, and 2 for bad arguments.
+"""
+import argparse, asyncio, json, os, pathlib, platform, resource, shutil, socket, subprocess, sys, tempfile, time
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+BANDS = 5
+
+
+class Stats:
+    def __init__(self):
+        self.connect_s = []
+        self.connect_failed = 0
+        self.fanout_s = []
+        self.sent = {}          # session -> muse_features sent
+        self.received = []      # (session, ticks received) per browser
+        self.summaries = 0
+        self.send_lag_s = []    # how late each send was against its schedule
+
+
+def _pct(values, qs=(50, 95, 99)):
+    if not values:
+        return {}
+    v = np.asarray(values) * 1e3
+    return {**{f"p{q}": round(float(np.percentile(v, q)), 2) for q in qs}, "max": round(float(v.max()), 2)}
+
+
+class CpuSampler:
+    """CPU seconds of a process from /proc (Linux); None elsewhere."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_s(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / self.tick   # utime + stime
+
+
+async def _connect(url, stats):
+    t0 = time.perf_counter()
+    try:
+        ws = await connect(url, max_queue=None, open_timeout=30)
+    except Exception:
+        stats.connect_failed += 1
+        return None
+    stats.connect_s.append(time.perf_counter() - t0)
+    await ws.recv()   # muse_ws_connected status
+    return ws
+
+
+async def browser(ws, session, stats, stop):
+    ticks = 0
+    try:
+        while not stop.is_set():
+            try:
+                text = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            msg = json.loads(text)
+            if msg.get("kind") == "muse_tick":
+                ticks += 1
+                stats.fanout_s.append(time.time() - msg["ts"])
+            elif msg.get("kind") == "model":
+                stats.summaries += 1
+    except Exception:
+        pass   # connection dropped; what it got so far still counts
+    stats.received.append((session, ticks))
+
+
+async def _drain(ws, stop):
+    # the bridge is in the group too; read its copies so the server never blocks on it
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+    except Exception:
+        pass
+
+
+async def bridge(ws, session, args, stats, rng):
+    interval = 1.0 / args.rate
+    loop = asyncio.get_running_loop()
+    start = next_at = loop.time()
+    next_summary = start + args.summary_every if args.summary_every else float("inf")
+    sent = 0
+    while next_at < start + args.duration:
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stats.send_lag_s.append(max(0.0, -delay))
+        await ws.send(json.dumps({
+            "kind": "muse_features",
+            "ts": time.time(),
+            "powers": rng.normal(0, 1, BANDS * args.channels).round(4).tolist(),
+        }))
+        sent += 1
+        if loop.time() >= next_summary:
+            await ws.send(json.dumps({"kind": "muse_summary", "focus": 0.5, "alpha": 1.0, "beta": 1.0, "theta": 1.0}))
+            next_summary += args.summary_every
+        next_at += interval
+    stats.sent[session] = sent
+
+
+async def run(args, server_cpu):
+    stats = Stats()
+    stop = asyncio.Event()
+    sem = asyncio.Semaphore(args.connect_concurrency)
+    sessions = [f"load{i}" for i in range(args.sessions)]
+
+    async def opened(session):
+        async with sem:
+            return await _connect(f"{args.url.rstrip('/')}/ws/muse/{session}/", stats)
+
+    # browsers first, so none misses the first tick; then the bridges
+    browser_ws = await asyncio.gather(*(opened(s) for s in sessions for _ in range(args.browsers)))
+    bridge_ws = await asyncio.gather(*(opened(s) for s in sessions))
+    readers = [
+        asyncio.create_task(browser(ws, session, stats, stop))
+        for ws, session in zip(browser_ws, [s for s in sessions for _ in range(args.browsers)]) if ws
+    ] + [asyncio.create_task(_drain(ws, stop)) for ws in bridge_ws if ws]
+
+    cpu0 = server_cpu.cpu_s() if server_cpu else None
+    own0, wall0 = resource.getrusage(resource.RUSAGE_SELF), time.perf_counter()
+    rng = np.random.default_rng(args.seed)
+    await asyncio.gather(*(bridge(ws, s, args, stats, rng) for ws, s in zip(bridge_ws, sessions) if ws))
+    wall = time.perf_counter() - wall0
+    own1 = resource.getrusage(resource.RUSAGE_SELF)
+    cpu1 = server_cpu.cpu_s() if server_cpu else None
+
+    await asyncio.sleep(args.drain)   # let in-flight ticks land
+    stop.set()
+    await asyncio.gather(*readers)
+    await asyncio.gather(*(ws.close() for ws in browser_ws + bridge_ws if ws))
+
+    expected = sum(stats.sent.get(s, 0) for s, _ in stats.received)
+    received = sum(n for _, n in stats.received)
+    sent = sum(stats.sent.values())
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "server_pid")},
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "date": time.strftime("%Y-%m-%d %H:%M")},
+        "connections": {"opened": len(stats.connect_s), "failed": stats.connect_failed},
+        "connect_ms": _pct(stats.connect_s),
+        "fanout_ms": _pct(stats.fanout_s),
+        "send_lag_ms": _pct(stats.send_lag_s),
+        "messages": {
+            "sent": sent,
+            "expected": expected,
+            "received": received,
+            "loss_pct": round(100 * (1 - received / expected), 3) if expected else None,
+            "summaries_received": stats.summaries,
+        },
+        "throughput": {
+            "target_sent_per_s": args.sessions * args.rate,
+            "sent_per_s": round(sent / wall, 1),
+            "delivered_per_s": round(received / wall, 1),
+        },
+        "cpu_pct": {
+            "server": round(100 * (cpu1 - cpu0) / wall, 1) if cpu0 is not None and cpu1 is not None else None,
+            "client": round(100 * ((own1.ru_utime + own1.ru_stime) - (own0.ru_utime + own0.ru_stime)) / wall, 1),
+        },
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def stop_server(proc, timeout=10):
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def spawn_server(tmp):
+    """daphne for emergrade.asgi on a free port with its DB in `tmp`; returns (process, url)."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp / 'db.sqlite3'}",
+        "DJANGO_SETTINGS_MODULE": "emergrade.settings",
+        "DJANGO_SECRET_KEY": os.environ.get("DJANGO_SECRET_KEY", "ws-load"),
+    }
+    subprocess.run([sys.executable, "manage.py", "migrate", "-v0"], cwd=ROOT, env=env, check=True)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "daphne", "-b", "127.0.0.1", "-p", str(port), "emergrade.asgi:application"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline and proc.poll() is None:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                return proc, f"ws://127.0.0.1:{port}"
+            except OSError:
+                time.sleep(0.1)
+    except BaseException:
+        stop_server(proc)
+        raise
+    stop_server(proc)
+    raise SystemExit("daphne did not start")
+
+
+def _flat(report, prefix=""):
+    for k, v in report.items():
+        if isinstance(v, dict):
+            yield from _flat(v, f"{prefix}{k}.")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield f"{prefix}{k}", v
+
+
+def print_report(report, previous=None):
+    old = dict(_flat(previous)) if previous else {}
+    for key, value in _flat(report):
+        if key.startswith("config."):
+            continue
+        line = f"{key:<34} {value:>12}"
+        if old.get(key):
+            line += f"   was {old[key]:>12}  ({value / old[key]:.2f}x)"
+        print(line)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--url", help="server base URL (ws://host:port); default: spawn a local daphne")
+    ap.add_argument("--server-pid", type=int, help="pid to sample CPU from when --url is given")
+    ap.add_argument("--sessions", type=int, default=20)
+    ap.add_argument("--browsers", type=int, default=1, help="browser connections per session")
+    ap.add_argument("--rate", type=float, default=5.0, help="muse_features per second per bridge")
+    ap.add_argument("--summary-every", type=float, default=10.0, help="seconds between muse_summary (0: never)")
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--drain", type=float, default=2.0, help="seconds to wait for in-flight ticks")
+    ap.add_argument("--channels", type=int, default=4)
+    ap.add_argument("--connect-concurrency", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", type=pathlib.Path, help="write the report here")
+    ap.add_argument("--compare", type=pathlib.Path, help="previous --json report to compare against")
+    args = ap.parse_args(argv)
+
+    proc = tmp = None
+    try:
+        if not args.url:
+            tmp = pathlib.Path(tempfile.mkdtemp(prefix="ws_load_"))
+            proc, args.url = spawn_server(tmp)
+            args.server_pid = proc.pid
+        server_cpu = CpuSampler(args.server_pid) if args.server_pid else None
+        report = asyncio.run(run(args, server_cpu))
+    finally:
+        if proc:
+            stop_server(proc)
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print(f"{args.sessions} sessions x ({args.browsers} browsers + 1 bridge), "
+          f"{args.rate}/s for {args.duration:.0f}s against {args.url}")
+    print_report(report, previous)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+    failed = report["connections"]["failed"]
+    if failed:
+        print(f"{failed} connection(s) failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,11 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import StreamingHttpResponse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from .models import User, UserProfile
+from .models import User, UserProfile, OutboundEmail
+from .measurements import NUMERIC_FIELDS, decode_measurements, iter_measurements_csv, set_measurements
 
 
 @admin.register(User)
@@ -33,24 +37,41 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+class UserProfileAdminForm(forms.ModelForm):
+    """
+    Shows the decoded measurements in the typed fields, whatever the row's storage
+    (legacy ciphertext, typed or sealed); UserProfileAdmin.save_model writes them back.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stored = {field: getattr(self.instance, field) for field in NUMERIC_FIELDS.values()}
+        if self.instance.pk:
+            values = decode_measurements(self.instance)
+            for key, field in NUMERIC_FIELDS.items():
+                self.initial[field] = values[key]
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'get_user_email', 'chest', 'waist_circumference', 'hip_circumference', 'height', 'body_shape')
-    list_filter = ('body_shape',)
+    form = UserProfileAdminForm
+    list_display = ('user', 'get_user_email', 'chest_in', 'waist_in', 'hip_in', 'height_in', 'body_shape', 'image_preview')
+    list_filter = ('body_shape', 'measurements_migrated')
     search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    actions = ('export_measurements_csv',)
     
     fieldsets = (
         ('User Information', {
             'fields': ('user',)
         }),
         ('Body Measurements (inches)', {
-            'fields': ('chest', 'waist_circumference', 'hip_circumference', 'Inseam_length', 'height', 'weight')
+            'fields': ('chest_in', 'waist_in', 'hip_in', 'inseam_in', 'height_in', 'weight_lb', 'measurements_migrated')
         }),
         ('Body Type', {
             'fields': ('body_shape',)
         }),
         ('Profile Photo', {
-            'fields': ('image',)
+            'fields': ('image', 'image_preview')
         }),
     )
     
@@ -59,15 +80,38 @@ class UserProfileAdmin(admin.ModelAdmin):
         return obj.user.email
     get_user_email.short_description = 'Email'
     get_user_email.admin_order_field = 'user__email'
+
+    # Decoded measurements for the selected profiles, streamed in batches
+    @admin.action(description='Export measurements (CSV)')
+    def export_measurements_csv(self, request, queryset):
+        response = StreamingHttpResponse(iter_measurements_csv(queryset), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="measurements.csv"'
+        return response
     # Make the form more user-friendly
     autocomplete_fields = []  # Add if you have many users
     
     # Display image preview in admin
-    readonly_fields = ('image_preview',)
+    readonly_fields = ('image_preview', 'measurements_migrated')
     
     def image_preview(self, obj):
-        if obj.image:
-            return f'<img src="{obj.image.url}" style="max-height: 200px; max-width: 200px;" />'
+        if obj.thumbnail_url:
+            return format_html('<img src="{}" style="max-height: 200px; max-width: 200px;" />', obj.thumbnail_url)
         return "No image uploaded"
     image_preview.short_description = 'Image Preview'
-    image_preview.allow_tags = True
\ No newline at end of file
+
+    def save_model(self, request, obj, form, change):
+        if any(field in form.changed_data for field in NUMERIC_FIELDS.values()):
+            # through set_measurements, so legacy and sealed rows are rewritten too
+            set_measurements(obj, {key: form.cleaned_data[field] for key, field in NUMERIC_FIELDS.items()})
+        else:
+            for field, value in form.stored.items():
+                setattr(obj, field, value)
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
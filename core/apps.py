@@ -6,5 +6,12 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals  # noqa
+        from django.db.backends.signals import connection_created
+        from emergrade.db import sqlite_pragmas
+        connection_created.connect(sqlite_pragmas, dispatch_uid="emergrade-sqlite-pragmas")
+        from core import metrics
+        from core.caching import page_cache_metrics
+        connection_created.connect(metrics.install_db_timing, dispatch_uid="core-metrics-db-timing")
+        metrics.register_collector(page_cache_metrics)
 
 
@@ -0,0 +1,83 @@
+"""
+Full-page caching for anonymous visitors, with per-page hit/miss counters.
+
+Only GET/HEAD responses for signed-out users are cached. A response is not
+stored when it sets a cookie, when it varies on Cookie, or when rendering
+asked for a CSRF token. CsrfViewMiddleware only adds the token's cookie after
+this decorator has run, so the request's CSRF_COOKIE_NEEDS_UPDATE flag is
+what marks a page with {% csrf_token %}. Such a page must never be shared
+between visitors. Signed-in users always get a fresh render. The key
+includes the query string and carries the cache KEY_PREFIX (CACHE_RELEASE),
+so a deploy starts from an empty page cache.
+"""
+import functools
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import has_vary_header
+
+# {(page, "hit"|"miss"): count} for this process
+_stats = Counter()
+
+
+def _cache():
+    return caches[getattr(settings, "PAGE_CACHE_ALIAS", "default")]
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        and not has_vary_header(response, "Cookie")
+    )
+
+
+def cache_anonymous_page(name, timeout=None):
+    """View decorator; `name` labels the page in page_cache_stats()."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            cache = _cache()
+            # hashed so long query strings stay within memcached's key limit
+            key = f"page:{name}:{hashlib.md5(request.get_full_path().encode()).hexdigest()}"
+            cached = cache.get(key)
+            if cached is not None:
+                _stats[name, "hit"] += 1
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            _stats[name, "miss"] += 1
+            response = view(request, *args, **kwargs)
+            if _cacheable(request, response):
+                cache.set(
+                    key, (response.content, response["Content-Type"]),
+                    timeout if timeout is not None else getattr(settings, "PAGE_CACHE_TIMEOUT", 60 * 15),
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def page_cache_stats():
+    """{page: {"hits", "misses", "hit_rate"}} since this process started."""
+    out = {}
+    for page in sorted({page for page, _ in _stats}):
+        hits, misses = _stats[page, "hit"], _stats[page, "miss"]
+        out[page] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+    return out
+
+
+def clear_page_cache_stats():
+    _stats.clear()
+
+
+def page_cache_metrics():
+    """page_cache_stats() as a core.metrics collector."""
+    return [("page_cache_requests_total", "counter", "Anonymous page cache lookups by page and result.",
+             [({"page": page, "result": result}, count) for (page, result), count in sorted(_stats.items())])]
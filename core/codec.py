@@ -0,0 +1,98 @@
+"""
+Table-driven encrypt/decrypt for the measurement ciphertext in core.encryption.
+
+Same wire format as the original routines (one 3-char token per character,
+ROT13 applied on top), so values already stored in UserProfile decode to exactly
+the same strings. The difference is cost: encrypt is a single str.translate and
+decrypt is one dict lookup per token, both linear in the input length, instead of
+the per-character list scans and str.replace calls in Encryption/Decryption.
+
+Anything the tables don't cover (malformed ciphertext, characters the original
+routines reject) is handed to the original implementation, so error behaviour
+is unchanged too.
+"""
+import re
+
+from . import encryption as legacy
+
+
+def _rot(text):
+    # encrypt()/decrypt()'s final lower()+encoder pass; None where encoder fails
+    try:
+        return "".join(legacy.encoder(ch) for ch in text.lower())
+    except IndexError:
+        return None
+
+
+def _encode_char(ch):
+    # Non-space characters encrypt deterministically, one token each
+    return _rot(legacy.Encryption(ch))
+
+
+def _decode_token(q, tagged_x):
+    # Mirrors legacy.Decryption's index arithmetic (negative indices wrap, as there)
+    if q > 80:
+        idx = 62
+    elif tagged_x:
+        idx = q + 26 - 19
+    else:
+        idx = q - 19
+    if not -len(legacy.letters) <= idx < len(legacy.letters):
+        return None
+    return _rot(legacy.letters[idx])
+
+
+# Tables are built from the original routines, so they inherit their quirks:
+# characters the legacy encoder cannot handle map to None and fall back below.
+_ENCODE = {ord(ch): _encode_char(ch) for ch in legacy.letters if ch != " "}
+_ENCODE = {k: v for k, v in _ENCODE.items() if v is not None}
+_ENCODABLE = frozenset(map(chr, _ENCODE))
+
+# {"DD": char} for tokens tagged 'x' and for every other non-digit tag
+_DECODE = {f"{q:02d}": _decode_token(q, False) for q in range(100)}
+_DECODE_X = {f"{q:02d}": _decode_token(q, True) for q in range(100)}
+
+_WELL_FORMED = re.compile(r"(?:[0-9]{2}[^0-9])*")
+
+
+def encrypt(value):
+    if not _ENCODABLE.issuperset(value):
+        return legacy.encrypt(value)   # raises the same error as before
+    return value.translate(_ENCODE)
+
+
+def decrypt(value):
+    # Decryption ignores a trailing partial token
+    body = value[:len(value) - len(value) % 3]
+    if not _WELL_FORMED.fullmatch(body):
+        return legacy.decrypt(value)
+    out = [
+        (_DECODE_X if body[i + 2] == "x" else _DECODE)[body[i:i + 2]]
+        for i in range(0, len(body), 3)
+    ]
+    if None in out:
+        return legacy.decrypt(value)   # raises the same IndexError as before
+    return "".join(out)
+
+
+def encrypt_many(values):
+    """encrypt() over many values, encoding each distinct value once."""
+    memo = {}
+    return [memo[v] if v in memo else memo.setdefault(v, encrypt(v)) for v in values]
+
+
+def decrypt_many(values):
+    """
+    decrypt() over many values, decoding each distinct ciphertext once (stored
+    measurements repeat a lot). Values decrypt() can't read come back as None.
+    """
+    memo = {}
+    out = []
+    for v in values:
+        if v not in memo:
+            try:
+                memo[v] = decrypt(v)
+            except Exception:
+                memo[v] = None
+        out.append(memo[v])
+    return out
@@ -0,0 +1,164 @@
+"""
+Profile photo ingestion: validate an upload once, then store an upright,
+EXIF-free original plus fixed-size derivatives so nothing downstream has to
+touch the full-resolution file again.
+"""
+import io
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import UserProfile
+
+# MPO is what phone cameras write (a JPEG with extra preview/depth frames);
+# only the first frame is decoded and it's stored as plain JPEG
+ALLOWED_FORMATS = {"JPEG", "MPO", "PNG", "WEBP"}
+THUMBNAIL_SIZE = (200, 200)
+# IDM-VTON works at 768x1024; fit inside that box, keeping the aspect ratio
+MODEL_INPUT_SIZE = (768, 1024)
+MAX_PIXELS = 40_000_000
+
+_MISSING = object()
+
+
+def _check_size(size):
+    max_bytes = getattr(settings, "PROFILE_PHOTO_MAX_BYTES", 10 * 1024 * 1024)
+    if size is not None and size > max_bytes:
+        raise ValidationError(f"Image is too large (max {max_bytes // (1024 * 1024)} MB).")
+
+
+def check_upload(upload):
+    """Rejects oversized or non-image uploads before anything is read or decoded."""
+    _check_size(upload.size)
+    content_type = getattr(upload, "content_type", None) or ""
+    if content_type and not content_type.startswith("image/"):
+        raise ValidationError("Please upload a JPEG, PNG or WebP image.")
+
+
+def upload_source(upload):
+    """
+    What to hand open_upright() for an UploadedFile: the temp file Django already
+    spooled it to, or the in-memory file itself. No extra copy either way.
+    """
+    if isinstance(upload, TemporaryUploadedFile):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload
+
+
+def open_upright(fobj):
+    """
+    Opens and validates an image file/path; returns a loaded, EXIF-orientation-applied
+    RGB(A) image with no metadata. Raises ValidationError for anything unusable.
+    """
+    _check_size(getattr(fobj, "size", None))
+    try:
+        with Image.open(fobj) as im:
+            if im.format not in ALLOWED_FORMATS:
+                raise ValidationError("Please upload a JPEG, PNG or WebP image.")
+            if im.width * im.height > MAX_PIXELS:
+                raise ValidationError("Image dimensions are too large.")
+            im = ImageOps.exif_transpose(im)
+            im.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValidationError("That file is not a readable image.")
+    has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+    im = im.convert("RGBA" if has_alpha else "RGB")
+    im.info.clear()   # drop EXIF/ICC/comments carried over from the upload
+    return im
+
+
+def encode(im, fmt="JPEG"):
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        im.convert("RGB").save(buf, "JPEG", quality=90, optimize=True)
+    else:
+        im.save(buf, fmt, optimize=True)
+    return buf.getvalue()
+
+
+def model_input(im):
+    return ImageOps.contain(im, MODEL_INPUT_SIZE, Image.Resampling.LANCZOS)
+
+
+def model_jpeg(src):
+    """JPEG bytes of an image file/path/upload, upright and fit to MODEL_INPUT_SIZE."""
+    if hasattr(src, "chunks"):
+        src = upload_source(src)
+    return encode(model_input(open_upright(src)))
+
+
+def thumbnail(im):
+    thumb = im.copy()
+    thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    return thumb
+
+
+def ingest_profile_photo(upload):
+    """
+    Returns {"original", "thumb", "model"} ContentFiles for an uploaded photo.
+    The original keeps its resolution but is re-encoded upright without EXIF.
+    """
+    im = open_upright(upload)
+    stem = Path(upload.name).stem or "photo"
+    fmt = "PNG" if im.mode == "RGBA" else "JPEG"
+    ext = ".png" if fmt == "PNG" else ".jpg"
+    return {
+        "original": ContentFile(encode(im, fmt), name=f"{stem}{ext}"),
+        "thumb": ContentFile(encode(thumbnail(im), fmt), name=f"{stem}_thumb{ext}"),
+        # model input is always JPEG; the try-on Space doesn't use alpha
+        "model": ContentFile(encode(model_input(im)), name=f"{stem}_model.jpg"),
+    }
+
+
+def _photo_cache_key(user_id):
+    return f"profile-photo:{user_id}"
+
+
+def _photo_of(profile):
+    if not (profile and (profile.image_model or profile.image)):
+        return None
+    return {
+        "name": (profile.image_model or profile.image).name,
+        "thumb_url": profile.thumbnail_url,
+    }
+
+
+def get_profile_photo(user):
+    """
+    {"name", "thumb_url"} for the user's stored photo, or None. `name` is the
+    storage name of the model-size derivative, or of the original for profiles
+    saved before derivatives existed. Cached like get_measurements and cleared
+    by the same UserProfile signals.
+    """
+    if not user.is_authenticated:
+        return None
+    cache = caches[getattr(settings, "PROFILE_CACHE_ALIAS", "default")]
+    key = _photo_cache_key(user.pk)
+    photo = cache.get(key, _MISSING)
+    if photo is _MISSING:
+        photo = _photo_of(UserProfile.objects.filter(user_id=user.pk).first())
+        cache.set(key, photo, getattr(settings, "PROFILE_CACHE_TIMEOUT", 60 * 60 * 24))
+    return photo
+
+
+async def aget_profile_photo(user):
+    """get_profile_photo() for async views."""
+    if not user.is_authenticated:
+        return None
+    cache = caches[getattr(settings, "PROFILE_CACHE_ALIAS", "default")]
+    key = _photo_cache_key(user.pk)
+    photo = await cache.aget(key, _MISSING)
+    if photo is _MISSING:
+        photo = _photo_of(await UserProfile.objects.filter(user_id=user.pk).afirst())
+        await cache.aset(key, photo, getattr(settings, "PROFILE_CACHE_TIMEOUT", 60 * 60 * 24))
+    return photo
+
+
+def invalidate_profile_photo(user_id):
+    caches[getattr(settings, "PROFILE_CACHE_ALIAS", "default")].delete(_photo_cache_key(user_id))
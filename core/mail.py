@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import external_call
+from .models import OutboundEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Same arguments as send_mail, but only writes the outbox row; returns it."""
+    return OutboundEmail.objects.create(
+        subject=subject, body=message, from_email=from_email, to=list(recipient_list),
+    )
+
+
+def _retry_delay(attempts):
+    # 30s, 60s, 120s, ... capped at an hour
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+def _claim(batch_size):
+    """
+    Leases up to `batch_size` due rows to this sender in one short transaction:
+    next_attempt_at moves past the lease and the attempt is counted up front,
+    so a sender that dies mid-send leaves them due again once the lease ends.
+    """
+    lease = timedelta(seconds=getattr(settings, "OUTBOX_LEASE_SECONDS", 300))
+    with transaction.atomic():
+        rows = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            .order_by("next_attempt_at", "pk")[:batch_size]
+        )
+        leased_until = timezone.now() + lease
+        for row in rows:
+            row.attempts += 1
+            row.next_attempt_at = leased_until
+        OutboundEmail.objects.bulk_update(rows, ["attempts", "next_attempt_at"])
+    return rows
+
+
+def send_pending(connection=None, batch_size=50):
+    """
+    Delivers up to `batch_size` due outbox rows over `connection` (opened by the
+    caller and kept open between batches). Failed rows are retried with backoff
+    until OUTBOX_MAX_ATTEMPTS. Returns (sent, failed) counts for this batch.
+
+    No transaction is held while talking to SMTP: rows are claimed first, then
+    each result is written with its own single-row UPDATE, so queue_mail() never
+    waits on the mail server for the database lock.
+    """
+    connection = connection or get_connection()
+    max_attempts = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+    sent = failed = 0
+    for row in _claim(batch_size):
+        msg = EmailMessage(row.subject, row.body, row.from_email, row.to, connection=connection)
+        try:
+            # one message per call, so one bad recipient doesn't sink the batch
+            with external_call("smtp", "send"):
+                connection.send_messages([msg])
+        except Exception as e:
+            result = {"last_error": f"{type(e).__name__}: {e}"}
+            if row.attempts >= max_attempts:
+                result["status"] = OutboundEmail.STATUS_FAILED
+            else:
+                result["next_attempt_at"] = timezone.now() + _retry_delay(row.attempts)
+            failed += 1
+        else:
+            result = {"status": OutboundEmail.STATUS_SENT, "sent_at": timezone.now(), "last_error": ""}
+            sent += 1
+        OutboundEmail.objects.filter(pk=row.pk).update(**result)
+    return sent, failed
@@ -0,0 +1,35 @@
+import sys
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from core.measurements import EXPORT_COLUMNS, iter_measurements_csv, measurements_array
+
+
+class Command(BaseCommand):
+    help = "Export decoded UserProfile measurements (inches) as CSV or a NumPy .npy array."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["csv", "npy"], default="csv")
+        parser.add_argument("--output", "-o", help="File to write; CSV defaults to stdout.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        fmt, output, batch_size = options["format"], options["output"], options["batch_size"]
+
+        if fmt == "csv":
+            out = open(output, "w", newline="") if output else sys.stdout
+            try:
+                for chunk in iter_measurements_csv(batch_size=batch_size):
+                    out.write(chunk)
+            finally:
+                if output:
+                    out.close()
+            return
+
+        if not output:
+            raise CommandError("--output is required for --format npy")
+        ids, values = measurements_array(batch_size=batch_size)
+        # one float array; column order is EXPORT_COLUMNS
+        np.save(output, np.column_stack([ids.astype(float), values]))
+        self.stderr.write(f"Wrote {len(ids)} rows ({', '.join(EXPORT_COLUMNS)}) to {output}")
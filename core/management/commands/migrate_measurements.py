@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.measurements import NUMERIC_FIELDS, MEASUREMENT_FIELDS, invalidate_measurements_many, migrate_legacy_batch
+from core.models import UserProfile
+
+UPDATE_FIELDS = (
+    list(NUMERIC_FIELDS.values()) + list(MEASUREMENT_FIELDS.values())
+    + ["measurements_sealed", "measurements_migrated"]
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move UserProfile measurements from legacy ciphertext to the typed (or sealed) columns. "
+        "Works in small transactions, so it can run alongside the site and be stopped and rerun at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--limit", type=int, default=None, help="Stop after this many rows.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        batch_size, limit, pause = options["batch_size"], options["limit"], options["sleep"]
+        done = skipped = 0
+        last_pk = None   # cursor past rows we had to skip, so one pass always advances
+
+        while limit is None or done + skipped < limit:
+            size = batch_size if limit is None else min(batch_size, limit - done - skipped)
+            with transaction.atomic():
+                qs = UserProfile.objects.select_for_update().filter(measurements_migrated=False).order_by("pk")
+                if last_pk is not None:
+                    qs = qs.filter(pk__gt=last_pk)
+                profiles = list(qs[:size])
+                if not profiles:
+                    break
+                migrated, bad = migrate_legacy_batch(profiles)
+                UserProfile.objects.bulk_update(migrated, UPDATE_FIELDS)
+            invalidate_measurements_many([p.user_id for p in migrated])
+
+            last_pk = profiles[-1].pk
+            done += len(migrated)
+            skipped += len(bad)
+            for p in bad:
+                self.stderr.write(f"Skipped profile {p.pk}: unreadable ciphertext")
+            self.stdout.write(f"Migrated {done} profiles ({skipped} skipped), last pk {last_pk}")
+            if pause:
+                time.sleep(pause)
+
+        remaining = UserProfile.objects.filter(measurements_migrated=False).count()
+        self.stdout.write(self.style.SUCCESS(f"Done: {done} migrated, {skipped} skipped, {remaining} still on legacy storage."))
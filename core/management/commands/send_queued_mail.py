@@ -0,0 +1,47 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from core import metrics
+from core.mail import send_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OutboundEmail rows over one persistent mail connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain what is due now, then exit.")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument("--metrics-port", type=int,
+                            help="Serve this process's SMTP/DB metrics on :PORT/metrics (needs METRICS_ENABLED).")
+        parser.add_argument("--metrics-addr", default="127.0.0.1",
+                            help="Address for --metrics-port; anything but localhost needs METRICS_TOKEN.")
+
+    def handle(self, *args, **options):
+        batch_size, interval = options["batch_size"], options["interval"]
+        if options["metrics_port"]:
+            metrics.serve(options["metrics_port"], options["metrics_addr"])
+        connection = get_connection()
+        try:
+            while True:
+                try:
+                    connection.open()   # no-op while the connection is still up
+                    sent, failed = send_pending(connection, batch_size)
+                except Exception as e:
+                    # e.g. the server dropped us; reconnect on the next round
+                    self.stderr.write(f"Mail sender error: {type(e).__name__}: {e}")
+                    connection.close()
+                    sent = failed = 0
+                    time.sleep(interval)
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent}, failed {failed}")
+                if sent + failed < batch_size:
+                    if options["once"]:
+                        break
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
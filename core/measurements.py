@@ -0,0 +1,264 @@
+import base64
+import csv
+import io
+import os
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from .codec import decrypt, decrypt_many
+from .models import UserProfile
+
+# Keys used by views / the fit engine -> legacy ciphertext UserProfile columns
+MEASUREMENT_FIELDS = {
+    "chest": "chest",
+    "waist": "waist_circumference",
+    "hip": "hip_circumference",
+    "inseam": "Inseam_length",
+    "height": "height",
+    "weight": "weight",
+}
+# Same keys -> typed columns
+NUMERIC_FIELDS = {
+    "chest": "chest_in",
+    "waist": "waist_in",
+    "hip": "hip_in",
+    "inseam": "inseam_in",
+    "height": "height_in",
+    "weight": "weight_lb",
+}
+
+_MISSING = object()
+
+
+def _cache():
+    return caches[getattr(settings, "PROFILE_CACHE_ALIAS", "default")]
+
+
+def _cache_key(user_id):
+    return f"profile-measurements:{user_id}"
+
+
+def _to_float(value):
+    try:
+        return float(decrypt(value))
+    except Exception:
+        # blank weight, or a value the codec can't read
+        return None
+
+
+# ---- Optional sealing: all six values in one AES-GCM message per profile ----
+
+def _aead():
+    key = getattr(settings, "MEASUREMENT_ENCRYPTION_KEY", None)
+    if not key:
+        return None
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    return AESGCM(base64.urlsafe_b64decode(key))
+
+
+def seal(user_id, values, aead):
+    """values: float64 array in MEASUREMENT_FIELDS order (NaN = missing). The user id is bound as AAD."""
+    nonce = os.urandom(12)
+    return nonce + aead.encrypt(nonce, np.asarray(values, dtype="<f8").tobytes(), str(user_id).encode())
+
+
+def unseal(user_id, blob, aead):
+    if aead is None:
+        raise ImproperlyConfigured(
+            "Profile measurements are sealed but MEASUREMENT_ENCRYPTION_KEY is not set; "
+            "restore the key the rows were sealed with."
+        )
+    blob = bytes(blob)
+    return np.frombuffer(aead.decrypt(blob[:12], blob[12:], str(user_id).encode()), dtype="<f8")
+
+
+def _as_dict(values):
+    return {key: (None if np.isnan(v) else float(v)) for key, v in zip(MEASUREMENT_FIELDS, values)}
+
+
+def decode_measurements(profile):
+    """A UserProfile's measurements as {key: float or None} (inches, weight in lb)."""
+    if not profile.measurements_migrated:
+        return {key: _to_float(getattr(profile, field)) for key, field in MEASUREMENT_FIELDS.items()}
+    if profile.measurements_sealed:
+        return _as_dict(unseal(profile.user_id, profile.measurements_sealed, _aead()))
+    return {key: getattr(profile, field) for key, field in NUMERIC_FIELDS.items()}
+
+
+def _assign(profile, values, aead):
+    if aead is not None:
+        profile.measurements_sealed = seal(profile.user_id, values, aead)
+        values = np.full(len(NUMERIC_FIELDS), np.nan)
+    else:
+        profile.measurements_sealed = None
+    for field, v in zip(NUMERIC_FIELDS.values(), values):
+        setattr(profile, field, None if np.isnan(v) else float(v))
+    for field in MEASUREMENT_FIELDS.values():
+        setattr(profile, field, None if field == "weight" else "")
+    profile.measurements_migrated = True
+
+
+def set_measurements(profile, values):
+    """
+    Stores {key: float or None} on `profile` (not saved): in the typed columns, or
+    sealed when MEASUREMENT_ENCRYPTION_KEY is set. Legacy ciphertext is cleared.
+    """
+    _assign(profile, np.array([values.get(key) for key in MEASUREMENT_FIELDS], dtype=float), _aead())
+
+
+def get_measurements(user):
+    """
+    Decoded measurements for `user`, or None if they have no profile.
+    Served from the cache after the first call; core.signals drops the entry
+    whenever the profile is saved or deleted.
+    """
+    if not user.is_authenticated:
+        return None
+    cache = _cache()
+    key = _cache_key(user.pk)
+    data = cache.get(key, _MISSING)
+    if data is _MISSING:
+        profile = UserProfile.objects.filter(user_id=user.pk).first()
+        data = decode_measurements(profile) if profile else None
+        # "no profile" is cached too; creating one fires post_save and clears it
+        cache.set(key, data, getattr(settings, "PROFILE_CACHE_TIMEOUT", 60 * 60 * 24))
+    return data
+
+
+async def aget_measurements(user):
+    """get_measurements() for async views: same cache entry, async cache and ORM calls."""
+    if not user.is_authenticated:
+        return None
+    cache = _cache()
+    key = _cache_key(user.pk)
+    data = await cache.aget(key, _MISSING)
+    if data is _MISSING:
+        profile = await UserProfile.objects.filter(user_id=user.pk).afirst()
+        data = decode_measurements(profile) if profile else None
+        await cache.aset(key, data, getattr(settings, "PROFILE_CACHE_TIMEOUT", 60 * 60 * 24))
+    return data
+
+
+def invalidate_measurements(user_id):
+    _cache().delete(_cache_key(user_id))
+
+
+def invalidate_measurements_many(user_ids):
+    # for bulk_update paths, which don't send post_save
+    _cache().delete_many([_cache_key(uid) for uid in user_ids])
+
+
+# ---- Bulk path: stream every profile's measurements with bounded memory ----
+
+EXPORT_COLUMNS = ("user_id",) + tuple(MEASUREMENT_FIELDS)
+
+
+def _column_to_floats(plain):
+    out = np.full(len(plain), np.nan)
+    for i, v in enumerate(plain):
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def _decode_batch(batch, aead):
+    """
+    Rows of values_list(*_BATCH_COLUMNS) -> (user_ids, values, ok). Typed and sealed
+    rows are read directly; legacy rows are decoded column-wise with decrypt_many.
+    `ok` is False for legacy rows holding ciphertext the codec can't read.
+    """
+    columns = list(zip(*batch))
+    k = len(MEASUREMENT_FIELDS)
+    ids = np.asarray(columns[0], dtype=np.int64)
+    migrated = np.asarray(columns[1], dtype=bool)
+    sealed = columns[2]
+    values = np.array(columns[3:3 + k], dtype=float).T.copy()
+    ok = np.ones(len(batch), dtype=bool)
+
+    legacy_rows = np.flatnonzero(~migrated)
+    if len(legacy_rows):
+        for j, col in enumerate(columns[3 + k:]):
+            cipher = [col[i] for i in legacy_rows]
+            plain = _column_to_floats(decrypt_many(cipher))
+            values[legacy_rows, j] = plain
+            ok[legacy_rows] &= ~(np.isnan(plain) & np.array([bool(c) for c in cipher]))
+    for i in np.flatnonzero(migrated):
+        if sealed[i]:
+            values[i] = unseal(ids[i], sealed[i], aead)
+    return ids, values, ok
+
+
+_BATCH_COLUMNS = (
+    ("user_id", "measurements_migrated", "measurements_sealed")
+    + tuple(NUMERIC_FIELDS.values()) + tuple(MEASUREMENT_FIELDS.values())
+)
+
+
+def iter_measurement_batches(queryset=None, batch_size=2000):
+    """
+    Yields (user_ids, values) per batch of UserProfile rows: an int64 array and a
+    float (n, len(MEASUREMENT_FIELDS)) array in inches, NaN where a value is missing.
+    Rows come from a values_list iterator, so memory stays at one batch.
+    """
+    qs = UserProfile.objects.all() if queryset is None else queryset
+    rows = qs.order_by("pk").values_list(*_BATCH_COLUMNS).iterator(chunk_size=batch_size)
+    aead = _aead()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        ids, values, _ok = _decode_batch(batch, aead)
+        yield ids, values
+
+
+def migrate_legacy_batch(profiles):
+    """
+    Moves a batch of unmigrated profiles (model instances) to typed/sealed storage
+    in one decode pass. Returns (migrated, skipped); unreadable rows are left as-is.
+    """
+    batch = [tuple(getattr(p, c) for c in _BATCH_COLUMNS) for p in profiles]
+    if not batch:
+        return [], []
+    aead = _aead()
+    _ids, values, ok = _decode_batch(batch, aead)
+    migrated, skipped = [], []
+    for profile, row, good in zip(profiles, values, ok):
+        if good:
+            _assign(profile, row, aead)
+            migrated.append(profile)
+        else:
+            skipped.append(profile)
+    return migrated, skipped
+
+
+def measurements_array(queryset=None, batch_size=2000):
+    """All measurements as one (user_ids, values) pair; see iter_measurement_batches."""
+    ids, values = [], []
+    for batch_ids, batch_values in iter_measurement_batches(queryset, batch_size):
+        ids.append(batch_ids)
+        values.append(batch_values)
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(MEASUREMENT_FIELDS)))
+    return np.concatenate(ids), np.concatenate(values)
+
+
+def iter_measurements_csv(queryset=None, batch_size=2000):
+    """CSV text chunks (header first, then one chunk per batch), for StreamingHttpResponse or a file."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buf.getvalue()
+    for ids, values in iter_measurement_batches(queryset, batch_size):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(
+            [uid, *("" if np.isnan(v) else f"{v:.10g}" for v in row)]
+            for uid, row in zip(ids.tolist(), values)
+        )
+        yield buf.getvalue()
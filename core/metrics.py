@@ -0,0 +1,243 @@
+"""
+In-process request metrics in Prometheus text format.
+
+With METRICS_ENABLED on, core.middleware.MetricsMiddleware records for every
+request:
+- latency per URL name
+- DB query count and time (an execute wrapper is installed on each new
+  connection; a contextvar attributes queries to the request that made them,
+  including ORM calls from async views via sync_to_async)
+- the request count by status
+
+Outgoing calls wrapped in external_call(service, call) are timed per
+service, e.g. the try-on Space and SMTP. Collectors registered with
+register_collector() add gauges at scrape time; this is how the page cache
+and EEG scheduler counters are exported. render() produces the exposition
+text served at /metrics/.
+
+With METRICS_ENABLED off, the middleware removes itself (MiddlewareNotUsed),
+no DB wrapper is installed and external_call() only checks the flag.
+
+Each process keeps its own registry. The outbox sender can serve its own
+with `send_queued_mail --metrics-port` (serve()): on localhost only unless
+an address is given, and with the same bearer METRICS_TOKEN as /metrics/.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import constant_time_compare
+
+# seconds; Prometheus client defaults plus a long tail for try-on inference
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+# sub-tick resolution up to a few seconds of backlog
+TICK_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 1, 2.5, 5)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (type, help, buckets)
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "Request latency by URL name.", LATENCY_BUCKETS),
+    "http_requests_total": ("counter", "Requests by URL name, method and status.", None),
+    "http_request_db_queries": ("histogram", "DB queries per request by URL name.", COUNT_BUCKETS),
+    "http_request_db_seconds_total": ("counter", "Time spent in DB queries by URL name.", None),
+    "db_query_duration_seconds": ("histogram", "Duration of single DB queries by connection alias.", QUERY_BUCKETS),
+    "external_call_duration_seconds": ("histogram", "Outgoing calls by service, call and outcome.", LATENCY_BUCKETS),
+    "tryon_stage_duration_seconds": ("histogram", "Try-on pipeline stages (vton.tracing).", LATENCY_BUCKETS),
+    "eeg_tick_latency_seconds": ("histogram", "EEG tick latency by pipeline stage (impulse_monitoring.latency).", TICK_BUCKETS),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)     # (name, labels) -> value
+_histograms = {}                   # (name, labels) -> [per-bucket counts..., sum, count]
+_collectors = []
+
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request = ContextVar("metrics_request", default=None)
+
+
+def enabled():
+    return getattr(settings, "METRICS_ENABLED", False)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                h[i] += 1
+                break
+        h[-2] += value
+        h[-1] += 1
+
+
+def register_collector(fn):
+    """fn() -> [(name, type, help, [(labels dict, value), ...])], called at every scrape."""
+    if fn not in _collectors:
+        _collectors.append(fn)
+    return fn
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# --- recording ---
+
+def start_request():
+    return _request.set(_RequestStats()), time.perf_counter()
+
+
+def finish_request(request, response, started):
+    token, t0 = started
+    elapsed = time.perf_counter() - t0
+    stats = _request.get()
+    _request.reset(token)
+    match = getattr(request, "resolver_match", None)
+    view = (match.view_name if match else None) or "unmatched"
+    observe("http_request_duration_seconds", elapsed, view=view)
+    inc("http_requests_total", view=view, method=request.method, status=str(response.status_code))
+    observe("http_request_db_queries", stats.queries, view=view)
+    if stats.db_seconds:
+        inc("http_request_db_seconds_total", stats.db_seconds, view=view)
+
+
+def _time_query(execute, sql, params, many, context):
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - t0
+        stats = _request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        observe("db_query_duration_seconds", elapsed, alias=context["connection"].alias)
+
+
+def install_db_timing(sender, connection, **kwargs):
+    """connection_created receiver: times every query on the new connection."""
+    if enabled() and _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@contextmanager
+def external_call(service, call):
+    """Times the block as an outgoing call, e.g. external_call("tryon", "predict")."""
+    if not enabled():
+        yield
+        return
+    t0, outcome = time.perf_counter(), "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        observe("external_call_duration_seconds", time.perf_counter() - t0,
+                service=service, call=call, outcome=outcome)
+
+
+# --- exposition ---
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics, plus registered collectors, in the Prometheus text format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        samples = sorted((labels, v) for (n, labels), v in (histograms if buckets else counters).items() if n == name)
+        if not samples:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in samples:
+            if not buckets:
+                lines.append(f"{name}{_labels(labels)} {_num(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _num(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{name}_sum{_labels(labels)} {_num(value[-2])}")
+            lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+    for collect in _collectors:
+        for name, kind, help_text, samples in collect():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port, addr="127.0.0.1"):
+    """
+    Serves render() on http://addr:port/metrics from a daemon thread (for
+    non-web processes). Scrapers send "Authorization: Bearer <METRICS_TOKEN>"
+    when it is set; without a token only a loopback address is allowed.
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token and addr not in ("127.0.0.1", "::1", "localhost"):
+        raise ImproperlyConfigured(f"Set METRICS_TOKEN to serve metrics on {addr or 'all interfaces'}.")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if token and not constant_time_compare(self.headers.get("Authorization", ""), f"Bearer {token}"):
+                self.send_error(403)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
@@ -0,0 +1,64 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can sit in an async middleware chain. Stock WhiteNoise is
+    sync-only, which makes Django run every request (async views included)
+    through a single sync thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Latency, status and DB queries per URL name (see core.metrics). Drops out
+    of the chain entirely unless METRICS_ENABLED is set.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = metrics.start_request()
+        response = self.get_response(request)
+        metrics.finish_request(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = metrics.start_request()
+        response = await self.get_response(request)
+        metrics.finish_request(request, response, started)
+        return response
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_userprofile_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='chest_in',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='height_in',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='hip_in',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='inseam_in',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='measurements_migrated',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='measurements_sealed',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='waist_in',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='weight_lb',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='Inseam_length',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='chest',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='height',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='hip_circumference',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='waist_circumference',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='image_model',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='images/model'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='image_thumb',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='images/thumbs'),
+        ),
+    ]
@@ -72,15 +72,33 @@ class UserProfile(models.Model):
         ("Pear", "Pear"),
         ("Inverted Traingle", "Inverted Traingle"),
     ]
-    chest = models.CharField(max_length=250)
-    waist_circumference = models.CharField(max_length=250)
-    hip_circumference = models.CharField(max_length=250)
-    Inseam_length = models.CharField(max_length=250)
-    height = models.CharField(max_length=250)
+    # Legacy ciphertext columns (core.encryption format). Rows are moved to the
+    # numeric columns below by `manage.py migrate_measurements`; migrated rows
+    # keep these blank.
+    chest = models.CharField(max_length=250, blank=True)
+    waist_circumference = models.CharField(max_length=250, blank=True)
+    hip_circumference = models.CharField(max_length=250, blank=True)
+    Inseam_length = models.CharField(max_length=250, blank=True)
+    height = models.CharField(max_length=250, blank=True)
     weight = models.CharField(max_length=250, blank=True, null=True, default=None) 
     # weight = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, default=None) 
+
+    # Typed measurements (inches / lb), queryable in the database. Left empty when
+    # MEASUREMENT_ENCRYPTION_KEY is set; the values then live in measurements_sealed.
+    chest_in = models.FloatField(blank=True, null=True, db_index=True)
+    waist_in = models.FloatField(blank=True, null=True, db_index=True)
+    hip_in = models.FloatField(blank=True, null=True, db_index=True)
+    inseam_in = models.FloatField(blank=True, null=True)
+    height_in = models.FloatField(blank=True, null=True)
+    weight_lb = models.FloatField(blank=True, null=True)
+    # AES-GCM over all six values at once (see core.measurements.seal)
+    measurements_sealed = models.BinaryField(blank=True, null=True, editable=False)
+    measurements_migrated = models.BooleanField(default=False, db_index=True)
     body_shape = models.CharField(max_length=255, default='', choices=body_shape_choices)
     image = models.ImageField(upload_to='images', blank=True, null=True)
+    # Derivatives written by core.images.ingest_profile_photo alongside `image`
+    image_thumb = models.ImageField(upload_to='images/thumbs', blank=True, null=True, editable=False)
+    image_model = models.ImageField(upload_to='images/model', blank=True, null=True, editable=False)
 
     class Meta:
         verbose_name = 'User Profile'
@@ -88,11 +106,48 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.email}'s Profile"
+
+    @property
+    def thumbnail_url(self):
+        # older profiles predate the derivatives; fall back to the original
+        image = self.image_thumb or self.image
+        return image.url if image else None
     
 
 
 
 
+class OutboundEmail(models.Model):
+    # Local outbox: views enqueue here and `manage.py send_queued_mail` delivers,
+    # so requests never wait on the SMTP server.
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    status_choices = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=status_choices, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
 # | Measurement                    | Applies To      | Why It’s Needed                                                                                    |
 # | ------------------------------ | --------------- | -------------------------------------------------------------------------------------------------- |
 # | Chest / Bust circumference | Tops, Outerwear | Main determinant of fit for shirts, hoodies, jackets — directly comparable to garment chest width. |
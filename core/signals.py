@@ -1,6 +1,10 @@
 from django.dispatch import receiver
 from allauth.account.signals import user_signed_up
 from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from .models import UserProfile
+from .measurements import invalidate_measurements
+from .images import invalidate_profile_photo
 
 User = get_user_model()
 
@@ -12,3 +16,10 @@ def populate_profile_on_signup(request, user, **kwargs):
         user.first_name = extra_data.get("given_name", "")
         user.last_name = extra_data.get("family_name", "")
         user.save()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_caches(sender, instance, **kwargs):
+    invalidate_measurements(instance.user_id)
+    invalidate_profile_photo(instance.user_id)
@@ -1,3 +1,506 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import random
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import call_command
+from django.db import ConnectionHandler, connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from PIL import Image
+
+from emergrade import db as dbconfig
+
+from . import codec, encryption as legacy, metrics
+from .caching import _cache, cache_anonymous_page, clear_page_cache_stats, page_cache_stats
+from .images import (
+    aget_profile_photo, check_upload, get_profile_photo, ingest_profile_photo, invalidate_profile_photo, model_jpeg,
+    open_upright, upload_source,
+)
+from .mail import queue_mail, send_pending
+from .measurements import _cache as measurement_cache
+from .measurements import (
+    MEASUREMENT_FIELDS, NUMERIC_FIELDS, aget_measurements, decode_measurements, get_measurements, invalidate_measurements,
+    iter_measurements_csv, measurements_array, migrate_legacy_batch, set_measurements,
+)
+from .models import OutboundEmail, User, UserProfile
+
+
+def mpo_bytes(size=(64, 48)):
+    """A small two-frame MPO, the format iPhone photos are detected as."""
+    buf = io.BytesIO()
+    Image.new("RGB", size, "red").save(buf, "MPO", save_all=True, append_images=[Image.new("RGB", size, "blue")])
+    return buf.getvalue()
+
+
+class ProfilePhotoFormatTests(SimpleTestCase):
+    def test_mpo_is_accepted_and_stored_as_jpeg(self):
+        files = ingest_profile_photo(SimpleUploadedFile("iphone.jpg", mpo_bytes(), content_type="image/jpeg"))
+        for name in ("original", "thumb", "model"):
+            self.assertTrue(files[name].name.endswith(".jpg"))
+            self.assertEqual(Image.open(io.BytesIO(files[name].read())).format, "JPEG")
+
+    def test_mpo_model_input(self):
+        data = model_jpeg(io.BytesIO(mpo_bytes()))
+        self.assertEqual(Image.open(io.BytesIO(data)).format, "JPEG")
+
+    def test_check_upload_accepts_mpo_and_rejects_non_images(self):
+        check_upload(SimpleUploadedFile("iphone.jpg", mpo_bytes(), content_type="image/jpeg"))
+        with self.assertRaises(ValidationError):
+            check_upload(SimpleUploadedFile("notes.pdf", b"%PDF-1.4", content_type="application/pdf"))
+
+    def test_rejected_format(self):
+        buf = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buf, "GIF")
+        with self.assertRaisesMessage(ValidationError, "Please upload a JPEG, PNG or WebP image."):
+            open_upright(io.BytesIO(buf.getvalue()))
+
+    def test_upload_source_in_memory_is_rewound(self):
+        upload = SimpleUploadedFile("iphone.jpg", mpo_bytes(), content_type="image/jpeg")
+        upload.read()
+        self.assertIs(upload_source(upload), upload)
+        self.assertEqual(upload.tell(), 0)
+        self.assertEqual(open_upright(upload_source(upload)).size, (64, 48))
+
+    def test_upload_source_temporary_file_uses_its_path(self):
+        data = mpo_bytes()
+        upload = TemporaryUploadedFile("iphone.jpg", "image/jpeg", len(data), None)
+        self.addCleanup(upload.close)
+        upload.write(data)
+        upload.flush()
+        self.assertEqual(upload_source(upload), upload.temporary_file_path())
+        self.assertEqual(Image.open(io.BytesIO(model_jpeg(upload))).format, "JPEG")
+
+
+class ProfilePhotoSourceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="source@example.com", password="pw")
+        self.addCleanup(invalidate_profile_photo, self.user.pk)
+
+    def test_no_profile(self):
+        self.assertIsNone(get_profile_photo(self.user))
+        self.assertIsNone(get_profile_photo(AnonymousUser()))
+
+    def test_prefers_model_derivative_and_thumbnail(self):
+        UserProfile.objects.create(
+            user=self.user, image="images/me.jpg", image_thumb="images/thumbs/me_thumb.jpg",
+            image_model="images/model/me_model.jpg",
+        )
+        photo = get_profile_photo(self.user)
+        self.assertEqual(photo["name"], "images/model/me_model.jpg")
+        self.assertTrue(photo["thumb_url"].endswith("images/thumbs/me_thumb.jpg"))
+
+    def test_older_profile_falls_back_to_original(self):
+        UserProfile.objects.create(user=self.user, image="images/me.jpg")
+        photo = get_profile_photo(self.user)
+        self.assertEqual(photo["name"], "images/me.jpg")
+        self.assertTrue(photo["thumb_url"].endswith("images/me.jpg"))
+
+    async def test_async_matches_sync(self):
+        await UserProfile.objects.acreate(user=self.user, image="images/me.jpg", image_model="images/model/me_model.jpg")
+        self.assertEqual((await aget_profile_photo(self.user))["name"], "images/model/me_model.jpg")
+
+
+class ProfileFormPhotoTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(email="photo@example.com", password="pw")
+        self.client.force_login(self.user)
+
+    def post(self, photo):
+        return self.client.post("/profile/", {
+            "chest": "38", "waist": "32", "hips": "40", "inseam": "30", "height": "70",
+            "photo": photo,
+        }, secure=True)
+
+    def test_mpo_upload(self):
+        response = self.post(SimpleUploadedFile("iphone.jpg", mpo_bytes(), content_type="image/jpeg"))
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertTrue(profile.image_model.name.endswith(".jpg"))
+
+    def test_rejected_photo_keeps_measurements(self):
+        response = self.post(SimpleUploadedFile("notes.png", b"not an image", content_type="image/png"))
+        self.assertRedirects(response, "/profile/", fetch_redirect_response=False)
+        self.assertEqual(get_measurements(self.user)["chest"], 38.0)
+        self.assertFalse(UserProfile.objects.get(user=self.user).image)
+
+
+class _RecordingConnection:
+    """Mail connection stub that notes whether a DB transaction is open during each send."""
+
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.in_transaction = []
+
+    def send_messages(self, messages):
+        self.in_transaction.append(connection.in_atomic_block)
+        if messages[0].to[0] in self.fail_for:
+            raise OSError("mailbox unavailable")
+        return 1
+
+
+class OutboxSendTests(TransactionTestCase):
+    def test_smtp_runs_outside_a_transaction(self):
+        for i in range(3):
+            queue_mail("Hi", "body", "from@example.com", [f"u{i}@example.com"])
+        conn = _RecordingConnection(fail_for={"u1@example.com"})
+        self.assertEqual(send_pending(conn), (2, 1))
+        self.assertEqual(conn.in_transaction, [False, False, False])
+        failed = OutboundEmail.objects.get(to=["u1@example.com"])
+        self.assertEqual((failed.status, failed.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertIn("mailbox unavailable", failed.last_error)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_SENT).count(), 2)
+
+    def test_failures_back_off_then_give_up(self):
+        row = queue_mail("Hi", "body", "from@example.com", ["bad@example.com"])
+        conn = _RecordingConnection(fail_for={"bad@example.com"})
+        with override_settings(OUTBOX_MAX_ATTEMPTS=2):
+            self.assertEqual(send_pending(conn), (0, 1))
+            row.refresh_from_db()
+            self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(seconds=20))
+            self.assertEqual(send_pending(conn), (0, 0))   # not due yet
+
+            OutboundEmail.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(send_pending(conn), (0, 1))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (OutboundEmail.STATUS_FAILED, 2))
+
+
+class AnonymousPageCacheTests(SimpleTestCase):
+    def setUp(self):
+        _cache().clear()
+        clear_page_cache_stats()
+        self.renders = 0
+
+    def get(self, view, path="/"):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return view(request)
+
+    def page(self, name, extra=None):
+        @cache_anonymous_page(name)
+        def view(request):
+            self.renders += 1
+            response = HttpResponse(f"page {request.get_full_path()}")
+            if extra:
+                extra(request, response)
+            return response
+        return view
+
+    def test_plain_page_is_cached(self):
+        view = self.page("plain")
+        self.get(view)
+        self.assertEqual(self.get(view).content, b"page /")
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(page_cache_stats()["plain"]["hits"], 1)
+
+    def test_query_string_is_part_of_the_key(self):
+        view = self.page("query")
+        self.assertEqual(self.get(view, "/?next=/a").content, b"page /?next=/a")
+        self.assertEqual(self.get(view, "/?next=/b").content, b"page /?next=/b")
+        self.assertEqual(self.renders, 2)
+
+    def test_page_with_csrf_token_is_not_cached(self):
+        view = self.page("csrf", lambda request, response: get_token(request))
+        self.get(view)
+        self.get(view)
+        self.assertEqual(self.renders, 2)
+
+    def test_page_varying_on_cookie_is_not_cached(self):
+        view = self.page("vary", lambda request, response: patch_vary_headers(response, ["Cookie"]))
+        self.get(view)
+        self.get(view)
+        self.assertEqual(self.renders, 2)
+
+
+class MeasurementCacheTests(TestCase):
+    def setUp(self):
+        measurement_cache().clear()
+        self.user = User.objects.create_user(email="cached@example.com", password="pw")
+        self.profile = UserProfile(user=self.user)
+        set_measurements(self.profile, {"chest": 38.0})
+        self.profile.save()
+
+    def test_reads_are_cached(self):
+        self.assertEqual(get_measurements(self.user)["chest"], 38.0)
+        UserProfile.objects.filter(pk=self.profile.pk).update(chest_in=40.0)   # no post_save
+        self.assertEqual(get_measurements(self.user)["chest"], 38.0)
+
+    def test_save_clears_the_entry(self):
+        self.assertEqual(get_measurements(self.user)["chest"], 38.0)
+        set_measurements(self.profile, {"chest": 40.0})
+        self.profile.save()
+        self.assertEqual(get_measurements(self.user)["chest"], 40.0)
+
+    def test_delete_clears_the_entry(self):
+        self.assertEqual(get_measurements(self.user)["chest"], 38.0)
+        self.profile.delete()
+        self.assertIsNone(get_measurements(self.user))
+
+    async def test_async_read_shares_the_entry(self):
+        self.assertEqual((await aget_measurements(self.user))["chest"], 38.0)
+        await UserProfile.objects.filter(pk=self.profile.pk).aupdate(chest_in=40.0)
+        self.assertEqual(get_measurements(self.user)["chest"], 38.0)
+        await self.profile.adelete()
+        self.assertIsNone(await aget_measurements(self.user))
+
+
+class MetricsExporterTests(SimpleTestCase):
+    def serve(self, **kwargs):
+        server = metrics.serve(0, **kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def get(self, server, **headers):
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=5) as response:
+            return response.status
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_localhost_only_without_a_token(self):
+        self.assertEqual(self.serve().server_address[0], "127.0.0.1")
+        with self.assertRaisesMessage(ImproperlyConfigured, "METRICS_TOKEN"):
+            metrics.serve(0, addr="0.0.0.0")
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_is_required_when_set(self):
+        server = self.serve()
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self.get(server, Authorization="Bearer wrong")
+        self.assertEqual(ctx.exception.code, 403)
+        self.assertEqual(self.get(server, Authorization="Bearer s3cret"), 200)
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    # the pragma test opens its own throwaway SQLite file, not the test database
+    databases = {"default"}
+
+    def config(self, url, **env):
+        env = {"DATABASE_URL": url, "DB_POOL_MAX_SIZE": "0", "DB_CONN_MAX_AGE": "600", **env}
+        with mock.patch.dict(os.environ, env):
+            return dbconfig.database_config()
+
+    def test_sqlite_waits_for_the_write_lock(self):
+        db = self.config("sqlite:///tmp.sqlite3")
+        self.assertEqual(db["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertEqual(db["OPTIONS"]["timeout"], 5)
+        self.assertNotIn("pool", db["OPTIONS"])
+
+    def test_sqlite_pragmas_applied_on_connect(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        handler = ConnectionHandler({"default": self.config(f"sqlite:///{tmp}/pragmas.sqlite3")})
+        conn = handler["default"]
+        self.addCleanup(conn.close)
+        with conn.cursor() as cursor:
+            values = {}
+            for name in dbconfig.SQLITE_PRAGMAS:
+                cursor.execute(f"PRAGMA {name}")
+                values[name] = cursor.fetchone()[0]
+        self.assertEqual(values, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "mmap_size": 256 * 1024 * 1024})
+        self.assertEqual(conn.transaction_mode, "IMMEDIATE")
+
+    def test_postgres_keeps_connections_without_a_pool(self):
+        db = self.config("postgres://u:p@db:5432/app", DB_CONN_MAX_AGE="120")
+        self.assertEqual(db["CONN_MAX_AGE"], 120)
+        self.assertTrue(db["CONN_HEALTH_CHECKS"])
+        self.assertNotIn("pool", db.get("OPTIONS", {}))
+
+    def test_postgres_pool(self):
+        with mock.patch.object(dbconfig, "_pool_available", return_value=True):
+            db = self.config("postgres://u:p@db:5432/app", DB_POOL_MAX_SIZE="8", DB_POOL_MIN_SIZE="1")
+        self.assertEqual(db["CONN_MAX_AGE"], 0)
+        self.assertEqual(db["OPTIONS"]["pool"], {"min_size": 1, "max_size": 8})
+
+    def test_pool_size_without_psycopg_pool_falls_back(self):
+        with mock.patch.object(dbconfig, "_pool_available", return_value=False):
+            db = self.config("postgres://u:p@db:5432/app", DB_POOL_MAX_SIZE="8")
+        self.assertEqual(db["CONN_MAX_AGE"], 600)
+        self.assertNotIn("pool", db.get("OPTIONS", {}))
+
+
+SEAL_KEY = "MDEyMzQ1Njc4OWFiY2RlZjAxMjM0NTY3ODlhYmNkZWY="   # 32 bytes, urlsafe base64
+
+
+class SealedMeasurementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="sealed@example.com", password="pw")
+        with override_settings(MEASUREMENT_ENCRYPTION_KEY=SEAL_KEY):
+            profile = UserProfile(user=self.user)
+            set_measurements(profile, {"chest": 38.0, "waist": 32.5})
+            profile.save()
+        invalidate_measurements(self.user.pk)
+
+    @override_settings(MEASUREMENT_ENCRYPTION_KEY=SEAL_KEY)
+    def test_round_trip(self):
+        self.assertEqual(get_measurements(self.user)["waist"], 32.5)
+        self.assertIsNone(get_measurements(self.user)["weight"])
+
+    @override_settings(MEASUREMENT_ENCRYPTION_KEY=None)
+    def test_missing_key_is_a_configuration_error(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "MEASUREMENT_ENCRYPTION_KEY"):
+            get_measurements(self.user)
+
+
+class CodecEquivalenceTests(SimpleTestCase):
+    """core.codec must read and write exactly what core.encryption did."""
+
+    def test_matches_legacy_on_stored_values(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            plain = str(rng.randint(0, 10 ** rng.randint(1, 6)))
+            stored = legacy.encrypt(plain)
+            self.assertEqual(codec.encrypt(plain), stored, plain)
+            self.assertEqual(codec.decrypt(stored), plain, stored)
+            self.assertEqual(legacy.decrypt(stored), plain, stored)
+
+    def test_decrypt_many(self):
+        stored = [legacy.encrypt(v) for v in ("38", "32", "38", "180")]
+        self.assertEqual(codec.decrypt_many(stored + ["zzz"]), ["38", "32", "38", "180", None])
+        self.assertEqual(codec.encrypt_many(["38", "32", "38", "180"]), stored)
+
+
+def legacy_profile(email, **values):
+    """A profile as the old views stored it: every measurement in core.encryption ciphertext."""
+    user = User.objects.create_user(email=email, password="pw")
+    fields = {MEASUREMENT_FIELDS[key]: legacy.encrypt(str(v)) for key, v in values.items()}
+    return UserProfile.objects.create(user=user, **fields)
+
+
+class LegacyProfilesMixin:
+    """Three legacy-ciphertext profiles: complete, without weight, and one with an unreadable column."""
+
+    def setUp(self):
+        self.good = legacy_profile("a@example.com", chest=38, waist=32, hip=40, inseam=30, height=70, weight=160)
+        self.no_weight = legacy_profile("b@example.com", chest=36, waist=28, hip=38, inseam=29, height=65)
+        self.bad = legacy_profile("c@example.com", chest=40)
+        UserProfile.objects.filter(pk=self.bad.pk).update(waist_circumference="zzz")
+        self.bad.refresh_from_db()
+        self.expected = {p.pk: decode_measurements(p) for p in (self.good, self.no_weight, self.bad)}
+
+    def assert_bulk_read_matches(self):
+        ids, values = measurements_array(batch_size=2)
+        self.assertEqual(ids.tolist(), sorted(self.expected))
+        for uid, row in zip(ids.tolist(), values):
+            expected = [np.nan if v is None else v for v in self.expected[uid].values()]
+            np.testing.assert_array_equal(row, expected)
+
+
+class LegacyMeasurementTests(LegacyProfilesMixin, TestCase):
+    def test_decode_legacy(self):
+        self.assertEqual(self.expected[self.good.pk], {
+            "chest": 38.0, "waist": 32.0, "hip": 40.0, "inseam": 30.0, "height": 70.0, "weight": 160.0,
+        })
+        self.assertIsNone(self.expected[self.no_weight.pk]["weight"])
+        self.assertIsNone(self.expected[self.bad.pk]["waist"])
+
+    def test_bulk_read_matches_per_profile_decode(self):
+        self.assert_bulk_read_matches()
+
+    def test_csv_export(self):
+        rows = list(csv.reader(io.StringIO("".join(iter_measurements_csv(batch_size=2)))))
+        self.assertEqual(rows[0], ["user_id", *MEASUREMENT_FIELDS])
+        self.assertEqual(rows[1], [str(self.good.pk), "38", "32", "40", "30", "70", "160"])
+        self.assertEqual(rows[2][-1], "")
+        self.assertEqual(rows[3][:3], [str(self.bad.pk), "40", ""])
+        self.assertEqual(len(rows), 4)
+
+
+class MeasurementMigrationTests(LegacyProfilesMixin, TestCase):
+    def migrate(self):
+        call_command("migrate_measurements", batch_size=1, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_migrate_batch_keeps_values_and_skips_unreadable_rows(self):
+        migrated, skipped = migrate_legacy_batch(list(UserProfile.objects.order_by("pk")))
+        self.assertEqual([p.pk for p in migrated], [self.good.pk, self.no_weight.pk])
+        self.assertEqual(skipped, [self.bad])
+        for p in migrated:
+            self.assertTrue(p.measurements_migrated)
+            self.assertEqual(p.chest, "")
+            self.assertEqual(decode_measurements(p), self.expected[p.pk])
+
+    def test_migrate_command(self):
+        self.assertEqual(get_measurements(self.good.user)["weight"], 160.0)
+        self.migrate()
+        for p in UserProfile.objects.all():
+            self.assertEqual(p.measurements_migrated, p.pk != self.bad.pk)
+            self.assertEqual(decode_measurements(p), self.expected[p.pk])
+        self.assertEqual(UserProfile.objects.get(pk=self.good.pk).weight_lb, 160.0)
+        self.assertEqual(get_measurements(self.good.user)["weight"], 160.0)
+        self.assert_bulk_read_matches()
+
+    @override_settings(MEASUREMENT_ENCRYPTION_KEY=SEAL_KEY)
+    def test_migrate_command_seals_when_keyed(self):
+        self.migrate()
+        p = UserProfile.objects.get(pk=self.good.pk)
+        self.assertIsNone(p.chest_in)
+        self.assertTrue(p.measurements_sealed)
+        self.assertEqual(decode_measurements(p), self.expected[p.pk])
+        self.assert_bulk_read_matches()
+
+    def test_bulk_read_mixes_legacy_typed_and_sealed_rows(self):
+        with override_settings(MEASUREMENT_ENCRYPTION_KEY=SEAL_KEY):
+            migrate_legacy_batch([self.good])
+            self.good.save()
+        migrate_legacy_batch([self.no_weight])
+        self.no_weight.save()
+        with override_settings(MEASUREMENT_ENCRYPTION_KEY=SEAL_KEY):
+            self.assert_bulk_read_matches()
+
+
+class ProfileAdminMeasurementTests(LegacyProfilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(email="admin@example.com", password="pw"))
+
+    def edit(self, profile, **changes):
+        data = {"user": profile.pk, "body_shape": "Pear"}
+        for key, field in NUMERIC_FIELDS.items():
+            value = changes.get(key, self.expected[profile.pk][key])
+            data[field] = "" if value is None else value
+        response = self.client.post(f"/admin/core/userprofile/{profile.pk}/change/", data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        return UserProfile.objects.get(pk=profile.pk)
+
+    def test_form_shows_decoded_legacy_values(self):
+        response = self.client.get(f"/admin/core/userprofile/{self.good.pk}/change/", secure=True)
+        self.assertEqual(response.context["adminform"].form.initial["weight_lb"], 160.0)
+
+    def test_edit_rewrites_legacy_row(self):
+        p = self.edit(self.good, chest=39)
+        self.assertTrue(p.measurements_migrated)
+        self.assertEqual(p.chest, "")
+        self.assertEqual(decode_measurements(p), {**self.expected[p.pk], "chest": 39.0})
+
+    def test_other_edits_leave_storage_alone(self):
+        p = self.edit(self.good)
+        self.assertEqual((p.body_shape, p.measurements_migrated, p.chest_in), ("Pear", False, None))
+        self.assertEqual(decode_measurements(p), self.expected[p.pk])
+
+    @override_settings(MEASUREMENT_ENCRYPTION_KEY=SEAL_KEY)
+    def test_edit_reseals_sealed_row(self):
+        migrate_legacy_batch([self.good])
+        self.good.save()
+        p = self.edit(self.good, waist=33)
+        self.assertIsNone(p.waist_in)
+        self.assertEqual(decode_measurements(p)["waist"], 33.0)
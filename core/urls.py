@@ -10,5 +10,6 @@ urlpatterns = [
     path('signout/', views.signout, name='signout'),
     path('link/', views.linker_view, name='linker'),
     path('otp/', views.otp_view, name='otp'),
+    path('metrics/', views.metrics_view, name='metrics'),
     
     ]
@@ -3,22 +3,36 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from .models import User,UserProfile
 from django.shortcuts import get_object_or_404, render
-from .encryption import encrypt
-from django.core.mail import send_mail
+from .measurements import get_measurements, set_measurements
+from .caching import cache_anonymous_page
+from .images import ingest_profile_photo
+from django.core.exceptions import ValidationError
+from .mail import queue_mail
+from . import metrics
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
 import pyotp
 from .utils import send_otp
 from datetime import datetime
 from django.contrib.auth import login, get_backends
 
 # Create your views here.
+@cache_anonymous_page("main")
 def main(request):
     return render(request, "main/main.html" )
 
+# Not page-cached: the forms carry a per-visitor CSRF token. The static
+# welcome panel is a cached fragment in the template instead.
 def login_view(request):
     return render(request, "login.html" )
 
+@cache_anonymous_page("linker")
 def linker_view(request):
-    return render(request, "linker.html" )
+    # signed-in branch reads the cached measurements instead of the profile row
+    measurements = get_measurements(request.user) or {}
+    has_measurements = all(measurements.get(key) for key in ("chest", "waist", "hip", "inseam", "height"))
+    return render(request, "linker.html", {"has_measurements": has_measurements})
 
 # def otp(request):
 #     return render(request, "otp.html" )
@@ -53,35 +67,36 @@ def user_profile(request):
             profile = UserProfile(user=user)
             print("Creating new profile")
         
-        # Update profile fields
-        chest = encrypt(str(chest))
-        waist_circumference = encrypt(str(waist_circumference))
-        hip_circumference = encrypt(str(hip_circumference))
-        inseam = encrypt(str(inseam))
-        height = encrypt(str(height))
-        
-
-
-
-        profile.chest = chest
-        profile.waist_circumference = waist_circumference
-        profile.hip_circumference = hip_circumference
-        profile.Inseam_length = inseam
-        profile.height = height
-        
-        # Handle weight properly - only set if provided
-        if weight and weight.strip():
-            weight = encrypt(str(weight))
-            profile.weight = weight
-        else:
-            profile.weight = None
+        # Update measurement fields (typed columns, or sealed - see core.measurements)
+        def _float_or_none(val):
+            try: return float(val)
+            except (TypeError, ValueError): return None
+
+        set_measurements(profile, {
+            "chest": _float_or_none(chest),
+            "waist": _float_or_none(waist_circumference),
+            "hip": _float_or_none(hip_circumference),
+            "inseam": _float_or_none(inseam),
+            "height": _float_or_none(height),
+            # weight is optional
+            "weight": _float_or_none(weight),
+        })
         
         profile.body_shape = body_shape
         
         # CRITICAL: Only update image if a new one was uploaded
+        photo_error = None
         if photo:
-            profile.image = photo
-            print(f"Image uploaded: {photo.name}, Size: {photo.size} bytes")
+            try:
+                files = ingest_profile_photo(photo)
+            except ValidationError as e:
+                # keep the measurements from this POST; only the photo is rejected
+                photo_error = e.messages[0]
+            else:
+                profile.image = files["original"]
+                profile.image_thumb = files["thumb"]
+                profile.image_model = files["model"]
+                print(f"Image uploaded: {photo.name}, Size: {photo.size} bytes")
         else:
             print("No image uploaded")
         
@@ -96,11 +111,15 @@ def user_profile(request):
         if profile.image:
             print(f"Image URL: {profile.image.url}")
         
+        if photo_error:
+            messages.error(request, f"Measurements saved, but the photo was rejected: {photo_error}")
+            return redirect('user-profile')
         messages.success(request, "Profile updated successfully!")
         return redirect('core-main')
     
     # GET request - render the form
-    return render(request, "user_profile.html")
+    profile = UserProfile.objects.filter(user_id=request.user.pk).first() if request.user.is_authenticated else None
+    return render(request, "user_profile.html", {"photo_url": profile.thumbnail_url if profile else None})
 
 
 def signup(request):
@@ -132,7 +151,7 @@ def signup(request):
         message = "Hello " + myuser.first_name + "!!\n" + "Welcome to Emergrade\n Thank You for visiting this site.\n We have sent you a confirmation email. Please confirm your email address to activate your account. \n\n  Thank you "+fname
         from_email = 'larteyian@gmail.com'
         receipient_list = [myuser.email]
-        send_mail(subject, message, from_email, receipient_list, fail_silently=False)
+        queue_mail(subject, message, from_email, receipient_list)
 
 
 
@@ -160,7 +179,7 @@ def signin(request):
             message = "Hello " + user.first_name +  "!!\n" + "Welcome to Emergrade\n Thank You for visiting this site.\n Below is the otp to complete your login. Please type in this otp in the website to login:\n" +email_otp
             from_email = 'larteyian@gmail.com'
             receipient_list = [user.email]
-            send_mail(subject, message, from_email, receipient_list, fail_silently=False)
+            queue_mail(subject, message, from_email, receipient_list)
             request.session['email']=user.email
             return redirect('otp')
         else:
@@ -237,4 +256,14 @@ def otp_view(request):
         else: 
                 print("OTP error")
 
-    return render(request, 'otp.html') 
\ No newline at end of file
+    return render(request, 'otp.html') 
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (core.metrics); bearer METRICS_TOKEN or staff."""
+    if not metrics.enabled():
+        raise Http404
+    token = getattr(settings, "METRICS_TOKEN", None)
+    auth = request.headers.get("Authorization", "")
+    if not (request.user.is_staff or (token and constant_time_compare(auth, f"Bearer {token}"))):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
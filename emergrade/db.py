@@ -0,0 +1,64 @@
+"""
+Database settings. DATABASE_URL (or the local SQLite file) via dj_database_url,
+plus per-backend connection tuning:
+
+- Postgres keeps connections open across requests (CONN_MAX_AGE with health
+  checks), or uses Django's connection pool when psycopg 3 + psycopg_pool are
+  installed and DB_POOL_MAX_SIZE is set.
+- SQLite gets WAL and friends from a connection_created hook (sqlite_pragmas,
+  connected in core.apps) so readers don't block the writer and writers queue
+  on busy_timeout instead of failing with "database is locked".
+"""
+import os
+
+import dj_database_url
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",          # persistent in the file; readers and one writer run concurrently
+    "synchronous": "NORMAL",        # safe with WAL; fsync at checkpoints, not every commit
+    "busy_timeout": 5000,           # ms to wait for the write lock
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def _pool_available():
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def database_config(default="sqlite:///db.sqlite3"):
+    db = dj_database_url.config(default=default)
+    engine = db["ENGINE"]
+    if engine == "django.db.backends.sqlite3":
+        db.setdefault("OPTIONS", {}).update({
+            # take the write lock at BEGIN so concurrent writers wait on busy_timeout
+            # rather than deadlocking when a read transaction tries to upgrade
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        })
+    elif engine.startswith("django.db.backends.postgresql"):
+        pool_max = int(os.environ.get("DB_POOL_MAX_SIZE", 0))
+        if pool_max and _pool_available():
+            # pooled connections are returned at request end; CONN_MAX_AGE must stay 0
+            db["CONN_MAX_AGE"] = 0
+            db.setdefault("OPTIONS", {})["pool"] = {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                "max_size": pool_max,
+            }
+        else:
+            db["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", 600))
+            db["CONN_HEALTH_CHECKS"] = True
+    return db
+
+
+def sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: applies SQLITE_PRAGMAS to new SQLite connections."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
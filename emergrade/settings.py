@@ -13,7 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
-import dj_database_url
+
+from .db import database_config
 
 
 load_dotenv()
@@ -37,9 +38,16 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['your-app-name.onrender.com', 'localhost', '127.0.0.1']
 
-DATABASES = {'default': dj_database_url.config(default='sqlite:///db.sqlite3')}
+# Connection reuse / pooling and SQLite pragmas: see emergrade/db.py
+DATABASES = {'default': database_config(default='sqlite:///db.sqlite3')}
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Used by the outbox sender (`manage.py send_queued_mail`); views only enqueue.
+# Set to django.core.mail.backends.console.EmailBackend / filebased.EmailBackend locally.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+OUTBOX_MAX_ATTEMPTS = 5
+# A claimed row is left alone this long before another sender may retry it
+OUTBOX_LEASE_SECONDS = 300
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 EMAIL_HOST = 'smtp.gmail.com'
@@ -92,9 +100,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so its latency covers the rest of the chain
+    'core.middleware.MetricsMiddleware',
+
     "allauth.account.middleware.AccountMiddleware",
 
-    'whitenoise.middleware.WhiteNoiseMiddleware', 
+    'core.middleware.AsyncWhiteNoiseMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -126,6 +137,48 @@ ASGI_APPLICATION = "emergrade.asgi.application"
 CHANNEL_LAYERS = {
     "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
 }
+# Shared layer for more than one process (e.g. web workers + manage.py eeg_daemon)
+if os.environ.get('CHANNEL_REDIS_URL'):
+    CHANNEL_LAYERS["default"] = {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [os.environ['CHANNEL_REDIS_URL']]},
+    }
+# In-flight try-on calls to the HF Space per process (the async views await these)
+TRYON_MAX_CONCURRENCY = int(os.environ.get('TRYON_MAX_CONCURRENCY', 40))
+# Per-stage try-on traces, one JSON line each (vton.tracing); empty disables the file
+TRYON_TRACE_FILE = os.environ.get('TRYON_TRACE_FILE', os.path.join(BASE_DIR, 'traces', 'tryon.jsonl'))
+TRYON_TRACE_MAX_BYTES = 10 * 1024 * 1024   # rotated past this, keeping TRYON_TRACE_BACKUPS old files
+TRYON_TRACE_BACKUPS = 3
+
+# Per-view latency / DB / external-call metrics at /metrics/ (core.metrics).
+# Off by default; when set, scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>"
+# (without a token only staff can read it).
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '') in ('1', 'true', 'yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Local memory by default; CACHE_BACKEND=file shares entries between worker
+# processes on one host. Keys are prefixed with the deployed commit so a deploy
+# never serves pages rendered by the previous release.
+CACHE_RELEASE = os.environ.get('RENDER_GIT_COMMIT', '')[:12] or os.environ.get('CACHE_RELEASE', 'dev')
+if os.environ.get('CACHE_BACKEND') == 'file':
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+    }
+else:
+    _default_cache = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+CACHES = {
+    "default": {**_default_cache, "KEY_PREFIX": CACHE_RELEASE},
+}
+# Anonymous full-page cache for the landing pages (core.caching)
+PAGE_CACHE_ALIAS = "default"
+PAGE_CACHE_TIMEOUT = 60 * 15
+# Decoded UserProfile measurements (core.measurements); cleared on profile save/delete
+PROFILE_CACHE_ALIAS = "default"
+PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+# Optional urlsafe-base64 32-byte key. When set, profile measurements are stored
+# AES-GCM sealed instead of in the queryable numeric columns.
+MEASUREMENT_ENCRYPTION_KEY = os.environ.get('MEASUREMENT_ENCRYPTION_KEY')
 
 WSGI_APPLICATION = 'emergrade.wsgi.application'
 
@@ -24,6 +24,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('',include("vton.urls")),
+    path('eeg/', include('impulse_monitoring.urls')),
     path('accounts/', include('allauth.urls')),
 ] 
 
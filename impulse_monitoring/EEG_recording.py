@@ -11,6 +11,7 @@ from datetime import datetime
 import numpy as np
 from pylsl import StreamInlet, resolve_byprop
 import utils
+from spectral import BandPowerTracker
 import csv
 import time
 import sys
@@ -78,6 +79,9 @@ def record_session(inlet, fs):
     
     eeg_buffer = np.zeros((int(fs * BUFFER_LENGTH), N_CHANNELS))
     filter_state = None
+    # Slides the epoch's spectrum by the new samples instead of re-FFTing the
+    # whole epoch each tick; same output as utils.compute_band_powers
+    tracker = BandPowerTracker(EPOCH_LENGTH * fs, fs, N_CHANNELS)
 
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     csv_filename = f"eeg_session_{timestamp}.csv"
@@ -110,8 +114,7 @@ def record_session(inlet, fs):
                 filter_state=filter_state)
 
             # --- 3.2 COMPUTE BAND POWERS ---
-            data_epoch = utils.get_last_data(eeg_buffer, EPOCH_LENGTH * fs)
-            band_powers = utils.compute_band_powers(data_epoch, fs)
+            band_powers = tracker.update(eeg_buffer[-len(ch_data):])
 
             avg_alpha = np.mean(band_powers[Band.Alpha * N_CHANNELS : (Band.Alpha + 1) * N_CHANNELS])
             avg_beta = np.mean(band_powers[Band.Beta * N_CHANNELS : (Band.Beta + 1) * N_CHANNELS])
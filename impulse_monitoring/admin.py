@@ -1,3 +1,13 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import EEGSession
+
+
+@admin.register(EEGSession)
+class EEGSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'started_at', 'duration_s', 'n_epochs', 'dominant_band', 'avg_power')
+    list_filter = ('dominant_band',)
+    search_fields = ('user__email',)
+    list_select_related = ('user',)
+    exclude = ('band_powers',)
+    date_hierarchy = 'started_at'
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ImpulseMonitoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'impulse_monitoring'
+
+    def ready(self):
+        from core import metrics
+        from .scheduler import scheduler_metrics
+        metrics.register_collector(scheduler_metrics)
@@ -0,0 +1,155 @@
+"""
+Per-user EEG baselines and z-scored state.
+
+Raw log band powers are dominated by Delta for everyone (1/f spectrum), so the
+"dominant band" is judged relative to the user's own history instead: each
+band/channel is z-scored against a running mean/variance that is folded
+forward once per completed session (Chan et al.'s pairwise form of Welford's
+update, so a session's epochs merge in one step and history is never
+rescanned). The effective history is capped at BASELINE_MAX_EPOCHS, which
+turns the baseline into a rolling one that follows slow drift.
+
+Live scoring is O(1) per tick: LiveScorer holds mean and 1/std and does one
+subtract/multiply per feature.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import transaction
+
+from .models import BANDS, EEGBaseline
+
+# ~20 minutes of epochs at the recorder's 5 epochs/s
+BASELINE_MAX_EPOCHS = 6000
+# Below this the variance isn't trustworthy; callers fall back to raw powers
+BASELINE_MIN_EPOCHS = 150
+_MIN_STD = 1e-3
+
+_ALPHA, _BETA, _THETA = BANDS.index("Alpha"), BANDS.index("Beta"), BANDS.index("Theta")
+
+
+@dataclass
+class Baseline:
+    n: float
+    mean: np.ndarray   # (len(BANDS), n_channels) float64
+    m2: np.ndarray
+
+    @property
+    def ready(self):
+        return self.n >= BASELINE_MIN_EPOCHS
+
+    def std(self):
+        return np.maximum(np.sqrt(self.m2 / max(self.n - 1, 1)), _MIN_STD)
+
+
+def epoch_stats(powers):
+    """Baseline of a single session's (n_epochs, len(BANDS), n_channels) powers."""
+    x = np.asarray(powers, dtype=np.float64)
+    mean = x.mean(axis=0)
+    return Baseline(float(len(x)), mean, ((x - mean) ** 2).sum(axis=0))
+
+
+def combine(a, b, cap=BASELINE_MAX_EPOCHS):
+    """Merges two baselines (Chan et al.); the result's weight is capped at `cap`."""
+    n = a.n + b.n
+    delta = b.mean - a.mean
+    out = Baseline(n, a.mean + delta * (b.n / n), a.m2 + b.m2 + delta ** 2 * (a.n * b.n / n))
+    if cap and out.n > cap:
+        # shrink the history's weight, keeping its mean and variance
+        out.m2 *= cap / out.n
+        out.n = float(cap)
+    return out
+
+
+def _from_row(row):
+    shape = (len(BANDS), row.n_channels)
+    return Baseline(
+        row.weight,
+        np.frombuffer(bytes(row.mean), dtype="<f8").reshape(shape).copy(),
+        np.frombuffer(bytes(row.m2), dtype="<f8").reshape(shape).copy(),
+    )
+
+
+def get_baseline(user, n_channels):
+    """The user's baseline for this channel layout, or None."""
+    if user is None or not user.is_authenticated:
+        return None
+    row = EEGBaseline.objects.filter(user=user, n_channels=n_channels).first()
+    return _from_row(row) if row else None
+
+
+def live_scorers(user):
+    """{n_channels: LiveScorer} for each of the user's baselines that is ready."""
+    if user is None or not user.is_authenticated:
+        return {}
+    scorers = {}
+    for row in EEGBaseline.objects.filter(user=user):
+        baseline = _from_row(row)
+        if baseline.ready:
+            scorers[row.n_channels] = LiveScorer(baseline)
+    return scorers
+
+
+def update_baseline(user, powers):
+    """Folds a completed session's epochs into the user's baseline; returns the new Baseline."""
+    session = epoch_stats(powers)
+    n_channels = session.mean.shape[1]
+    with transaction.atomic():
+        row = (EEGBaseline.objects.select_for_update()
+               .filter(user=user, n_channels=n_channels).first())
+        if row is None:
+            row = EEGBaseline(user=user, n_channels=n_channels)
+            prior = Baseline(0.0, np.zeros_like(session.mean), np.zeros_like(session.m2))
+        else:
+            prior = _from_row(row)
+        merged = combine(prior, session)
+        row.weight = merged.n
+        row.mean = merged.mean.astype("<f8").tobytes()
+        row.m2 = merged.m2.astype("<f8").tobytes()
+        row.sessions += 1
+        row.save()
+    return merged
+
+
+def zscores(powers, baseline):
+    """Per-band z-score of a (len(BANDS), n_channels) power array, averaged over channels."""
+    return ((np.asarray(powers, dtype=np.float64) - baseline.mean) / baseline.std()).mean(axis=1)
+
+
+def focus_from_z(z):
+    # Engagement index in z-space: beta up relative to alpha/theta, squashed to 0..1
+    return float(1.0 / (1.0 + np.exp(-(z[_BETA] - 0.5 * (z[_ALPHA] + z[_THETA])))))
+
+
+def classify(powers, baseline):
+    """
+    Dominant band of a session's (n_epochs, len(BANDS), n_channels) powers. Uses
+    z-scores against `baseline` when it's ready, else the raw band means.
+    Returns (band, score) where score is the z-score or the raw mean power.
+    """
+    session_mean = np.asarray(powers, dtype=np.float64).mean(axis=0)
+    if baseline is not None and baseline.ready:
+        z = zscores(session_mean, baseline)
+        i = int(np.argmax(z))
+        return BANDS[i], float(z[i])
+    means = session_mean.mean(axis=1)
+    i = int(np.argmax(means))
+    return BANDS[i], float(means[i])
+
+
+class LiveScorer:
+    """Scores one tick of band powers against a fixed baseline in O(features)."""
+
+    def __init__(self, baseline):
+        self.mean = baseline.mean
+        self.inv_std = 1.0 / baseline.std()
+        self.n_channels = baseline.mean.shape[1]
+
+    def score(self, powers):
+        """
+        `powers` is compute_band_powers() output (band-major, len(BANDS) * n_channels).
+        Returns (focus 0..1, dominant band).
+        """
+        z = ((np.asarray(powers, dtype=np.float64).reshape(len(BANDS), self.n_channels)
+              - self.mean) * self.inv_std).mean(axis=1)
+        return focus_from_z(z), BANDS[int(np.argmax(z))]
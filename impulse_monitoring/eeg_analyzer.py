@@ -1,9 +1,17 @@
-import pandas as pd
 import numpy as np
 import os
 import glob
 import sys
 
+STATE_MAP = {
+    'Delta': "YOU ARE TIRED! I'm genuinely not sure how you're still awake, let alone shopping.",
+    'Theta': "A BIT SLEEPY: You're in a deeply relaxed or drowsy state, which is great for meditation, but terrible for big decisions. This is NOT the best time to shop. Come back later!",
+    'Alpha': "NICE AND CALM: You have a relaxed, focused state. This is ideal for browsing and low-stress tasks. You are calm, but maybe not be the best time to buy",
+    'Beta': "ACTIVE AND FOCUSED: Your brain is engaged and alert! This is your peak concentration zone. Perfect time for high-stakes shopping decisions. Might be a good time to purchase.",
+    'Gamma': "HIGHER PROCESSING: Intense mental shopping achieved! Must be shopping for something important. This is a well thought out purchase"
+}
+
+
 class EEGAnalyzer:
     """
     Analyzes an EEG band power CSV file (now supporting multiple channels)
@@ -14,17 +22,12 @@ class EEGAnalyzer:
         self.filename = filename
         self.df = None
         self.average_powers = None # Will store dict of {Band: avg_power}
-        self.state_map = {
-            'Delta': "YOU ARE TIRED! I'm genuinely not sure how you're still awake, let alone shopping.",
-            'Theta': "A BIT SLEEPY: You're in a deeply relaxed or drowsy state, which is great for meditation, but terrible for big decisions. This is NOT the best time to shop. Come back later!",
-            'Alpha': "NICE AND CALM: You have a relaxed, focused state. This is ideal for browsing and low-stress tasks. You are calm, but maybe not be the best time to buy",
-            'Beta': "ACTIVE AND FOCUSED: Your brain is engaged and alert! This is your peak concentration zone. Perfect time for high-stakes shopping decisions. Might be a good time to purchase.",
-            'Gamma': "HIGHER PROCESSING: Intense mental shopping achieved! Must be shopping for something important. This is a well thought out purchase"
-        }
+        self.state_map = STATE_MAP
 
     def load_data(self):
         """Loads the CSV data into a pandas DataFrame."""
         try:
+            import pandas as pd   # only the CSV analyzer needs it; keep STATE_MAP importers light
             self.df = pd.read_csv(self.filename)
             # Drop the Timestamp column for power calculation
             self.df = self.df.drop(columns=['Timestamp'], errors='ignore')
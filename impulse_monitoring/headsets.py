@@ -0,0 +1,243 @@
+"""
+One process for every headset on the network.
+
+HeadsetDaemon resolves all LSL streams of type EEG, opens one StreamInlet per
+device (keyed by its source_id) and polls them from a single asyncio loop.
+Every tick it drains what each inlet has buffered (non-blocking pull_chunk),
+notch-filters it with that device's own filter state and pushes it into a
+BandPowerScheduler. The scheduler computes all devices' epochs in one batch
+(one per sample rate). Each device's band powers are then sent to the
+telemetry-<session> group of the session it is routed to. There MuseConsumer
+scores them against the connected user's baseline.
+
+Each event carries latency stamps (see latency.py). The newest sample's LSL
+timestamp is mapped to our wall clock with the inlet's time_correction(),
+which is refreshed on every discovery pass. Then come the times of the
+pull, the filter, the batch FFT and the group_send.
+
+An extra headset therefore costs an inlet, a filter state and a one-epoch
+buffer. It does not need a muselsl bridge or a recorder process of its own.
+Streams are re-resolved in a worker thread every `resolve_every` seconds, so
+headsets can join while the daemon runs; a stream that goes away is dropped.
+
+Run it with `python manage.py eeg_daemon`. Outside one process it needs a
+shared channel layer (CHANNEL_REDIS_URL) to reach the web workers.
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from channels.layers import get_channel_layer
+from pylsl import LostError, StreamInlet, local_clock, resolve_streams
+from scipy.signal import lfilter, lfilter_zi
+
+from .latency import stamped
+from .scheduler import BandPowerScheduler
+from .utils import notch_coefficients
+
+log = logging.getLogger(__name__)
+
+
+def session_for(source_id):
+    """Default session id for a device: its source_id, made safe for a group name."""
+    return re.sub(r"[^0-9A-Za-z_.-]", "-", source_id)[:80]
+
+
+@dataclass
+class Headset:
+    source_id: str
+    session_id: str
+    name: str
+    inlet: object
+    fs: int
+    filter_state: np.ndarray | None = None
+    samples: int = 0
+    last_lsl_ts: float | None = None   # LSL timestamp of the newest sample pulled
+    clock_offset: float = 0.0          # time_correction(): device LSL clock -> ours
+    stamps: dict | None = None         # latency stamps of the newest chunk
+    # an inlet isn't safe to use from two threads at once: poll() on the loop,
+    # time_correction()/close_stream() in worker threads
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class HeadsetDaemon:
+    """
+    routes maps source_id -> session id; unrouted devices get session_for(source_id).
+    The first `n_channels` channels of each stream are used (the Muse's four
+    electrodes, like EEG_recording.INDEX_CHANNEL).
+    """
+
+    def __init__(self, routes=None, n_channels=4, tick_s=0.2, resolve_every=10.0,
+                 resolve_timeout=2.0, notch=True, channel_layer=None, log=print):
+        self.routes = dict(routes or {})
+        self.n_channels = n_channels
+        self.tick_s = tick_s
+        self.resolve_every = resolve_every
+        self.resolve_timeout = resolve_timeout
+        self.notch = notch
+        self.layer = channel_layer or get_channel_layer()
+        self.log = log
+        self.headsets = {}
+        self.schedulers = {}   # sample rate -> BandPowerScheduler
+
+    # --- devices ---
+
+    def _open(self, info):
+        # blocking (connects and measures the clock offset); runs in a worker thread
+        inlet = StreamInlet(info, max_chunklen=12, recover=False)
+        return inlet, inlet.time_correction()
+
+    def _close(self, hs):
+        # blocking: waits for a time_correction() in progress on this inlet
+        with hs.lock:
+            try:
+                hs.inlet.close_stream()
+            except Exception:
+                pass
+
+    async def discover(self):
+        """Resolves EEG streams and opens an inlet for each device not seen yet."""
+        infos = await asyncio.to_thread(resolve_streams, self.resolve_timeout)
+        for info in infos:
+            if info.type() != "EEG":
+                continue
+            key = info.source_id() or info.uid()
+            if key in self.headsets:
+                continue
+            fs = int(info.nominal_srate())
+            if not fs or info.channel_count() < self.n_channels:
+                self.log(f"Skipping {info.name()} ({key}): {info.channel_count()} channels at {fs} Hz")
+                continue
+            try:
+                inlet, offset = await asyncio.to_thread(self._open, info)
+            except Exception as e:
+                self.log(f"Could not open {info.name()} ({key}): {e}")
+                continue
+            await self.add(key, inlet, fs, info.name(), clock_offset=offset)
+
+    def refresh_clocks(self):
+        # blocking; the offset drifts, so it is re-measured with each discovery
+        for hs in list(self.headsets.values()):
+            with hs.lock:
+                try:
+                    hs.clock_offset = hs.inlet.time_correction(timeout=1)
+                except Exception:
+                    pass   # keep the last offset; a lost stream is dropped by poll()
+
+    async def add(self, key, inlet, fs, name="", clock_offset=0.0):
+        hs = Headset(key, self.routes.get(key) or session_for(key), name, inlet, fs, clock_offset=clock_offset)
+        scheduler = self.schedulers.get(fs)
+        if scheduler is None:
+            scheduler = self.schedulers[fs] = BandPowerScheduler(fs=fs, tick_s=self.tick_s)
+
+        async def deliver(powers):
+            await self.send(hs, powers, fft_at=scheduler.computed_at)
+
+        scheduler.add_session(key, self.n_channels, deliver)
+        self.headsets[key] = hs
+        self.log(f"Headset {name or key} ({key}, {fs} Hz) -> session {hs.session_id}")
+        await self._status(hs, "headset_connected")
+        return hs
+
+    async def drop(self, key, reason="stopped"):
+        hs = self.headsets.pop(key, None)
+        if hs is None:
+            return
+        self.schedulers[hs.fs].remove_session(key)
+        await asyncio.to_thread(self._close, hs)
+        self.log(f"Headset {hs.name or key} dropped ({reason}) after {hs.samples} samples")
+        await self._status(hs, "headset_disconnected")
+
+    # --- data ---
+
+    def poll(self):
+        """Drains every inlet into its scheduler; returns the keys of lost streams."""
+        lost = []
+        for key, hs in self.headsets.items():
+            if not hs.lock.acquire(blocking=False):
+                continue   # refresh_clocks() has the inlet; its samples wait for the next tick
+            try:
+                chunk, lsl_ts = hs.inlet.pull_chunk(timeout=0.0)
+            except LostError:
+                lost.append(key)
+                continue
+            finally:
+                hs.lock.release()
+            if not chunk:
+                continue
+            acquired, now_lsl = time.time(), local_clock()
+            # the newest sample's age on our LSL clock, taken off our wall clock
+            lat = {"sample": acquired - (now_lsl - (lsl_ts[-1] + hs.clock_offset)), "acquired": acquired}
+            x = np.asarray(chunk, dtype=float)[:, :self.n_channels]
+            if not np.isfinite(x).all():
+                # would poison the filter state and the scheduler rejects it anyway
+                log.warning("Dropping a non-finite chunk from %s", key)
+                continue
+            if self.notch:
+                b, a = notch_coefficients(hs.fs)
+                if hs.filter_state is None:
+                    hs.filter_state = np.tile(lfilter_zi(b, a), (self.n_channels, 1)).T
+                x, hs.filter_state = lfilter(b, a, x, axis=0, zi=hs.filter_state)
+                lat = stamped(lat, "filtered")
+            self.schedulers[hs.fs].push(key, x)
+            hs.samples += len(x)
+            hs.last_lsl_ts = lsl_ts[-1]
+            hs.stamps = lat
+        return lost
+
+    async def send(self, hs, powers, fft_at=None):
+        lat = stamped({**(hs.stamps or {}), "fft": fft_at}, "sent")
+        await self.layer.group_send(f"telemetry-{hs.session_id}", {
+            "type": "muse.powers",
+            "ts": lat["sent"],
+            "device": hs.source_id,
+            "powers": powers.tolist(),
+            "lat": lat,
+        })
+
+    async def _status(self, hs, message):
+        await self.layer.group_send(f"telemetry-{hs.session_id}", {
+            "type": "telemetry_event",
+            "payload": {"type": "status", "message": message, "device": hs.source_id},
+        })
+
+    # --- loop ---
+
+    async def _discover_forever(self):
+        while True:
+            try:
+                await self.discover()
+                await asyncio.to_thread(self.refresh_clocks)
+            except Exception as e:
+                self.log(f"Stream discovery failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(self.resolve_every)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        discovery = loop.create_task(self._discover_forever())
+        next_at = loop.time()
+        try:
+            while True:
+                for key in self.poll():
+                    await self.drop(key, "stream lost")
+                for scheduler in self.schedulers.values():
+                    await scheduler.tick()
+                next_at += self.tick_s
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+        finally:
+            discovery.cancel()
+            for key in list(self.headsets):
+                await self.drop(key)
+
+    def metrics(self):
+        return {
+            "headsets": {
+                key: {"session": hs.session_id, "fs": hs.fs, "samples": hs.samples}
+                for key, hs in self.headsets.items()
+            },
+            "schedulers": {fs: s.metrics() for fs, s in self.schedulers.items()},
+        }
@@ -0,0 +1,110 @@
+"""
+End-to-end latency of live EEG ticks, from the headset's sample to the browser.
+
+Each tick carries a `lat` dict of wall-clock stamps (time.time() seconds),
+added as it moves through the pipeline:
+
+    sample    newest LSL sample in the epoch, mapped from the headset's clock
+              to ours with inlet.time_correction()   (headsets.HeadsetDaemon)
+    acquired  pull_chunk returned it                  (HeadsetDaemon.poll)
+    filtered  notch filter done                       (HeadsetDaemon.poll)
+    fft       the scheduler's batch computed          (BandPowerScheduler.compute)
+    sent      group_send called                       (daemon / consumer)
+    received  the consumer got the event              (MuseConsumer)
+    out       scored and handed to the socket         (MuseConsumer)
+    browser   the browser got it                      (from its tick_ack)
+
+The browser's clock isn't ours, so it echoes `lat` back in a tick_ack and
+receipt is estimated as out + half the round trip. Each stage runs from
+the previous stamp that is present. A source without LSL times
+(muse_samples, bridges, replays) starts later in the list.
+
+record() puts each stage into the eeg_tick_latency_seconds histogram when
+core.metrics is enabled. The histogram is labelled by stage only, because
+session ids come from the client's WebSocket path and Prometheus series are
+never evicted. Per-session detail goes into rolling windows instead,
+capped at MAX_SESSIONS. summary() reports those windows as percentiles.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from core import metrics
+
+STAMPS = ("sample", "acquired", "filtered", "fft", "sent", "received", "out", "browser")
+# the stage ending at each stamp
+STAGES = {"acquired": "acquire", "filtered": "filter", "fft": "fft", "sent": "dispatch",
+          "received": "layer", "out": "score", "browser": "browser"}
+
+WINDOW = 1000         # ticks kept per session and stage
+MAX_SESSIONS = 200    # least recently updated sessions are forgotten first
+MAX_STAGE_S = 60.0    # anything longer is a bad clock or a forged ack, not latency
+
+_lock = threading.Lock()
+_windows = OrderedDict()   # session -> {stage: deque of seconds}
+
+
+def stamped(stamps, *names):
+    """A copy of `stamps` with each of `names` set to now, e.g. stamped(lat, "sent")."""
+    now = time.time()
+    return {**(stamps or {}), **{name: now for name in names}}
+
+
+def stages(stamps):
+    """[(stage, seconds)] between consecutive stamps present in `stamps`."""
+    present = [(k, stamps[k]) for k in STAMPS
+               if isinstance(stamps.get(k), (int, float)) and not isinstance(stamps.get(k), bool)]
+    return [(STAGES[b], tb - ta) for (_a, ta), (b, tb) in zip(present, present[1:])]
+
+
+def record(session_id, stamps, receipt=False):
+    """
+    Records the stages of one tick. The server-side stages are recorded when
+    the tick is sent. The browser's ack is recorded with receipt=True and adds
+    only the browser stage and the end-to-end total.
+    """
+    pairs = stages(stamps)
+    if receipt:
+        if not pairs or pairs[-1][0] != "browser":
+            return
+        pairs = [pairs[-1], ("total", sum(dt for _stage, dt in pairs))]
+    pairs = [(stage, dt) for stage, dt in pairs if 0 <= dt <= MAX_STAGE_S]
+    if not pairs:
+        return
+    if metrics.enabled():
+        for stage, dt in pairs:
+            metrics.observe("eeg_tick_latency_seconds", dt, stage=stage)
+    with _lock:
+        windows = _windows.pop(session_id, None) or {}
+        _windows[session_id] = windows
+        while len(_windows) > MAX_SESSIONS:
+            _windows.popitem(last=False)
+        for stage, dt in pairs:
+            windows.setdefault(stage, deque(maxlen=WINDOW)).append(dt)
+
+
+def summary(session_id=None):
+    """{session: {stage: {"count", "p50_ms", "p95_ms", "max_ms"}}} over the rolling windows."""
+    with _lock:
+        snapshot = {s: {stage: list(v) for stage, v in w.items()}
+                    for s, w in _windows.items() if session_id is None or s == session_id}
+    out = {}
+    for session, windows in snapshot.items():
+        order = [STAGES[k] for k in STAMPS[1:]] + ["total"]
+        out[session] = {}
+        for stage in sorted(windows, key=order.index):
+            v = np.asarray(windows[stage]) * 1e3
+            out[session][stage] = {
+                "count": len(v),
+                "p50_ms": round(float(np.percentile(v, 50)), 2),
+                "p95_ms": round(float(np.percentile(v, 95)), 2),
+                "max_ms": round(float(v.max()), 2),
+            }
+    return out
+
+
+def reset():
+    with _lock:
+        _windows.clear()
@@ -0,0 +1,43 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from impulse_monitoring.headsets import HeadsetDaemon
+
+
+class Command(BaseCommand):
+    help = "Stream band powers from every LSL EEG headset on the network to its telemetry session."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--route", action="append", default=[], metavar="SOURCE_ID=SESSION_ID",
+                            help="Send a device's features to a session (repeatable). "
+                                 "Unrouted devices use their source_id.")
+        parser.add_argument("--channels", type=int, default=4, help="Leading channels used per stream.")
+        parser.add_argument("--tick", type=float, default=0.2, help="Seconds between batches.")
+        parser.add_argument("--resolve-every", type=float, default=10.0, help="Seconds between stream scans.")
+        parser.add_argument("--no-notch", action="store_true", help="Skip the 55-65 Hz band-stop filter.")
+
+    def handle(self, *args, **options):
+        routes = {}
+        for route in options["route"]:
+            source, sep, session = route.partition("=")
+            if not sep or not source or not session:
+                raise CommandError(f"Bad --route {route!r}; expected SOURCE_ID=SESSION_ID")
+            routes[source] = session
+        if settings.CHANNEL_LAYERS["default"]["BACKEND"].endswith("InMemoryChannelLayer"):
+            self.stderr.write("Warning: the in-memory channel layer only reaches consumers in this "
+                              "process; set CHANNEL_REDIS_URL to reach the web workers.")
+
+        daemon = HeadsetDaemon(
+            routes=routes,
+            n_channels=options["channels"],
+            tick_s=options["tick"],
+            resolve_every=options["resolve_every"],
+            notch=not options["no_notch"],
+            log=self.stdout.write,
+        )
+        try:
+            asyncio.run(daemon.run())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from impulse_monitoring.models import EEGSession
+from impulse_monitoring.replay import EPOCH_RATE, BridgeSink, LayerSink, focus_scorer, load_powers, replay
+
+
+class Command(BaseCommand):
+    help = "Replay a recorded EEG session (CSV or stored EEGSession) into a live telemetry session."
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--csv", help="Recorder CSV (eeg_session_*.csv / eeg_band_powers_*.csv).")
+        source.add_argument("--session", type=int, help="EEGSession id.")
+        parser.add_argument("--to", required=True, metavar="SESSION_ID", help="Telemetry session to play into.")
+        parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (1 = real time).")
+        parser.add_argument("--epoch-rate", type=float, default=EPOCH_RATE, help="Epochs per second at 1x.")
+        parser.add_argument("--loops", type=int, default=1, help="Times to play the recording (0 = forever).")
+        parser.add_argument("--url", help="Send as a bridge over ws://host:port instead of via the channel layer.")
+        parser.add_argument("--user", metavar="EMAIL",
+                            help="Score focus against this user's baseline (default: the stored session's owner).")
+
+    def handle(self, *args, **options):
+        if options["speed"] <= 0:
+            raise CommandError("--speed must be positive")
+        try:
+            powers = load_powers(options["csv"], options["session"])
+        except (OSError, ValueError, EEGSession.DoesNotExist) as e:
+            raise CommandError(f"Can't load the recording: {e}")
+        if not len(powers):
+            raise CommandError("The recording has no epochs.")
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(email=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user {options['user']}")
+        scorer = focus_scorer(powers.shape[2], user, options["session"])
+        if scorer is None:
+            self.stderr.write("Warning: no ready baseline for this recording; ticks carry no focus "
+                              "unless a viewer has a baseline of their own.")
+
+        if options["url"]:
+            sink = BridgeSink(options["to"], options["url"])
+        else:
+            if settings.CHANNEL_LAYERS["default"]["BACKEND"].endswith("InMemoryChannelLayer"):
+                self.stderr.write("Warning: the in-memory channel layer only reaches consumers in this "
+                                  "process; set CHANNEL_REDIS_URL or use --url to reach a running server.")
+            sink = LayerSink(options["to"])
+        n_epochs, _, n_channels = powers.shape
+        self.stdout.write(f"Replaying {n_epochs} epochs x {n_channels} channels into telemetry-{options['to']} "
+                          f"at {options['speed']}x ({n_epochs / options['epoch_rate'] / options['speed']:.1f} s per pass)")
+        try:
+            stats = asyncio.run(replay(powers, sink, options["speed"], options["epoch_rate"], options["loops"],
+                                       scorer=scorer))
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(json.dumps(stats.summary()))
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_started_at(apps, schema_editor):
+    # existing rows only know when their CSV was uploaded
+    EEGSession = apps.get_model('impulse_monitoring', 'EEGSession')
+    EEGSession.objects.update(started_at=F('uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('impulse_monitoring', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='eegsession',
+            options={'ordering': ['-started_at']},
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='alpha',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='band_powers',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='beta',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='delta',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='duration_s',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='gamma',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='n_channels',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='n_epochs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='theta',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eegsession',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='eeg_sessions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='eegsession',
+            name='csv_file',
+            field=models.FileField(blank=True, upload_to='eeg_data/'),
+        ),
+        migrations.AddIndex(
+            model_name='eegsession',
+            index=models.Index(fields=['user', '-started_at'], name='impulse_mon_user_id_64d5ad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eegsession',
+            index=models.Index(fields=['started_at'], name='impulse_mon_started_630deb_idx'),
+        ),
+        migrations.RunPython(backfill_started_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('impulse_monitoring', '0002_eegsession_user_band_powers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EEGBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n_channels', models.PositiveSmallIntegerField()),
+                ('weight', models.FloatField(default=0)),
+                ('mean', models.BinaryField()),
+                ('m2', models.BinaryField()),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eeg_baselines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'n_channels'), name='unique_eeg_baseline_per_layout')],
+            },
+        ),
+    ]
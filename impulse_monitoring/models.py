@@ -1,14 +1,76 @@
+import numpy as np
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+BANDS = ("Delta", "Theta", "Alpha", "Beta", "Gamma")
+
 
 class EEGSession(models.Model):
-    # Field to store the CSV file uploaded by the user
-    csv_file = models.FileField(upload_to='eeg_data/')
-    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name='eeg_sessions', blank=True, null=True,
+    )
+    started_at = models.DateTimeField(default=timezone.now)
+    duration_s = models.FloatField(default=0)
+
+    # Per-epoch log10 band powers, float32 little-endian, shape
+    # (n_epochs, len(BANDS), n_channels). See impulse_monitoring.sessions.
+    band_powers = models.BinaryField(blank=True, null=True)
+    n_epochs = models.PositiveIntegerField(default=0)
+    n_channels = models.PositiveSmallIntegerField(default=0)
+
+    # Session means per band (over epochs and channels), so history and trend
+    # queries never have to decode band_powers
+    delta = models.FloatField(blank=True, null=True)
+    theta = models.FloatField(blank=True, null=True)
+    alpha = models.FloatField(blank=True, null=True)
+    beta = models.FloatField(blank=True, null=True)
+    gamma = models.FloatField(blank=True, null=True)
+
+    # Legacy: uploaded CSV. Recorded sessions keep only band_powers.
+    csv_file = models.FileField(upload_to='eeg_data/', blank=True)
+
     # Analysis fields
     dominant_band = models.CharField(max_length=100, blank=True, null=True)
     inferred_state = models.TextField(blank=True, null=True)
     avg_power = models.FloatField(blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['user', '-started_at']),
+            models.Index(fields=['started_at']),
+        ]
+
     def __str__(self):
         return f"Session {self.id} - {self.dominant_band}"
+
+    def powers(self):
+        """band_powers as a (n_epochs, len(BANDS), n_channels) float32 array."""
+        if not self.band_powers:
+            return np.zeros((0, len(BANDS), self.n_channels), dtype=np.float32)
+        return np.frombuffer(bytes(self.band_powers), dtype="<f4").reshape(
+            self.n_epochs, len(BANDS), self.n_channels)
+
+
+class EEGBaseline(models.Model):
+    # Running per-band, per-channel mean/variance of a user's epoch band powers
+    # (Welford / Chan et al. merge), updated once per completed session.
+    # mean and m2 are float64 little-endian arrays of shape (len(BANDS), n_channels).
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='eeg_baselines')
+    n_channels = models.PositiveSmallIntegerField()
+    weight = models.FloatField(default=0)   # epochs folded in, capped (see baselines.BASELINE_MAX_EPOCHS)
+    mean = models.BinaryField()
+    m2 = models.BinaryField()
+    sessions = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'n_channels'], name='unique_eeg_baseline_per_layout'),
+        ]
+
+    def __str__(self):
+        return f"Baseline {self.user_id} ({self.n_channels} ch, {self.sessions} sessions)"
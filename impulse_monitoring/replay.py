@@ -0,0 +1,160 @@
+"""
+Replaying recorded band powers into a live telemetry session.
+
+A recording is sent through the same MuseConsumer code that handles a live
+headset, one epoch at a time and paced on an absolute schedule. The source
+is a recorder CSV (anything sessions.read_band_csv accepts) or a stored
+EEGSession. Sleeps never accumulate drift, so a 60 s session takes 60 s / speed.
+There are two ways in:
+
+- LayerSink: group_send a "muse.powers" event to telemetry-<session>, as
+  the headset daemon does. Every connected browser scores it against its own
+  user's baseline. It needs a channel layer shared with the web process
+  (CHANNEL_REDIS_URL), or a caller in that process.
+- BridgeSink: connect to /ws/muse/<session>/ as the bridge script does and
+  send muse_features. This goes through MuseConsumer.receive and works
+  against any running server.
+
+Each frame also carries the focus the recording scores against a baseline
+(focus_scorer: a named user's, else the stored session's owner's). Consumers
+that have no baseline of their own, such as the anonymous bridge socket,
+show that focus instead of the neutral 0.5.
+
+With the same input, speed and loops, a replay sends the same messages in
+the same order, so a focus-score issue or a soak test can be reproduced
+without a headset.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .baselines import live_scorers
+from .models import EEGSession
+from .sessions import read_band_csv
+
+# the recorder's 0.2 s shift
+EPOCH_RATE = 5.0
+# sends whose lag is kept for the percentiles; loops=0 runs forever
+LAG_WINDOW = 10000
+
+
+def load_powers(csv_path=None, session_id=None):
+    """(n_epochs, len(BANDS), n_channels) powers from a CSV path or an EEGSession id."""
+    if csv_path:
+        with open(csv_path, newline="") as f:
+            return read_band_csv(f)
+    return EEGSession.objects.get(pk=session_id).powers()
+
+
+def focus_scorer(n_channels, user=None, session_id=None):
+    """LiveScorer from `user`'s baseline, else the stored session owner's; None without a ready one."""
+    if user is None and session_id is not None:
+        user = EEGSession.objects.select_related("user").get(pk=session_id).user
+    return live_scorers(user).get(n_channels)
+
+
+class LayerSink:
+    def __init__(self, session_id, layer=None):
+        from channels.layers import get_channel_layer
+        self.group = f"telemetry-{session_id}"
+        self.layer = layer or get_channel_layer()
+
+    async def open(self):
+        pass
+
+    async def send(self, powers, focus=None):
+        now = time.time()
+        event = {"type": "muse.powers", "ts": now, "device": "replay", "powers": powers, "lat": {"sent": now}}
+        if focus is not None:
+            event["focus"] = focus
+        await self.layer.group_send(self.group, event)
+
+    async def close(self):
+        pass
+
+
+class BridgeSink:
+    def __init__(self, session_id, url):
+        self.url = f"{url.rstrip('/')}/ws/muse/{session_id}/"
+        self.ws = None
+        self._reader = None
+
+    async def open(self):
+        from websockets.asyncio.client import connect
+        self.ws = await connect(self.url)
+        self._reader = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        # the bridge is in the telemetry group too; keep its copies from piling up
+        async for _ in self.ws:
+            pass
+
+    async def send(self, powers, focus=None):
+        msg = {"kind": "muse_features", "ts": time.time(), "powers": powers}
+        if focus is not None:
+            msg["focus"] = focus
+        await self.ws.send(json.dumps(msg))
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+            self._reader.cancel()
+
+
+@dataclass
+class ReplayStats:
+    sent: int = 0
+    # how late each of the last LAG_WINDOW sends was against the schedule
+    lag_s: deque = field(default_factory=lambda: deque(maxlen=LAG_WINDOW))
+    max_lag_s: float = 0.0
+    elapsed_s: float = 0.0
+
+    def add_lag(self, lag):
+        self.lag_s.append(lag)
+        self.max_lag_s = max(self.max_lag_s, lag)
+
+    def summary(self):
+        lag = np.asarray(self.lag_s or [0.0]) * 1e3
+        return {
+            "sent": self.sent,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "lag_ms_p50": round(float(np.percentile(lag, 50)), 2),
+            "lag_ms_p95": round(float(np.percentile(lag, 95)), 2),
+            "lag_ms_max": round(self.max_lag_s * 1e3, 2),
+        }
+
+
+async def replay(powers, sink, speed=1.0, epoch_rate=EPOCH_RATE, loops=1, on_epoch=None, scorer=None):
+    """
+    Sends each epoch of `powers` to `sink` every 1 / (epoch_rate * speed)
+    seconds, `loops` times (0 = forever), with its focus under `scorer` if
+    given. Returns ReplayStats.
+    """
+    rows = [p.ravel().astype(float).round(6).tolist() for p in np.asarray(powers)]   # band-major, like compute_band_powers
+    focus = [round(scorer.score(row)[0], 6) if scorer else None for row in rows]
+    interval = 1.0 / (epoch_rate * speed)
+    stats = ReplayStats()
+    loop = asyncio.get_running_loop()
+    await sink.open()
+    try:
+        start = loop.time()
+        i = 0
+        while rows and (not loops or i < loops * len(rows)):
+            due = start + i * interval
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            stats.add_lag(max(0.0, -delay))
+            await sink.send(rows[i % len(rows)], focus[i % len(rows)])
+            stats.sent += 1
+            if on_epoch:
+                on_epoch(i)
+            i += 1
+        stats.elapsed_s = loop.time() - start
+    finally:
+        await sink.close()
+    return stats
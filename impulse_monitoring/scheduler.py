@@ -0,0 +1,226 @@
+"""
+One batched band-power computation per tick for every live EEG stream.
+
+Each session pushes raw samples as they arrive. Once per tick the scheduler
+takes the last epoch of every session that received data, lays them
+side by side as columns of one (epoch, total channels) matrix, and runs a
+single windowed rfft plus band reduction over it. It then hands each session
+its own slice. With many headsets that replaces hundreds of tiny
+compute_band_powers calls (where numpy call overhead dominates) with one
+call over a larger array.
+
+Output per session is the band-major vector compute_band_powers returns.
+metrics() reports batch sizes, latencies and delivery errors. A consumer
+that raises is logged and counted, and the other sessions still get their
+epoch. run() sleeps on an event while no sessions are registered.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .spectral import band_bins, nextpow2
+
+_METRIC_WINDOW = 1000   # ticks / deliveries kept for percentiles
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class _Session:
+    n_channels: int
+    consumer: object
+    buffer: np.ndarray
+    pending_since: float | None = None
+    delivered: int = 0
+    key: object = None
+
+
+@dataclass
+class _Stats:
+    ticks: int = 0
+    delivery_errors: int = 0
+    batch_sessions: deque = field(default_factory=lambda: deque(maxlen=_METRIC_WINDOW))
+    batch_columns: deque = field(default_factory=lambda: deque(maxlen=_METRIC_WINDOW))
+    compute_s: deque = field(default_factory=lambda: deque(maxlen=_METRIC_WINDOW))
+    latency_s: deque = field(default_factory=lambda: deque(maxlen=_METRIC_WINDOW))
+
+
+def _pct(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+class BandPowerScheduler:
+    """
+    add_session(key, n_channels, consumer) registers a stream; push(key, samples)
+    feeds it (samples: (M, n_channels)); every `tick_s` run() computes all due
+    epochs in one batch and calls consumer(band_powers) for each (plain
+    callables or coroutine functions).
+    """
+
+    def __init__(self, fs=256, epoch_s=1.0, tick_s=0.2):
+        self.fs = fs
+        self.n = int(epoch_s * fs)
+        self.tick_s = tick_s
+        self.sessions = {}
+        self.stats = _Stats()
+        self.computed_at = None   # wall clock of the last batch, for latency stamps
+        self._task = None
+        self._has_sessions = None   # asyncio.Event of the loop run() is on
+        # precomputed once; every tick reuses them
+        self._window = np.hamming(self.n)[:, None]
+        self._bins, avg = band_bins(self.n, fs)
+        self._reduce = (avg * (2.0 / self.n)).T
+        self._nfft = nextpow2(self.n)
+
+    def add_session(self, key, n_channels, consumer):
+        # zeros before the first epoch fills, like the recorder's buffer
+        self.sessions[key] = _Session(n_channels, consumer, np.zeros((self.n, n_channels)), key=key)
+        if self._has_sessions is not None:
+            self._has_sessions.set()
+
+    def remove_session(self, key):
+        self.sessions.pop(key, None)
+
+    def push(self, key, samples):
+        """
+        Appends (n, n_channels) samples to the session's window. Anything else
+        (another channel count, non-numeric or non-finite values) raises
+        ValueError and leaves the window as it was.
+        """
+        s = self.sessions[key]
+        try:
+            x = np.asarray(samples, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("samples must be numeric")
+        if x.ndim != 2 or x.shape[1] != s.n_channels:
+            raise ValueError(f"expected (n, {s.n_channels}) samples, got shape {x.shape}")
+        if not np.isfinite(x).all():
+            raise ValueError("samples must be finite")
+        if len(x) >= self.n:
+            s.buffer = x[-self.n:].copy()
+        elif len(x):
+            s.buffer = np.concatenate([s.buffer[len(x):], x])
+        if s.pending_since is None:
+            s.pending_since = time.monotonic()
+
+    def band_powers(self, windows):
+        """
+        compute_band_powers() for every column of `windows` (epoch samples,
+        columns) in one pass; returns (5, columns) log10 band powers.
+        """
+        x = (windows - windows.mean(axis=0)) * self._window
+        spec = np.abs(np.fft.rfft(x, n=self._nfft, axis=0)[self._bins])
+        return np.log10(self._reduce @ spec + 1e-8)
+
+    def compute(self):
+        """One batch: [(session, band_powers)] for every session with new samples."""
+        due = [s for s in self.sessions.values() if s.pending_since is not None]
+        if not due:
+            return []
+        t0 = time.perf_counter()
+        powers = self.band_powers(np.concatenate([s.buffer for s in due], axis=1))
+        out, col = [], 0
+        for s in due:
+            out.append((s, powers[:, col:col + s.n_channels].ravel()))
+            col += s.n_channels
+        st = self.stats
+        st.ticks += 1
+        st.batch_sessions.append(len(due))
+        st.batch_columns.append(col)
+        st.compute_s.append(time.perf_counter() - t0)
+        self.computed_at = time.time()
+        return out
+
+    def _delivery_failed(self, key, exc):
+        self.stats.delivery_errors += 1
+        log.error("Band-power delivery to %r failed", key, exc_info=(type(exc), exc, exc.__traceback__))
+
+    async def tick(self):
+        results = self.compute()
+        now = time.monotonic()
+        keys, calls = [], []
+        for s, powers in results:
+            self.stats.latency_s.append(now - s.pending_since)
+            s.pending_since = None
+            s.delivered += 1
+            try:
+                r = s.consumer(powers)
+            except Exception as e:
+                self._delivery_failed(s.key, e)
+                continue
+            if inspect.isawaitable(r):
+                keys.append(s.key)
+                calls.append(r)
+        if calls:
+            for key, r in zip(keys, await asyncio.gather(*calls, return_exceptions=True)):
+                if isinstance(r, Exception):
+                    self._delivery_failed(key, r)
+        return len(results)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._has_sessions = asyncio.Event()
+        next_at = loop.time()
+        while True:
+            if not self.sessions:
+                # idle until add_session(); then tick from now, not from before the wait
+                self._has_sessions.clear()
+                await self._has_sessions.wait()
+                next_at = loop.time()
+            await self.tick()
+            next_at += self.tick_s
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+    def ensure_running(self):
+        """Starts run() on the current event loop if it isn't already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def metrics(self):
+        st = self.stats
+        return {
+            "sessions": len(self.sessions),
+            "ticks": st.ticks,
+            "delivery_errors": st.delivery_errors,
+            "batch_sessions_mean": float(np.mean(st.batch_sessions)) if st.batch_sessions else None,
+            "batch_sessions_max": max(st.batch_sessions, default=None),
+            "batch_columns_mean": float(np.mean(st.batch_columns)) if st.batch_columns else None,
+            "compute_ms_p50": _scale(_pct(st.compute_s, 50)),
+            "compute_ms_p95": _scale(_pct(st.compute_s, 95)),
+            "latency_ms_p50": _scale(_pct(st.latency_s, 50)),
+            "latency_ms_p95": _scale(_pct(st.latency_s, 95)),
+        }
+
+
+def _scale(seconds):
+    return None if seconds is None else seconds * 1e3
+
+
+_SCHEDULER = None
+
+
+def get_scheduler():
+    """The process-wide scheduler (EEG_SAMPLE_RATE, default 256 Hz)."""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        from django.conf import settings
+        _SCHEDULER = BandPowerScheduler(fs=getattr(settings, "EEG_SAMPLE_RATE", 256))
+    return _SCHEDULER
+
+
+def scheduler_metrics():
+    """The process scheduler's metrics() as a core.metrics collector (nothing until it exists)."""
+    if _SCHEDULER is None:
+        return []
+    m = _SCHEDULER.metrics()
+    return [
+        (f"eeg_scheduler_{name}", "gauge", f"BandPowerScheduler {name}.",
+         [({}, m[name])])
+        for name in ("sessions", "ticks", "delivery_errors", "batch_sessions_mean", "compute_ms_p50",
+                     "compute_ms_p95", "latency_ms_p50", "latency_ms_p95")
+    ]
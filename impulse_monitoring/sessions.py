@@ -0,0 +1,105 @@
+"""
+Storing recorded EEG sessions and querying a user's history.
+
+A session's per-epoch band powers live in one EEGSession row as a float32 blob
+(see EEGSession.powers) next to per-band means, so listing sessions or plotting
+a trend is an indexed query on (user, started_at) that never touches a CSV or
+decodes a blob. Only per-epoch views of a single session unpack band_powers.
+"""
+import csv
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .baselines import classify, get_baseline, update_baseline
+from .eeg_analyzer import STATE_MAP
+from .models import BANDS, EEGSession
+
+# Columns that summarise a session; what history/trend queries load
+SUMMARY_FIELDS = ("id", "started_at", "duration_s", "n_epochs", "dominant_band", "avg_power") + tuple(
+    band.lower() for band in BANDS)
+
+
+def read_band_csv(fobj):
+    """
+    Band powers from a recording CSV as (n_epochs, len(BANDS), n_channels) float32.
+    Accepts both layouts in use: EEG_recording.py's "Timestamp, Delta_Ch1, ...,
+    Gamma_Ch4" and the single-channel "Delta, Theta, Alpha, Beta, Gamma".
+    """
+    reader = csv.reader(fobj)
+    header = next(reader)
+    columns = [[i for i, name in enumerate(header) if name.split("_")[0] == band] for band in BANDS]
+    n_channels = len(columns[0])
+    if not n_channels or any(len(cols) != n_channels for cols in columns):
+        raise ValueError(f"Unrecognised band power header: {header}")
+    order = [i for cols in columns for i in cols]
+    rows = []
+    for line, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        try:
+            rows.append([float(row[i]) for i in order])
+        except (IndexError, ValueError):
+            raise ValueError(f"Bad band power row on line {line}: {row}")
+    return np.asarray(rows, dtype=np.float32).reshape(len(rows), len(BANDS), n_channels)
+
+
+def band_means(powers):
+    """{band: mean} over all epochs and channels."""
+    means = powers.mean(axis=(0, 2), dtype=np.float64) if len(powers) else np.full(len(BANDS), np.nan)
+    return {band: float(m) for band, m in zip(BANDS, means)}
+
+
+def save_session(powers, user=None, started_at=None, duration_s=None, epoch_rate=5.0):
+    """
+    Creates an EEGSession from a (n_epochs, len(BANDS), n_channels) array.
+    `epoch_rate` (epochs/s, 5 for the recorder's 0.2 s shift) estimates the
+    duration when it isn't given.
+
+    For signed-in users the dominant band is judged against their baseline as
+    it stood before this session, then the session is folded into it.
+    """
+    powers = np.ascontiguousarray(powers, dtype="<f4")
+    n_epochs, _, n_channels = powers.shape
+    user = user if user is not None and user.is_authenticated else None
+    means = band_means(powers)
+    dominant, _score = classify(powers, get_baseline(user, n_channels)) if n_epochs else (None, None)
+    with transaction.atomic():
+        session = EEGSession.objects.create(
+            user=user,
+            started_at=started_at or timezone.now(),
+            duration_s=duration_s if duration_s is not None else n_epochs / epoch_rate,
+            band_powers=powers.tobytes(),
+            n_epochs=n_epochs,
+            n_channels=n_channels,
+            dominant_band=dominant,
+            inferred_state=STATE_MAP.get(dominant, "Unknown State"),
+            avg_power=means[dominant] if dominant else None,
+            **{band.lower(): value for band, value in means.items()},
+        )
+        if user is not None and n_epochs:
+            update_baseline(user, powers)
+    return session
+
+
+def session_history(user, limit=50):
+    """The user's most recent sessions as summary dicts, newest first."""
+    return list(
+        EEGSession.objects.filter(user=user).order_by("-started_at").values(*SUMMARY_FIELDS)[:limit]
+    )
+
+
+def band_trend(user, days=30):
+    """Per-day mean band powers ({"day", "sessions", "avg_delta", ...}) over the last `days` days."""
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        EEGSession.objects.filter(user=user, started_at__gte=since)
+        .annotate(day=TruncDate("started_at"))
+        .values("day")
+        .annotate(sessions=Count("id"), **{f"avg_{band.lower()}": Avg(band.lower()) for band in BANDS})
+        .order_by("day")
+    )
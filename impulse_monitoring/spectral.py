@@ -0,0 +1,147 @@
+"""
+Incremental band powers for live EEG.
+
+utils.compute_band_powers re-windows and re-FFTs the whole 1 s epoch every
+0.2 s tick, although 80% of the samples are the same as last tick.
+BandPowerTracker keeps, per channel, running DTFT sums at only the
+frequencies the five bands need and slides them forward by the samples that
+arrived. Its output matches compute_band_powers on the same epoch to float
+rounding (see benchmarks/bench_spectral.py).
+
+For a frequency w, T(w) = sum_n x[n] e^{-iwn} over the current window.
+Shifting the window by M samples:
+
+    T'(w) = e^{iwM} (T(w) - sum_{j<M} x_old[j] e^{-iwj}) + sum_{j<M} x_new[j] e^{-iw(N-M+j)}
+
+which is exact for any w, so it also covers:
+- zero padding to NFFT (w = 2*pi*k/NFFT)
+- the symmetric Hamming window. That is a - b*cos(2*pi*n/(N-1)), i.e.
+  three exponentials, so the windowed bin is a*T(w_k) - b/2*(T(w_k - t) + T(w_k + t)).
+- removing the epoch mean. It subtracts mean * (window's DFT at w_k), using
+  a running sum.
+
+Rounding drift is removed by recomputing the sums from the ring buffer every
+`resync_every` samples. numpy only, so it can be imported from the recorder
+script as well as from Django code.
+"""
+import numpy as np
+
+BANDS = ("Delta", "Theta", "Alpha", "Beta", "Gamma")
+
+
+def nextpow2(i):
+    n = 1
+    while n < i:
+        n *= 2
+    return n
+
+
+def band_bins(n_samples, fs):
+    """
+    (bin indices, (len(bins), len(BANDS)) averaging matrix) with the same bin
+    selection as compute_band_powers, including its frequency axis.
+    """
+    nfft = nextpow2(n_samples)
+    f = fs / 2 * np.linspace(0, 1, int(nfft / 2))
+    masks = [f < 4, (f >= 4) & (f <= 8), (f >= 8) & (f <= 12), (f >= 12) & (f < 30), (f >= 30) & (f <= 45)]
+    bins = np.flatnonzero(np.any(masks, axis=0))
+    avg = np.stack([m[bins] / m.sum() for m in masks], axis=1)
+    return bins, avg
+
+
+class BandPowerTracker:
+    """
+    Sliding band powers for `n_channels` channels over an `n_samples` window.
+    update(new_samples) takes (M, n_channels) samples and returns the same
+    band-major feature vector compute_band_powers would return for the last
+    n_samples samples (zeros before the window has filled, like the recorder's
+    buffer).
+    """
+
+    def __init__(self, n_samples, fs, n_channels, resync_every=None):
+        self.n = n = int(n_samples)
+        self.n_channels = n_channels
+        self.resync_every = int(resync_every or 30 * fs)
+        nfft = nextpow2(n)
+        bins, band_avg = band_bins(n, fs)
+        # PSD = 2 |Y| / N folded into the band averaging
+        self.band_avg_t = (band_avg * (2.0 / n)).T
+        w = 2 * np.pi * bins / nfft
+        t = 2 * np.pi / (n - 1)
+        # frequencies tracked: [w_k, w_k - t, w_k + t] for each needed bin
+        self.omega = np.concatenate([w, w - t, w + t])
+        self.k = len(bins)
+        idx = np.arange(n)
+        self.phase = np.exp(-1j * np.outer(idx, self.omega))    # (N, 3K)
+        # Hamming coefficients (np.hamming: 0.54 - 0.46 cos(2 pi n / (N-1)))
+        self.a, self.b = 0.54, 0.46
+        self.window_dft = np.hamming(n) @ np.exp(-1j * np.outer(idx, w))   # (K,)
+        self._steps = {}
+        self.ring = np.zeros((n, n_channels))
+        self.pos = 0                       # ring index of the oldest sample
+        self.sums = np.zeros((3 * self.k, n_channels), dtype=complex)
+        self.total = np.zeros(n_channels)
+        self._since_sync = 0
+
+    def _step(self, m):
+        # (e^{iwM}, stacked phases) so a shift by m samples is one multiply + one matmul:
+        # T' = e^{iwM} T + Q^T [x_old; x_new] with Q = [-e^{iwM} e^{-iwj}; e^{-iw(N-M+j)}]
+        step = self._steps.get(m)
+        if step is None:
+            rot = np.exp(1j * self.omega * m)
+            q = np.concatenate([-self.phase[:m] * rot, self.phase[self.n - m:]]).T
+            # real rows, imaginary rows, then a -1/+1 row for the running sum: the
+            # samples are real, so the whole update is one real matmul
+            dc = np.concatenate([-np.ones(m), np.ones(m)])
+            step = self._steps[m] = (rot[:, None], np.vstack([q.real, q.imag, dc]))
+        return step
+
+    def window(self):
+        """The current window, oldest sample first."""
+        return np.roll(self.ring, -self.pos, axis=0)
+
+    def resync(self):
+        x = self.window()
+        self.sums = self.phase.T @ x
+        self.total = x.sum(axis=0)
+        self._since_sync = 0
+
+    def update(self, new_samples):
+        x_new = np.asarray(new_samples, dtype=float).reshape(-1, self.n_channels)
+        m = len(x_new)
+        if m >= self.n:
+            self.ring[:] = x_new[-self.n:]
+            self.pos = 0
+            self.resync()
+            return self.features()
+        if m:
+            pos, end = self.pos, self.pos + m
+            if end <= self.n:
+                x_old = self.ring[pos:end]
+            else:
+                x_old = np.concatenate([self.ring[pos:], self.ring[:end - self.n]])
+            rot, q = self._step(m)
+            f = 3 * self.k
+            delta = q @ np.concatenate([x_old, x_new])
+            self.sums *= rot
+            self.sums.real += delta[:f]
+            self.sums.imag += delta[f:2 * f]
+            self.total += delta[2 * f]
+            if end <= self.n:
+                self.ring[pos:end] = x_new
+            else:
+                self.ring[pos:] = x_new[:self.n - pos]
+                self.ring[:end - self.n] = x_new[self.n - pos:]
+            self.pos = end % self.n
+            self._since_sync += m
+            if self._since_sync >= self.resync_every:
+                self.resync()
+        return self.features()
+
+    def features(self):
+        k = self.k
+        s = self.sums
+        y = self.a * s[:k] - 0.5 * self.b * (s[k:2 * k] + s[2 * k:])
+        y -= self.window_dft[:, None] * (self.total / self.n)
+        band = self.band_avg_t @ np.abs(y)           # (len(BANDS), n_channels)
+        return np.log10(band.ravel() + 1e-8)
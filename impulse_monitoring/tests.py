@@ -1,3 +1,395 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import metrics
+from core.models import User
+from . import latency, utils
+from .baselines import BASELINE_MIN_EPOCHS
+from .models import BANDS
+from .replay import focus_scorer, load_powers, replay
+from .spectral import BandPowerTracker
+from .sessions import band_trend, read_band_csv, save_session, session_history
+from .scheduler import BandPowerScheduler
+
+# Modules the live DSP path must not pull in at import time
+HEAVY = ("matplotlib", "sklearn", "scipy", "pandas")
+DSP_MODULES = ("impulse_monitoring.utils", "impulse_monitoring.spectral", "impulse_monitoring.scheduler")
+
+# Measured in a fresh interpreter on top of numpy, which every caller has
+# loaded anyway. Today it's ~60 ms / ~7 MB; scipy.signal alone is ~1.4 s / ~80 MB.
+IMPORT_BUDGET_S = 0.5
+RSS_BUDGET_MB = 20
+
+_PROBE = """
+import importlib, json, os, resource, sys, time
+import numpy
+def rss_mb():
+    try:   # current RSS on Linux; peak RSS elsewhere
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+rss0, t0 = rss_mb(), time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(json.dumps({
+    "seconds": time.perf_counter() - t0,
+    "rss_mb": rss_mb() - rss0,
+    "modules": sorted({m.split(".")[0] for m in sys.modules}),
+}))
+"""
+
+
+class DSPImportCostTests(SimpleTestCase):
+    """compute_band_powers & co. must stay cheap to import (no plotting/ML/scipy at import time)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE, *DSP_MODULES],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent.parent,
+        )
+        cls.probe = json.loads(out.stdout.strip().splitlines()[-1])
+
+    def test_no_heavy_imports(self):
+        loaded = set(HEAVY) & set(self.probe["modules"])
+        self.assertFalse(loaded, f"DSP modules import {sorted(loaded)} at import time")
+
+    def test_import_time(self):
+        self.assertLess(self.probe["seconds"], IMPORT_BUDGET_S)
+
+    def test_import_rss(self):
+        self.assertLess(self.probe["rss_mb"], RSS_BUDGET_MB)
+
+
+class BandPowerTrackerTests(SimpleTestCase):
+    """The sliding DFT must match compute_band_powers on the last window, tick for tick."""
+
+    fs, channels = 256, 4
+    TOLERANCE = 1e-9   # log10 power
+
+    def stream(self, seconds, rng):
+        t = np.arange(int(self.fs * seconds)) / self.fs
+        alpha = 30 * np.sin(2 * np.pi * 10 * t)[:, None]
+        return rng.normal(0, 15, (len(t), self.channels)) + alpha + 800   # Muse-like DC offset
+
+    def test_matches_compute_band_powers(self):
+        rng = np.random.default_rng(0)
+        n = self.fs   # the recorder's 1 s epoch
+        x = self.stream(40, rng)   # wraps the ring many times and crosses a resync (30 s)
+        tracker = BandPowerTracker(n, self.fs, self.channels)
+        buf = np.zeros((n, self.channels))
+        i, ticks = 0, 0
+        while i < len(x):
+            # irregular chunks around the 0.2 s shift, now and then longer than the window
+            size = n + 7 if ticks % 50 == 49 else int(rng.integers(1, self.fs // 5 + 10))
+            chunk = x[i:i + size]
+            i += len(chunk)
+            buf = np.concatenate([buf, chunk])[-n:]
+            expected = utils.compute_band_powers(buf, self.fs)
+            np.testing.assert_allclose(tracker.update(chunk), expected, rtol=0, atol=self.TOLERANCE,
+                                       err_msg=f"tick {ticks}")
+            ticks += 1
+        self.assertGreater(ticks, 200)
+
+
+@override_settings(METRICS_ENABLED=True)
+class TickLatencyTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        latency.reset()
+        self.addCleanup(metrics.reset)
+        self.addCleanup(latency.reset)
+
+    def test_sessions_from_clients_dont_add_metric_series(self):
+        for i in range(latency.MAX_SESSIONS + 50):
+            latency.record(f"s{i}", {"sent": 1.0, "received": 1.01, "out": 1.02})
+        series = [line for line in metrics.render().splitlines() if line.startswith("eeg_tick_latency_seconds_count")]
+        self.assertEqual(len(series), 2)   # layer, score
+        self.assertNotIn("session=", metrics.render())
+        self.assertEqual(len(latency.summary()), latency.MAX_SESSIONS)
+
+
+class BandPowerSchedulerTests(SimpleTestCase):
+    def test_failing_consumers_are_logged_and_counted(self):
+        scheduler = BandPowerScheduler()
+        delivered = []
+
+        async def broken(powers):
+            raise ValueError("socket gone")
+
+        scheduler.add_session("broken", 4, broken)
+        scheduler.add_session("sync_broken", 4, lambda powers: 1 / 0)
+        scheduler.add_session("ok", 4, delivered.append)
+        for key in scheduler.sessions:
+            scheduler.push(key, np.ones((10, 4)))
+        with self.assertLogs("impulse_monitoring.scheduler", "ERROR") as logs:
+            self.assertEqual(asyncio.run(scheduler.tick()), 3)
+        self.assertEqual(len(delivered), 1)
+        self.assertEqual(scheduler.metrics()["delivery_errors"], 2)
+        self.assertEqual(len(logs.records), 2)
+
+    def test_push_rejects_malformed_samples(self):
+        scheduler = BandPowerScheduler()
+        scheduler.add_session("s", 4, lambda powers: None)
+        scheduler.push("s", np.ones((10, 4)))
+        window = scheduler.sessions["s"].buffer.copy()
+        for samples in (np.ones((10, 2)), np.ones(40), [["a"] * 4], [{"x": 1}] * 4,
+                        [[1.0, 2.0, np.nan, 4.0]], [[np.inf] * 4]):
+            with self.assertRaises(ValueError):
+                scheduler.push("s", samples)
+        np.testing.assert_array_equal(scheduler.sessions["s"].buffer, window)
+
+    def test_run_idles_without_sessions(self):
+        scheduler = BandPowerScheduler(tick_s=0.01)
+        ticks = []
+        real_tick = scheduler.tick
+
+        async def counting_tick():
+            ticks.append(1)
+            return await real_tick()
+
+        scheduler.tick = counting_tick
+
+        async def scenario():
+            task = asyncio.create_task(scheduler.run())
+            await asyncio.sleep(0.1)
+            idle = len(ticks)
+            scheduler.add_session("s", 4, lambda powers: None)
+            await asyncio.sleep(0.1)
+            task.cancel()
+            return idle, len(ticks)
+
+        idle, total = asyncio.run(scenario())
+        self.assertEqual(idle, 0)
+        self.assertGreater(total, 3)
+
+
+class FakeInlet:
+    """pull_chunk/time_correction that count how often two calls were in flight at once."""
+
+    def __init__(self, chunk=()):
+        self.chunk = [list(row) for row in chunk]
+        self.calls = 0
+        self.overlaps = 0
+        self._active = 0
+        self._count = threading.Lock()
+
+    def _call(self):
+        with self._count:
+            self.calls += 1
+            self._active += 1
+            self.overlaps += self._active > 1
+        time.sleep(0.0005)   # long enough for an unlocked caller to run into it
+        with self._count:
+            self._active -= 1
+
+    def pull_chunk(self, timeout=0.0):
+        self._call()
+        return self.chunk, [float(i) for i in range(len(self.chunk))]
+
+    def time_correction(self, timeout=None):
+        self._call()
+        return 0.0
+
+    def close_stream(self):
+        pass
+
+
+class RecordingLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+class HeadsetDaemonTests(SimpleTestCase):
+    def daemon(self, **kwargs):
+        from .headsets import HeadsetDaemon   # needs liblsl
+
+        self.layer = RecordingLayer()
+        return HeadsetDaemon(channel_layer=self.layer, notch=False, log=lambda message: None, **kwargs)
+
+    def test_inlet_calls_never_overlap(self):
+        daemon = self.daemon()
+        inlet = FakeInlet()
+        asyncio.run(daemon.add("muse-1", inlet, 256))
+
+        def hammer(fn):
+            for _ in range(50):
+                fn()
+
+        with ThreadPoolExecutor(6) as pool:
+            for future in [pool.submit(hammer, daemon.poll) for _ in range(4)] + \
+                    [pool.submit(hammer, daemon.refresh_clocks) for _ in range(2)]:
+                future.result()
+        self.assertGreater(inlet.calls, 100)
+        self.assertEqual(inlet.overlaps, 0)
+
+    def test_samples_reach_their_session_group(self):
+        daemon = self.daemon(routes={"muse-1": "lab-a"})
+        chunk = np.random.default_rng(0).normal(size=(256, 5))   # 5th channel is ignored
+
+        async def scenario():
+            await daemon.add("muse-1", FakeInlet(chunk), 256)
+            await daemon.add("muse:2", FakeInlet(chunk), 256)
+            self.assertEqual(daemon.poll(), [])
+            for scheduler in daemon.schedulers.values():
+                await scheduler.tick()
+
+        asyncio.run(scenario())
+        powers = {message["device"]: group for group, message in self.layer.sent if message["type"] == "muse.powers"}
+        self.assertEqual(powers, {"muse-1": "telemetry-lab-a", "muse:2": "telemetry-muse-2"})
+        self.assertEqual(daemon.headsets["muse-1"].samples, 256)
+
+
+class RecordingSink:
+    def __init__(self):
+        self.frames = []
+
+    async def open(self):
+        pass
+
+    async def send(self, powers, focus=None):
+        self.frames.append((powers, focus))
+
+    async def close(self):
+        pass
+
+
+def recorded_powers(n_epochs=20, n_channels=2, seed=0):
+    return np.random.default_rng(seed).normal(1.0, 0.3, (n_epochs, len(BANDS), n_channels)).astype(np.float32)
+
+
+class ReplayTests(TestCase):
+    def test_paced_at_speed(self):
+        # 40 epochs at 20 epochs/s x 2 = 1 s of schedule
+        stats = asyncio.run(replay(recorded_powers(40), RecordingSink(), speed=2.0, epoch_rate=20.0))
+        self.assertEqual(stats.sent, 40)
+        self.assertAlmostEqual(stats.elapsed_s, 39 / 40, delta=0.1)
+        self.assertLess(stats.summary()["lag_ms_p95"], 20)
+
+    def test_frames_are_deterministic(self):
+        powers = recorded_powers()
+        user = User.objects.create_user(email="replay@example.com", password="pw")
+        session = save_session(recorded_powers(BASELINE_MIN_EPOCHS, seed=1), user=user)
+        scorer = focus_scorer(powers.shape[2], session_id=session.pk)
+        self.assertIsNotNone(scorer)
+
+        runs = []
+        for _ in range(2):
+            sink = RecordingSink()
+            asyncio.run(replay(powers, sink, epoch_rate=1000.0, loops=2, scorer=scorer))
+            runs.append(sink.frames)
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(len(runs[0]), 2 * len(powers))
+        self.assertEqual(runs[0][:len(powers)], runs[0][len(powers):])
+        first, focus = runs[0][0]
+        np.testing.assert_allclose(first, powers[0].ravel(), atol=1e-6)   # band-major
+        self.assertAlmostEqual(focus, scorer.score(first)[0], places=5)
+        self.assertNotEqual(len({f for _p, f in runs[0]}), 1)
+
+    def test_lag_window_is_bounded(self):
+        stats = asyncio.run(replay(recorded_powers(5), RecordingSink(), epoch_rate=1e6, loops=3000))
+        self.assertEqual(stats.sent, 15000)
+        self.assertEqual(len(stats.lag_s), stats.lag_s.maxlen)
+
+    def test_load_powers(self):
+        powers = recorded_powers(3, n_channels=2)
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("Timestamp," + ",".join(f"{b}_Ch{c}" for b in BANDS for c in (1, 2)) + "\n")
+            for i, epoch in enumerate(powers):
+                f.write(f"{i}," + ",".join(f"{v:.6f}" for v in epoch.ravel()) + "\n")
+        self.addCleanup(Path(f.name).unlink)
+        np.testing.assert_allclose(load_powers(csv_path=f.name), powers, atol=1e-5)
+        session = save_session(powers)
+        np.testing.assert_array_equal(load_powers(session_id=session.pk), powers)
+        self.assertIsNone(focus_scorer(2, session_id=session.pk))   # anonymous recording
+
+
+def band_csv(rows, channels=("Ch1", "Ch2")):
+    header = "Timestamp," + ",".join(f"{b}_{ch}" for b in BANDS for ch in channels)
+    return io.StringIO("\n".join([header, *rows]) + "\n")
+
+
+class ReadBandCSVTests(SimpleTestCase):
+    def test_recorder_layout(self):
+        powers = read_band_csv(band_csv(["0," + ",".join(str(i) for i in range(10)), "", "1," + ",".join(["1"] * 10)]))
+        self.assertEqual(powers.shape, (2, len(BANDS), 2))
+        self.assertEqual(powers[0, :, 1].tolist(), [1, 3, 5, 7, 9])   # Ch2 of each band
+
+    def test_single_channel_layout(self):
+        powers = read_band_csv(io.StringIO(",".join(BANDS) + "\n1,2,3,4,5\n"))
+        self.assertEqual(powers.shape, (1, len(BANDS), 1))
+
+    def test_rejects_bad_input(self):
+        for text, message in (
+            (band_csv(["0," + ",".join(["1"] * 10), "1,1,2,3"]), "line 3"),      # truncated row
+            (band_csv(["0," + ",".join(["x"] * 10)]), "line 2"),                 # not numbers
+            (io.StringIO("Timestamp,Delta_Ch1,Theta_Ch1\n0,1,2\n"), "header"),  # missing bands
+        ):
+            with self.assertRaisesMessage(ValueError, message):
+                read_band_csv(text)
+
+    def test_empty_recording(self):
+        self.assertEqual(read_band_csv(band_csv([])).shape, (0, len(BANDS), 2))
+
+
+class SessionHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="eeg@example.com", password="pw")
+        self.now = timezone.now()
+
+    def save(self, days_ago, level, user=None):
+        powers = np.full((10, len(BANDS), 2), level, dtype=np.float32)
+        return save_session(powers, user=user or self.user, started_at=self.now - timedelta(days=days_ago))
+
+    def test_save_then_history(self):
+        old, new = self.save(2, 1.0), self.save(0, 2.0)
+        self.save(0, 3.0, user=User.objects.create_user(email="other@example.com", password="pw"))
+        history = session_history(self.user)
+        self.assertEqual([s["id"] for s in history], [new.pk, old.pk])
+        self.assertEqual((history[0]["n_epochs"], history[0]["duration_s"], history[0]["alpha"]), (10, 2.0, 2.0))
+        self.assertEqual(len(session_history(self.user, limit=1)), 1)
+        np.testing.assert_array_equal(new.powers(), np.full((10, len(BANDS), 2), 2.0))
+
+    def test_trend_buckets_by_day(self):
+        self.save(40, 9.0)   # outside the window
+        self.save(3, 1.0)
+        today = [self.save(0, 2.0), self.save(0, 4.0)]
+        trend = band_trend(self.user, days=30)
+        self.assertEqual([row["sessions"] for row in trend], [1, 2])
+        self.assertEqual(trend[1]["day"], today[0].started_at.date())
+        self.assertEqual(trend[1]["avg_alpha"], 3.0)
+        self.assertLess(trend[0]["day"], trend[1]["day"])
+
+
+class RecordingViewTests(TestCase):
+    url = "/eeg/start-eeg-sync/"
+
+    @mock.patch("impulse_monitoring.views.subprocess.run")
+    def test_staff_post_only(self, run):
+        self.assertEqual(self.client.post(self.url, secure=True).status_code, 302)   # to the admin login
+        self.client.force_login(User.objects.create_user(email="u@example.com", password="pw"))
+        self.assertEqual(self.client.post(self.url, secure=True).status_code, 302)
+        self.client.force_login(User.objects.create_superuser(email="s@example.com", password="pw"))
+        self.assertEqual(self.client.get(self.url, secure=True).status_code, 405)
+        run.assert_not_called()
@@ -4,4 +4,7 @@ from . import views # Assuming views.py is in the current app directory
 urlpatterns = [
     # ... other paths ...
     path('start-eeg-sync/', views.run_full_eeg_process, name='start_eeg_sync'),
+    path('history/', views.eeg_history, name='eeg_history'),
+    path('scheduler/metrics/', views.scheduler_metrics, name='eeg_scheduler_metrics'),
+    path('latency/', views.tick_latency, name='eeg_tick_latency'),
 ]
\ No newline at end of file
@@ -6,20 +6,29 @@ These functions perform the lower-level operations involved in buffering,
 epoching, and transforming EEG data into frequency bands
 
 @author: Cassani
-"""
 
-import os
-import sys
-from tempfile import gettempdir
-from subprocess import call
+Only numpy is imported up front, so consumers, the scheduler and the recorder
+can use these without paying for matplotlib or scikit-learn (neither was used
+here) or scipy (about 1.4 s and 90 MB; loaded on the first notch-filtered
+update_buffer call). impulse_monitoring/tests.py guards the import cost.
+"""
+from functools import lru_cache
 
-import matplotlib.pyplot as plt
 import numpy as np
-from sklearn import svm
-from scipy.signal import butter, lfilter, lfilter_zi
 
 
-NOTCH_B, NOTCH_A = butter(4, np.array([55, 65]) / (256 / 2), btype='bandstop')
+@lru_cache(maxsize=None)
+def notch_coefficients(fs=256):
+    """(b, a) of the 55-65 Hz band-stop used by update_buffer, for sample rate fs."""
+    from scipy.signal import butter
+    return butter(4, np.array([55, 65]) / (fs / 2), btype='bandstop')
+
+
+def __getattr__(name):
+    # NOTCH_B / NOTCH_A used to be computed at import time
+    if name in ("NOTCH_B", "NOTCH_A"):
+        return notch_coefficients()[name == "NOTCH_A"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def epoch(data, samples_epoch, samples_overlap=0):
@@ -170,10 +179,12 @@ def update_buffer(data_buffer, new_data, notch=False, filter_state=None):
         new_data = new_data.reshape(-1, data_buffer.shape[1])
 
     if notch:
+        from scipy.signal import lfilter, lfilter_zi
+        notch_b, notch_a = notch_coefficients()
         if filter_state is None:
-            filter_state = np.tile(lfilter_zi(NOTCH_B, NOTCH_A),
+            filter_state = np.tile(lfilter_zi(notch_b, notch_a),
                                    (data_buffer.shape[1], 1)).T
-        new_data, filter_state = lfilter(NOTCH_B, NOTCH_A, new_data, axis=0,
+        new_data, filter_state = lfilter(notch_b, notch_a, new_data, axis=0,
                                          zi=filter_state)
 
     new_buffer = np.concatenate((data_buffer, new_data), axis=0)
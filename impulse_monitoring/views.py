@@ -1,74 +1,108 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST
+from django.utils import timezone
 import subprocess
 import os
 import glob
 import sys
-# Import the analysis logic directly to avoid another subprocess call
-from .views import analyze_eeg_file, STATE_MAP 
+from .sessions import read_band_csv, save_session, session_history, band_trend
+from .scheduler import get_scheduler
+from . import latency
 
 # --- NEW VIEW FOR SYNCHRONOUS RECORDING AND ANALYSIS ---
+@staff_member_required
+@require_POST
 def run_full_eeg_process(request):
     """
-    Synchronously runs the EEG recording and analysis.
+    Synchronously runs the EEG recording and analysis, on the headset attached
+    to the server (staff only).
     WARNING: This will block the user's request for > 60 seconds!
     """
-    if request.method == 'POST':
-        try:
-            # 1. Start Recording (60 seconds)
-            # Use sys.executable to ensure the correct Python environment
-            recording_command = [
-                sys.executable, 
-                os.path.join(os.path.dirname(__file__), 'EEG_recording.py')
-            ]
-            
-            print("Starting 60s EEG Recording...")
-            recording_process = subprocess.run(
-                recording_command, 
-                capture_output=True, # Capture stdout/stderr for logging
-                text=True,
-                check=True # Raise an exception if the script fails
-            )
-            print("Recording script finished.")
+    try:
+        # 1. Start Recording (60 seconds)
+        # Use sys.executable to ensure the correct Python environment
+        recording_command = [
+            sys.executable, 
+            os.path.join(os.path.dirname(__file__), 'EEG_recording.py')
+        ]
+        
+        started_at = timezone.now()
+        print("Starting 60s EEG Recording...")
+        recording_process = subprocess.run(
+            recording_command, 
+            capture_output=True, # Capture stdout/stderr for logging
+            text=True,
+            check=True # Raise an exception if the script fails
+        )
+        print("Recording script finished.")
 
-            # 2. Find the newest generated CSV file
-            list_of_files = glob.glob('eeg_session_*.csv')
-            if not list_of_files:
-                raise FileNotFoundError("EEG_recording.py failed to create a session file.")
+        # 2. Find the newest generated CSV file
+        list_of_files = glob.glob('eeg_session_*.csv')
+        if not list_of_files:
+            raise FileNotFoundError("EEG_recording.py failed to create a session file.")
 
-            filename_to_analyze = max(list_of_files, key=os.path.getctime)
-            print(f"Analyzing file: {filename_to_analyze}")
+        filename_to_analyze = max(list_of_files, key=os.path.getctime)
+        print(f"Analyzing file: {filename_to_analyze}")
 
-            # 3. Perform Analysis (Simulated In-Memory Analysis from analyze_eeg_file)
-            # Note: The original eeg_analyzer.py is a CLI, but you already have the 
-            # core logic imported as `analyze_eeg_file` in your original views.py.
-            with open(filename_to_analyze, 'rb') as f:
-                 # Django File object handling is simulated here with file handle
-                dominant_band, inferred_state, avg_power = analyze_eeg_file(f)
-            
-            # 4. Clean up the temporary file
-            os.remove(filename_to_analyze)
+        # 3. Store per-epoch band powers + summary on an EEGSession
+        with open(filename_to_analyze, newline='') as f:
+            powers = read_band_csv(f)
+        if not len(powers):
+            raise ValueError("The recording contains no epochs.")
+        session = save_session(powers, user=request.user, started_at=started_at)
 
-            # 5. Render Results
-            context = {
-                'eeg_results': {
-                    'dominant_band': dominant_band,
-                    'inferred_state': inferred_state,
-                    'avg_power': f"{avg_power:.4f}",
-                    'file_name': filename_to_analyze
-                },
-                'analysis_successful': True
-            }
-            return render(request, 'vton_demo.html', context)
+        # 4. Clean up the temporary file (the session row has everything)
+        os.remove(filename_to_analyze)
 
-        except subprocess.CalledProcessError as e:
-            error_message = f"EEG Recording/Muselsl failed. Stderr: {e.stderr}"
-            print(error_message)
-            return render(request, 'vton_demo.html', {'error': error_message})
-        except Exception as e:
-            error_message = f"An analysis error occurred: {e}"
-            print(error_message)
-            return render(request, 'vton_demo.html', {'error': error_message})
+        # 5. Render Results
+        context = {
+            'eeg_results': {
+                'dominant_band': session.dominant_band,
+                'inferred_state': session.inferred_state,
+                'avg_power': f"{session.avg_power:.4f}",
+                'file_name': filename_to_analyze,
+                'session_id': session.id,
+            },
+            'analysis_successful': True
+        }
+        return render(request, 'vton_demo.html', context)
 
-    # Redirect to the main page if accessed via GET
-    return redirect('/')
\ No newline at end of file
+    except subprocess.CalledProcessError as e:
+        error_message = f"EEG Recording/Muselsl failed. Stderr: {e.stderr}"
+        print(error_message)
+        return render(request, 'vton_demo.html', {'error': error_message})
+    except Exception as e:
+        error_message = f"An analysis error occurred: {e}"
+        print(error_message)
+        return render(request, 'vton_demo.html', {'error': error_message})
+
+
+def eeg_history(request):
+    """The signed-in user's recent sessions and per-day band trend, as JSON."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"ok": False, "error": "Login required"}, status=401)
+    try:
+        days = int(request.GET.get("days", 30))
+    except ValueError:
+        days = 30
+    return JsonResponse({
+        "ok": True,
+        "sessions": session_history(request.user),
+        "trend": band_trend(request.user, days=days),
+    })
+
+
+def scheduler_metrics(request):
+    """Batch size and latency of the live band-power scheduler in this process (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"ok": False, "error": "Staff only"}, status=403)
+    return JsonResponse({"ok": True, **get_scheduler().metrics()})
+
+
+def tick_latency(request):
+    """Per-stage latency of live EEG ticks in this process, per session (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"ok": False, "error": "Staff only"}, status=403)
+    return JsonResponse({"ok": True, "sessions": latency.summary(request.GET.get("session"))})
@@ -1,41 +1,131 @@
-import json, time
+import json, logging, math, time
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
+from impulse_monitoring import latency
+from impulse_monitoring.baselines import live_scorers
+from impulse_monitoring.scheduler import get_scheduler
+
+log = logging.getLogger(__name__)
 
 # Simple in-memory last-focus per session (good enough for demo)
 _LAST_FOCUS = {}
 
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def clean_powers(powers):
+    """`powers` if it is a flat list of finite numbers, 5 bands per channel; else None."""
+    if isinstance(powers, list) and powers and len(powers) % 5 == 0 and all(map(_number, powers)):
+        return powers
+    return None
+
+
+def clean_samples(samples):
+    """`samples` if it is a non-empty list of equal-length rows of finite numbers; else None."""
+    if not (isinstance(samples, list) and samples and isinstance(samples[0], list) and samples[0]):
+        return None
+    width = len(samples[0])
+    if all(isinstance(row, list) and len(row) == width and all(map(_number, row)) for row in samples):
+        return samples
+    return None
+
+
+def clean_focus(focus):
+    return float(focus) if _number(focus) else None
+
 class MuseConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.session_id = self.scope["url_route"]["kwargs"]["session_id"]
         self.group = f"telemetry-{self.session_id}"
+        # baseline is loaded once; each tick is then scored without touching the DB
+        self.scorers = await database_sync_to_async(live_scorers)(self.scope.get("user"))
         await self.channel_layer.group_add(self.group, self.channel_name)
         await self.accept()
         await self.send(text_data=json.dumps({"type":"status","message":"muse_ws_connected","session":self.session_id}))
 
     async def disconnect(self, code):
+        get_scheduler().remove_session(self.channel_name)
         await self.channel_layer.group_discard(self.group, self.channel_name)
 
+    def tick_payload(self, ts, powers=None, focus=None):
+        # Score raw band powers against the user's baseline when we can,
+        # otherwise pass the bridge's own focus through
+        payload = {"v":1,"kind":"muse_tick","ts":ts}
+        if powers is not None and clean_powers(powers) is None:
+            # a malformed message must not take the socket down; score nothing
+            log.warning("Dropping malformed band powers on session %s", self.session_id)
+            powers = None
+        scorer = self.scorers.get(len(powers) // 5) if powers is not None else None
+        if scorer:
+            focus, payload["dominant"] = scorer.score(powers)
+        focus = clean_focus(focus)
+        payload["focus"] = 0.5 if focus is None else focus
+        _LAST_FOCUS[self.session_id] = payload["focus"]
+        return payload
+
+    async def broadcast_tick(self, ts, powers=None, focus=None, lat=None):
+        payload = self.tick_payload(ts, powers=powers, focus=focus)
+        payload["lat"] = latency.stamped(lat, "sent")
+        await self.channel_layer.group_send(self.group, {
+            "type": "telemetry_event",
+            "payload": payload,
+        })
+
+    async def on_band_powers(self, powers):
+        # called by the shared scheduler once per tick with this stream's epoch
+        await self.broadcast_tick(time.time(), powers=powers.tolist(), lat={"fft": get_scheduler().computed_at})
+
+    async def send_tick(self, payload, lat):
+        # stamps the tick out, records the server-side stages; the browser's
+        # tick_ack records the rest
+        payload["lat"] = lat = latency.stamped(lat, "out")
+        latency.record(self.session_id, lat)
+        await self.send(text_data=json.dumps(payload))
+
     async def receive(self, text_data=None, bytes_data=None):
         # Expect JSON messages from the bridge script
         try:
             msg = json.loads(text_data or "{}")
         except Exception:
             return
+        if not isinstance(msg, dict):
+            return
 
         kind = msg.get("kind")
         if kind == "muse_features":
             # Update last focus and live-broadcast (optional)
-            focus = float(msg.get("focus", 0.5))
-            _LAST_FOCUS[self.session_id] = focus
-            await self.channel_layer.group_send(self.group, {
-                "type": "telemetry_event",
-                "payload": {"v":1,"kind":"muse_tick","ts":msg.get("ts", time.time()),"focus":focus}
-            })
+            powers = msg.get("powers")   # raw band powers, compute_band_powers() order
+            await self.broadcast_tick(
+                msg.get("ts", time.time()),
+                powers=powers if isinstance(powers, list) else None,
+                focus=msg.get("focus"),
+            )
+
+        elif kind == "muse_samples":
+            # Raw (filtered) samples, [[ch1, ch2, ...], ...]; band powers are
+            # computed server-side in the scheduler's per-tick batch
+            samples = clean_samples(msg.get("samples"))
+            if samples is None:
+                log.warning("Dropping malformed samples on session %s", self.session_id)
+                return
+            scheduler = get_scheduler()
+            if self.channel_name not in scheduler.sessions:
+                scheduler.add_session(self.channel_name, len(samples[0]), self.on_band_powers)
+            try:
+                scheduler.push(self.channel_name, samples)
+            except ValueError as e:
+                # the channel count changed mid-stream
+                log.warning("Dropping samples on session %s: %s", self.session_id, e)
+                return
+            scheduler.ensure_running()
 
         elif kind == "muse_summary":
             # Final summary payload from the bridge → broadcast as "model"
-            focus = float(msg.get("focus", 0.5))
+            focus = clean_focus(msg.get("focus"))
+            focus = 0.5 if focus is None else focus
             _LAST_FOCUS[self.session_id] = focus
             await self.channel_layer.group_send(self.group, {
                 "type": "telemetry_event",
@@ -43,10 +133,30 @@ class MuseConsumer(AsyncWebsocketConsumer):
                             "alpha":msg.get("alpha"),"beta":msg.get("beta"),"theta":msg.get("theta")}
             })
 
+        elif msg.get("type") == "tick_ack":
+            # the browser echoes a tick's stamps on receipt; without a shared
+            # clock, receipt is taken as halfway between "out" and now
+            lat = msg.get("lat")
+            if isinstance(lat, dict) and isinstance(lat.get("out"), (int, float)):
+                lat = {k: v for k, v in lat.items() if k in latency.STAMPS}
+                lat["browser"] = lat["out"] + (time.time() - lat["out"]) / 2
+                latency.record(self.session_id, lat, receipt=True)
+
         elif msg.get("type") == "get_latest":
             # Allow browser to pull the current focus when image finishes
             focus = float(_LAST_FOCUS.get(self.session_id, 0.5))
             await self.send(text_data=json.dumps({"v":1,"kind":"model","source":"muse","focus":focus}))
 
+    async def muse_powers(self, event):
+        # Band powers from the headset daemon (manage.py eeg_daemon) or a
+        # replay; each connection scores them with its own user's baseline,
+        # falling back to the focus a replay sends along
+        lat = latency.stamped(event.get("lat"), "received")
+        await self.send_tick(self.tick_payload(event["ts"], powers=event["powers"], focus=event.get("focus")), lat)
+
     async def telemetry_event(self, event):
-        await self.send(text_data=json.dumps(event["payload"]))
+        payload = event["payload"]
+        if "lat" in payload:
+            await self.send_tick(dict(payload), latency.stamped(payload["lat"], "received"))
+            return
+        await self.send(text_data=json.dumps(payload))
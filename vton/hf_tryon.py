@@ -1,59 +1,151 @@
 # vton/hf_tryon.py
 from pathlib import Path
-import shutil, uuid, tempfile
+import asyncio, io, shutil, threading, time, uuid
+import httpx
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from gradio_client import Client, handle_file  # use handle_file
-from PIL import Image, ImageOps
+from gradio_client.utils import Status
+from core.images import model_jpeg
+from core.metrics import external_call
+from .tracing import current_trace, span
 
 SPACE = "JeremelleV/emergrade" 
 #SPACE = "https://huggingface.co/spaces/JeremelleV/idmvton"
-client = Client(SPACE)
+# The Space clears its upload cache eventually; re-upload after this long
+UPLOAD_HANDLE_TTL = 30 * 60
+# How often a traced job is asked whether it has left the Space's queue
+JOB_POLL_S = 0.25
+_RUNNING = {Status.PROCESSING, Status.ITERATING, Status.PROGRESS}
+# What the Space says when a FileData points at an upload it no longer has
+_MISSING_UPLOAD_MARKERS = (
+    "filenotfounderror", "no such file", "does not exist", "not found",
+    "invalidpatherror", "not in the upload folder", "was not uploaded",
+)
 
-def _exif_upright_copy(src_path: str) -> str:
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+def get_client():
+    # Connect on first use rather than at import (that needs the network).
+    # Concurrent first requests (to_thread workers) wait for the one connecting
+    # instead of each building a Client and worker pool of their own.
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                with span("connect"):
+                    # max_workers caps in-flight /tryon jobs from this process
+                    _CLIENT = Client(SPACE, max_workers=getattr(settings, "TRYON_MAX_CONCURRENCY", 40))
+    return _CLIENT
+
+def _upload_to_space(fobj, filename: str) -> dict:
+    """Upload once to the Space and return a FileData that points at the uploaded copy."""
+    client = get_client()
+    with external_call("tryon", "upload"):
+        r = httpx.post(
+            client.upload_url, headers=client.headers, cookies=client.cookies,
+            verify=client.ssl_verify, files=[("files", (filename, fobj))], **client.httpx_kwargs,
+        )
+        r.raise_for_status()
+    server_path = r.json()[0]
+    # a URL FileData is passed through by the client without another upload
+    return {**handle_file(f"{client.src_prefixed}file={server_path}"), "orig_name": filename}
+
+def _stored_person_handle(storage_name: str, refresh: bool = False) -> dict:
     """
-    Make a temp copy with EXIF orientation applied (no resize).
-    Returns a new local path; original remains untouched.
+    Space upload handle for a person image in default_storage (normally the
+    profile photo's model-size derivative). Cached, so repeat try-ons skip the
+    upload, temp file and decode entirely; the first one normalizes in memory.
     """
-    try:
-        with Image.open(src_path) as im:
-            im2 = ImageOps.exif_transpose(im)   # handles 3/6/8 automatically
-            suffix = Path(src_path).suffix or ".png"
-            fd, tmp = tempfile.mkstemp(suffix=suffix)
-            Path(tmp).unlink(missing_ok=True)   # we'll save via Pillow, not the raw handle
-            im2.save(tmp)
-            return tmp
-    except Exception:
-        # If anything goes wrong (no EXIF etc.), just return original
-        return src_path
-
-def run_tryon(human_path, garment_path, desc="", steps=30, seed=42, crop=False):
-    # 1) Normalize inputs so the model sees them upright (no resizing)
-    human_fixed   = _exif_upright_copy(human_path)
-    garment_fixed = _exif_upright_copy(garment_path)
+    key = f"tryon-upload:{storage_name}"
+    handle = None if refresh else cache.get(key)
+    if handle is None:
+        with span("normalize.human", source="profile"):
+            with default_storage.open(storage_name, "rb") as f:
+                data = model_jpeg(f)
+        with span("upload.human"):
+            handle = _upload_to_space(io.BytesIO(data), Path(storage_name).stem + ".jpg")
+        cache.set(key, handle, UPLOAD_HANDLE_TTL)
+    elif (t := current_trace()) is not None:
+        t.attrs["human_upload_cached"] = True
+    return handle
+
+def _normalized_handle(src, role="image") -> dict:
+    """
+    Space upload handle for a person/garment image given as an UploadedFile or a
+    local path. Normalized in memory and uploaded straight from the buffer, so an
+    upload is never copied to another temp file first.
+    """
+    name = Path(getattr(src, "name", None) or str(src)).stem or "image"
+    with span(f"normalize.{role}"):
+        data = model_jpeg(src)
+    with span(f"upload.{role}", bytes=len(data)):
+        return _upload_to_space(io.BytesIO(data), name + ".jpg")
+
+def _prepare_inputs(human, garment, human_stored):
+    # 1) Normalize inputs so the model sees them upright (fit to model input size)
+    if human_stored:
+        human_input = _stored_person_handle(human_stored)
+    else:
+        human_input = _normalized_handle(human, "human")
+    return human_input, _normalized_handle(garment, "garment")
 
+def _submit(human_input, garment_input, desc, steps, seed, crop):
+    """Queue the /tryon call on the client's worker pool; returns a gradio Job (a Future)."""
     editor_input = {
-        "background": handle_file(human_fixed),
+        "background": human_input,
         "layers": [],
         "composite": None,
     }
+    return get_client().submit(
+        dict=editor_input,
+        garm_img=garment_input,
+        garment_des=desc or "",
+        is_checked=True,
+        is_checked_crop=bool(crop),
+        denoise_steps=int(steps),
+        seed=int(seed),
+        api_name="/tryon",
+    )
 
-    # 2) Call the Space (no float seed/steps)
+def _record_job(started, running_at):
+    # remote = submit → result; split into queue wait and inference when the
+    # switch to PROCESSING was seen
+    t = current_trace()
+    if t is None:
+        return
+    end = time.perf_counter()
+    t.add("remote", started, end)
+    if running_at is not None:
+        t.add("remote.queue", started, running_at)
+        t.add("remote.inference", running_at, end)
+
+async def _ajob_result(job):
+    """await job, traced."""
+    fut = asyncio.wrap_future(job)
+    if current_trace() is None:
+        return await fut
+    started, running_at = time.perf_counter(), None
     try:
-        out_path, mask_path = client.predict(
-            dict=editor_input,
-            garm_img=handle_file(garment_fixed),
-            garment_des=desc or "",
-            is_checked=True,
-            is_checked_crop=bool(crop),
-            denoise_steps=int(steps),
-            seed=int(seed),
-            api_name="/tryon",
-        )
-    except Exception as e:
-        # surface to template/logs so you know it didn’t reach the Space
-        raise RuntimeError(f"HF call failed: {type(e).__name__}: {e}")
+        while not (await asyncio.wait({fut}, timeout=JOB_POLL_S))[0]:
+            if running_at is None and job.status().code in _RUNNING:
+                running_at = time.perf_counter()
+        return fut.result()
+    finally:
+        _record_job(started, running_at)
 
+def _missing_upload(exc) -> bool:
+    """
+    True when the Space rejected the call because an uploaded file is gone (its
+    upload cache was cleared). Queue timeouts, model errors and cancellations
+    are False; retrying those would only run, and bill, the inference twice.
+    """
+    text = f"{type(exc).__name__}: {exc}".lower()
+    return any(marker in text for marker in _MISSING_UPLOAD_MARKERS)
 
+def _save_outputs(out_path, mask_path):
     # 3) Copy outputs verbatim (DO NOT rotate/resize) → ensures no distortion
     media_root = Path(settings.MEDIA_ROOT) / "tryon"
     media_root.mkdir(parents=True, exist_ok=True)
@@ -66,6 +158,50 @@ def run_tryon(human_path, garment_path, desc="", steps=30, seed=42, crop=False):
         shutil.copy2(src, dst)          # byte-for-byte copy; no re-encode
         return f"{media_url}tryon/{name}"
 
-    out_url  = save_unique(out_path,  "out")
-    mask_url = save_unique(mask_path, "mask")
-    return out_url, mask_url
\ No newline at end of file
+    with span("save_outputs"):
+        out_url  = save_unique(out_path,  "out")
+        mask_url = save_unique(mask_path, "mask")
+    return out_url, mask_url
+
+async def _predict(human_input, garment_input, human_stored, desc, steps, seed, crop):
+    """
+    Calls the Space and awaits the job. If the stored person image's cached
+    upload has been evicted there, uploads it again and retries once.
+    """
+    try:
+        try:
+            with external_call("tryon", "predict"):
+                return await _ajob_result(_submit(human_input, garment_input, desc, steps, seed, crop))
+        except Exception as e:
+            if not (human_stored and _missing_upload(e)):
+                raise
+            human_input = await asyncio.to_thread(_stored_person_handle, human_stored, refresh=True)
+            with external_call("tryon", "predict"):
+                return await _ajob_result(_submit(human_input, garment_input, desc, steps, seed, crop))
+    except Exception as e:
+        # surface to template/logs so you know it didn’t reach the Space
+        raise RuntimeError(f"HF call failed: {type(e).__name__}: {e}")
+
+def run_tryon(human, garment, desc="", steps=30, seed=42, crop=False, human_stored=None):
+    """
+    `human` and `garment` are UploadedFiles or local paths. `human_stored` is the
+    storage name of an already-normalized person image (a profile photo
+    derivative); when given, `human` is ignored and the cached Space upload is
+    reused. Unreadable images raise ValidationError before the Space is called.
+    """
+    human_input, garment_input = _prepare_inputs(human, garment, human_stored)
+    # 2) Call the Space (no float seed/steps)
+    out_path, mask_path = async_to_sync(_predict)(human_input, garment_input, human_stored, desc, steps, seed, crop)
+    return _save_outputs(out_path, mask_path)
+
+async def arun_tryon(human, garment, desc="", steps=30, seed=42, crop=False, human_stored=None):
+    """
+    run_tryon() for async views. Image work and uploads run in a thread; the
+    Space call itself is awaited on the client's Job, so the event loop only
+    holds a future per in-flight try-on and concurrency is bounded by the
+    client's worker pool (TRYON_MAX_CONCURRENCY) rather than by ASGI threads.
+    """
+    # the first call connects to the Space (the "connect" span) in the same thread
+    human_input, garment_input = await asyncio.to_thread(_prepare_inputs, human, garment, human_stored)
+    out_path, mask_path = await _predict(human_input, garment_input, human_stored, desc, steps, seed, crop)
+    return await asyncio.to_thread(_save_outputs, out_path, mask_path)
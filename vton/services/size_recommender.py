@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import List, Tuple, Optional
 
+import numpy as np
+
 @dataclass
 class SizeRow:
     label: str
@@ -25,6 +27,53 @@ def _ease_for(category: str, stretch: bool) -> Tuple[float, float]:
     if category in {"top_woven", "shirt"}: return (8.0, 12.0)
     return (6.0, 10.0)
 
+# Measurements a chart can carry, in index order. User matrices for the batch
+# path add a trailing "height" column, used to estimate a missing inseam.
+DIMS = ("chest", "shoulder", "waist", "hip", "inseam")
+USER_COLUMNS = DIMS + ("height",)
+INSEAM_PER_HEIGHT = 0.45
+
+BOTTOM_CATEGORIES = {"bottom", "pants", "jeans", "shorts", "skirt"}
+DRESS_CATEGORIES = {"dress", "jumpsuit"}
+
+@dataclass
+class DimRule:
+    ease_min: float
+    ease_max: float
+    weight: float
+    gate: bool   # size must clear ease_min on this dim to count as "meets minimum"
+
+def _fit_rules(category: str, stretch: bool) -> dict:
+    """
+    Category ease table: {dim: DimRule}, in DIMS order. The first gated dim is the
+    primary one; a size without it is skipped. Tops reproduce recommend_top_size.
+    """
+    if category in BOTTOM_CATEGORIES:
+        rules = {
+            "waist": DimRule(*((0.0, 4.0) if stretch else (2.0, 6.0)), 1.0, True),
+            "hip": DimRule(*((2.0, 6.0) if stretch else (4.0, 10.0)), 0.8, True),
+        }
+        if category != "skirt":
+            rules["inseam"] = DimRule(0.0, 2.0, 0.5, False)
+        return rules
+    if category in DRESS_CATEGORIES:
+        return {
+            "chest": DimRule(*((4.0, 8.0) if stretch else (6.0, 10.0)), 1.0, True),
+            "shoulder": DimRule(0.0, 0.0, 0.1, False),
+            "waist": DimRule(*((2.0, 6.0) if stretch else (4.0, 10.0)), 0.7, False),
+            "hip": DimRule(*((4.0, 8.0) if stretch else (6.0, 12.0)), 0.7, True),
+        }
+    return {
+        "chest": DimRule(*_ease_for(category, stretch), 1.0, True),
+        "shoulder": DimRule(0.0, 0.0, 0.1, False),
+    }
+
+def _user_value(user_cm: dict, dim: str) -> Optional[float]:
+    v = user_cm.get(dim)
+    if dim == "inseam" and not v and user_cm.get("height"):
+        v = float(user_cm["height"]) * INSEAM_PER_HEIGHT
+    return float(v) if v else None
+
 def recommend_top_size(user_cm: dict, chart: ProductChart) -> Tuple[Optional[str], str]:
     u_chest = float(user_cm.get("chest", 0.0))
     u_shoulder = user_cm.get("shoulder")
@@ -53,3 +102,162 @@ def recommend_top_size(user_cm: dict, chart: ProductChart) -> Tuple[Optional[str
     if pool is candidates and pool is not [c for c in candidates if c[0]]:
         blurb += " No size met minimum ease; suggesting closest available."
     return best.label, blurb
+
+
+def recommend_size(user_cm: dict, chart: ProductChart) -> Tuple[Optional[str], str]:
+    """
+    Any-category recommender: tops go through recommend_top_size, bottoms and
+    dresses are scored as a weighted sum of |garment - target mid| per dim.
+    """
+    rules = _fit_rules(chart.category, chart.stretch)
+    if "waist" not in rules:
+        return recommend_top_size(user_cm, chart)
+
+    primary = next(d for d, r in rules.items() if r.gate)
+    user = {d: _user_value(user_cm, d) for d in rules}
+    if user[primary] is None:
+        return None, f"Add your {primary} measurement to get a size for this item."
+
+    candidates = []
+    for s in chart.sizes:
+        if getattr(s, primary) is None:
+            continue
+        meets_min, score = True, 0.0
+        for dim, r in rules.items():
+            g, u = getattr(s, dim), user[dim]
+            if not (g or dim == primary) or u is None:
+                continue
+            target_min, target_max = u + r.ease_min, u + r.ease_max
+            meets_min &= (not r.gate) or g >= target_min
+            score += abs(g - (target_min + target_max) / 2.0) * r.weight
+        candidates.append((meets_min, score, s))
+
+    if not candidates:
+        return None, "No size data available."
+    pool = [c for c in candidates if c[0]] or candidates
+    best = sorted(pool, key=lambda x: x[1])[0][2]
+
+    parts = [f"{d} {user[d]:.1f} cm → {getattr(best, d):.1f} cm"
+             for d in rules if user[d] is not None and getattr(best, d) is not None]
+    blurb = f"Size {best.label}: " + "; ".join(parts) + "."
+    if pool is candidates:
+        blurb += " No size met minimum ease; suggesting closest available."
+    return best.label, blurb
+
+
+# ---- Batch path: many users × many charts in one vectorized pass ----
+
+@dataclass
+class ChartIndex:
+    """
+    Charts precompiled into padded arrays. `values` is (n_charts, max_sizes, len(DIMS))
+    with NaN for missing data; rule arrays are (n_charts, len(DIMS)) with weight 0
+    on dims a category ignores.
+    """
+    skus: List[str]
+    labels: List[List[str]]
+    values: np.ndarray
+    ease_min: np.ndarray
+    ease_max: np.ndarray
+    weight: np.ndarray
+    gate: np.ndarray
+    primary: np.ndarray   # int (n_charts,), index into DIMS
+    top: np.ndarray       # bool (n_charts,), scored like recommend_top_size: a missing chest counts as 0
+
+    def label(self, chart_idx: int, size_idx: int) -> Optional[str]:
+        return self.labels[chart_idx][size_idx] if size_idx >= 0 else None
+
+@dataclass
+class BatchFit:
+    """Per (user, chart) results. size_idx is -1 where a chart has no usable size."""
+    size_idx: np.ndarray   # int16 (n_users, n_charts)
+    score: np.ndarray      # float32 (n_users, n_charts), weighted distance from target
+    meets_min: np.ndarray  # bool (n_users, n_charts), False when we fell back to closest
+
+def compile_charts(charts) -> ChartIndex:
+    charts = list(charts.values()) if isinstance(charts, dict) else list(charts)
+    n, width, k = len(charts), max((len(c.sizes) for c in charts), default=0), len(DIMS)
+    values = np.full((n, width, k), np.nan)
+    ease_min, ease_max, weight = np.zeros((n, k)), np.zeros((n, k)), np.zeros((n, k))
+    gate, primary = np.zeros((n, k), dtype=bool), np.zeros(n, dtype=np.intp)
+    top = np.zeros(n, dtype=bool)
+    for i, c in enumerate(charts):
+        rules = _fit_rules(c.category, c.stretch)
+        for d, dim in enumerate(DIMS):
+            if dim in rules:
+                r = rules[dim]
+                ease_min[i, d], ease_max[i, d], weight[i, d], gate[i, d] = r.ease_min, r.ease_max, r.weight, r.gate
+        primary[i] = DIMS.index(next(d for d, r in rules.items() if r.gate))
+        top[i] = "waist" not in rules
+        for j, s in enumerate(c.sizes):
+            for d, dim in enumerate(DIMS):
+                v = getattr(s, dim)
+                # off the primary dim, falsy means "no data" (as shoulder in recommend_top_size)
+                if v is not None and (v or d == primary[i]):
+                    values[i, j, d] = v
+    return ChartIndex(
+        skus=[c.sku for c in charts], labels=[[s.label for s in c.sizes] for c in charts],
+        values=values, ease_min=ease_min, ease_max=ease_max, weight=weight, gate=gate, primary=primary,
+        top=top,
+    )
+
+def recommend_sizes_batch(users: np.ndarray, index: ChartIndex, chunk: int = 4096) -> BatchFit:
+    """
+    Vectorized recommend_size for every (user, chart) pair.
+    `users` is (n_users, len(USER_COLUMNS)) in cm, columns as USER_COLUMNS (trailing columns
+    may be omitted); 0/NaN means unknown. Users missing a chart's primary dim get -1 for it,
+    except on tops, where recommend_top_size scores a missing chest as 0.
+    Users are processed `chunk` rows at a time to bound the (chunk, charts, sizes) scratch arrays.
+    """
+    users = np.atleast_2d(np.asarray(users, dtype=float))
+    users = np.pad(users, ((0, 0), (0, len(USER_COLUMNS) - users.shape[1])), constant_values=np.nan)
+    users = np.where(users == 0, np.nan, users)
+    inseam, height = DIMS.index("inseam"), USER_COLUMNS.index("height")
+    users[:, inseam] = np.where(np.isnan(users[:, inseam]), users[:, height] * INSEAM_PER_HEIGHT, users[:, inseam])
+
+    n_users, n_charts = users.shape[0], index.values.shape[0]
+    out = BatchFit(
+        size_idx=np.full((n_users, n_charts), -1, dtype=np.int16),
+        score=np.full((n_users, n_charts), np.nan, dtype=np.float32),
+        meets_min=np.zeros((n_users, n_charts), dtype=bool),
+    )
+    if n_users == 0 or n_charts == 0 or index.values.shape[1] == 0:
+        return out
+
+    charts = np.arange(n_charts)
+    has_primary = ~np.isnan(index.values[charts, :, index.primary])   # (charts, sizes)
+    dims = np.flatnonzero(index.weight.any(axis=0))
+    for lo in range(0, n_users, chunk):
+        u = users[lo:lo + chunk]
+        score = np.zeros((len(u), n_charts, index.values.shape[1]))
+        meets = np.broadcast_to(has_primary, score.shape).copy()
+        for d in dims:   # accumulate dim by dim so sums match the scalar loop exactly
+            g = index.values[None, :, :, d]
+            u_d = u[:, d][:, None, None]
+            zero_fill = index.top & (index.primary == d)
+            if zero_fill.any():
+                u_d = np.where(np.isnan(u_d) & zero_fill[None, :, None], 0.0, u_d)
+            target_min = u_d + index.ease_min[None, :, None, d]
+            target_max = u_d + index.ease_max[None, :, None, d]
+            mid = (target_min + target_max) / 2.0
+            term = np.abs(g - mid) * index.weight[None, :, None, d]
+            known = ~np.isnan(term)
+            score += np.where(known, term, 0.0)
+            meets &= ~(known & index.gate[None, :, None, d] & (g < target_min))
+        user_has_primary = (~np.isnan(u[:, index.primary]) | index.top)[..., None]   # (chunk, charts, 1)
+        score = np.where(has_primary[None] & user_has_primary, score, np.inf)
+
+        any_meets = meets.any(axis=-1, keepdims=True)
+        pooled = np.where(meets | ~any_meets, score, np.inf)
+
+        best = pooled.argmin(axis=-1)           # first minimum, same tie-break as the stable sort
+        best_score = np.take_along_axis(pooled, best[..., None], axis=-1)[..., 0]
+        found = np.isfinite(best_score)
+        out.size_idx[lo:lo + chunk] = np.where(found, best, -1)
+        out.score[lo:lo + chunk] = np.where(found, best_score, np.nan)
+        out.meets_min[lo:lo + chunk] = any_meets[..., 0] & found
+    return out
+
+def recommend_top_sizes_batch(users: np.ndarray, index: ChartIndex, chunk: int = 4096) -> BatchFit:
+    """Batch recommend_top_size: `users` is (n_users, 2) of [chest, shoulder] in cm."""
+    return recommend_sizes_batch(np.atleast_2d(np.asarray(users, dtype=float))[:, :2], index, chunk)
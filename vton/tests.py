@@ -1,3 +1,339 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from gradio_client.exceptions import AppError
+from django.http.request import HttpRequest
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+
+from impulse_monitoring.baselines import LiveScorer, epoch_stats
+from impulse_monitoring.scheduler import BandPowerScheduler
+
+from . import hf_tryon, tracing
+from .consumers import MuseConsumer, clean_powers
+from .services.size_recommender import (
+    USER_COLUMNS, ProductChart, SizeRow, compile_charts, recommend_size, recommend_sizes_batch,
+    recommend_top_size, recommend_top_sizes_batch,
+)
+
+
+class CleanPowersTests(SimpleTestCase):
+    def test_accepts_flat_numbers_in_whole_channels(self):
+        self.assertEqual(clean_powers([0.1] * 20), [0.1] * 20)
+
+    def test_rejects_malformed(self):
+        for powers in ([0.1] * 7, [], ["a"] * 5, [[0.1] * 5], [True] * 5, [float("nan")] * 5, "0.1", None):
+            self.assertIsNone(clean_powers(powers), powers)
+
+
+class MuseConsumerMalformedInputTests(SimpleTestCase):
+    async def connect(self):
+        com = WebsocketCommunicator(MuseConsumer.as_asgi(), "/ws/muse/t/")
+        com.scope["url_route"] = {"kwargs": {"session_id": "t"}}
+        com.scope["user"] = AnonymousUser()
+        connected, _ = await com.connect()
+        self.assertTrue(connected)
+        await com.receive_from()   # muse_ws_connected
+        return com
+
+    async def test_malformed_messages_keep_the_socket_open(self):
+        com = await self.connect()
+        for text in (
+            json.dumps({"kind": "muse_features", "powers": [0.1] * 7}),
+            json.dumps({"kind": "muse_features", "powers": ["x", 1, 2, 3, 4]}),
+            '{"kind": "muse_features", "powers": [NaN, 1, 2, 3, 4]}',
+            json.dumps({"kind": "muse_features", "focus": "high"}),
+        ):
+            await com.send_to(text_data=text)
+            tick = json.loads(await com.receive_from())
+            self.assertEqual((tick["kind"], tick["focus"]), ("muse_tick", 0.5))
+        await com.send_to(text_data=json.dumps(["not", "a", "dict"]))
+        await com.send_to(text_data=json.dumps({"kind": "muse_summary", "focus": {"x": 1}}))
+        self.assertEqual(json.loads(await com.receive_from())["focus"], 0.5)
+
+        await com.send_to(text_data=json.dumps({"kind": "muse_features", "focus": 0.8}))
+        self.assertEqual(json.loads(await com.receive_from())["focus"], 0.8)
+        await com.disconnect()
+
+    async def test_malformed_powers_are_not_scored(self):
+        # a one-channel baseline, so 5-value ticks reach the scorer
+        scorer = LiveScorer(epoch_stats(np.random.default_rng(0).normal(0, 1, (50, 5, 1))))
+        with mock.patch("vton.consumers.live_scorers", return_value={1: scorer}):
+            com = await self.connect()
+        for powers in (["x", 1, 2, 3, 4], [[1], 2, 3, 4, 5]):
+            await com.send_to(text_data=json.dumps({"kind": "muse_features", "powers": powers}))
+            tick = json.loads(await com.receive_from())
+            self.assertEqual(tick["focus"], 0.5)
+            self.assertNotIn("dominant", tick)
+        await com.send_to(text_data=json.dumps({"kind": "muse_features", "powers": [0.1, 0.2, 0.3, 0.4, 0.5]}))
+        self.assertIn("dominant", json.loads(await com.receive_from()))
+        await com.disconnect()
+
+    async def test_malformed_samples_are_dropped(self):
+        scheduler = BandPowerScheduler()
+        scheduler.ensure_running = lambda: None
+        with mock.patch("vton.consumers.get_scheduler", return_value=scheduler):
+            com = await self.connect()
+            for samples in ("x", [], [[]], [[1, "a"]], [[1, 2], [3]], [[float("inf"), 1]], [1, 2]):
+                await com.send_to(text_data=json.dumps({"kind": "muse_samples", "samples": samples}))
+            await com.send_to(text_data='{"kind": "muse_samples", "samples": [[NaN, 1.0]]}')
+            self.assertFalse(scheduler.sessions)
+
+            await com.send_to(text_data=json.dumps({"kind": "muse_samples", "samples": [[1.0, 2.0]] * 3}))
+            await com.send_to(text_data=json.dumps({"kind": "muse_samples", "samples": [[1.0, 2.0, 3.0, 4.0]]}))
+            await com.send_to(text_data=json.dumps({"kind": "muse_features", "focus": 0.6}))
+            self.assertEqual(json.loads(await com.receive_from())["focus"], 0.6)   # still open
+            (session,) = scheduler.sessions.values()
+            self.assertEqual(session.n_channels, 2)
+            self.assertEqual(session.buffer[-4:].tolist(), [[0.0, 0.0], [1.0, 2.0], [1.0, 2.0], [1.0, 2.0]])
+            await com.disconnect()
+
+    async def test_replayed_focus_reaches_anonymous_viewers(self):
+        com = await self.connect()
+        await get_channel_layer().group_send("telemetry-t", {
+            "type": "muse.powers", "ts": 1.0, "powers": [0.1] * 10, "focus": 0.7, "lat": {"sent": time.time()},
+        })
+        self.assertEqual(json.loads(await com.receive_from())["focus"], 0.7)
+        await com.disconnect()
+
+
+class StoredPersonRetryTests(SimpleTestCase):
+    """A cached profile-photo upload is re-sent only when the Space has lost it, sync or async."""
+
+    @staticmethod
+    def sync_tryon(*args, **kwargs):
+        return hf_tryon.run_tryon(*args, **kwargs)
+
+    @staticmethod
+    def async_tryon(*args, **kwargs):
+        return asyncio.run(hf_tryon.arun_tryon(*args, **kwargs))
+
+    def run_tryon(self, tryon, *errors):
+        results = [*errors, ("out.png", "mask.png")]
+
+        async def job_result(job):
+            r = results.pop(0)
+            if isinstance(r, Exception):
+                raise r
+            return r
+
+        with mock.patch.object(hf_tryon, "_prepare_inputs", return_value=({"h": 1}, {"g": 1})), \
+                mock.patch.object(hf_tryon, "_submit") as submit, \
+                mock.patch.object(hf_tryon, "_ajob_result", side_effect=job_result), \
+                mock.patch.object(hf_tryon, "_stored_person_handle", return_value={"h": 2}) as reupload, \
+                mock.patch.object(hf_tryon, "_save_outputs", side_effect=lambda o, m: (o, m)):
+            try:
+                return tryon(None, "g.jpg", human_stored="images/model/p.jpg"), submit, reupload
+            except RuntimeError as e:
+                return e, submit, reupload
+
+    def test_missing_upload_is_reuploaded_once(self):
+        for tryon in (self.sync_tryon, self.async_tryon):
+            with self.subTest(tryon.__name__):
+                out, submit, reupload = self.run_tryon(tryon, AppError("FileNotFoundError: /tmp/gradio/abc/p.jpg"))
+                self.assertEqual(out, ("out.png", "mask.png"))
+                self.assertEqual(submit.call_count, 2)
+                reupload.assert_called_once_with("images/model/p.jpg", refresh=True)
+
+    def test_other_errors_are_not_retried(self):
+        for tryon in (self.sync_tryon, self.async_tryon):
+            for error in (AppError("CUDA out of memory"), TimeoutError("queue timed out")):
+                with self.subTest(tryon.__name__, error=error):
+                    out, submit, reupload = self.run_tryon(tryon, error)
+                    self.assertIsInstance(out, RuntimeError)
+                    self.assertEqual(submit.call_count, 1)
+                    reupload.assert_not_called()
+
+
+class GetClientTests(SimpleTestCase):
+    def test_concurrent_first_calls_build_one_client(self):
+        def slow_client(*args, **kwargs):
+            time.sleep(0.05)
+            return object()
+
+        with mock.patch.object(hf_tryon, "_CLIENT", None), \
+                mock.patch.object(hf_tryon, "Client", side_effect=slow_client) as client:
+            with ThreadPoolExecutor(8) as pool:
+                clients = set(pool.map(lambda _: hf_tryon.get_client(), range(8)))
+        self.assertEqual(client.call_count, 1)
+        self.assertEqual(len(clients), 1)
+
+
+class TraceExportTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "tryon.jsonl")
+
+    def test_export_does_not_write_on_the_calling_thread(self):
+        writers = set()
+        real_emit = tracing.RotatingFileHandler.emit
+
+        def emit(handler, record):
+            writers.add(threading.get_ident())
+            return real_emit(handler, record)
+
+        with override_settings(TRYON_TRACE_FILE=self.path), \
+                mock.patch.object(tracing.RotatingFileHandler, "emit", emit):
+            with tracing.trace("tryon_api"):
+                with tracing.span("normalize.human"):
+                    pass
+            tracing.flush()
+            summary = tracing.stage_summary()
+        self.assertNotIn(threading.get_ident(), writers)
+        self.assertEqual(summary["traces"], 1)
+        self.assertIn("normalize.human", summary["stages"])
+
+    def test_file_is_rotated(self):
+        with override_settings(TRYON_TRACE_FILE=self.path, TRYON_TRACE_MAX_BYTES=2000, TRYON_TRACE_BACKUPS=2):
+            for _ in range(100):
+                with tracing.trace("tryon_api"):
+                    pass
+            tracing.flush()
+        self.assertLessEqual(os.path.getsize(self.path), 2000)
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ["tryon.jsonl", "tryon.jsonl.1", "tryon.jsonl.2"])
+
+
+def chart(category, *sizes, stretch=False):
+    return ProductChart(sku="t", name="", category=category, stretch=stretch, units="cm",
+                        sizes=[SizeRow(label=label, **dims) for label, dims in sizes])
+
+
+WAIST_82_88 = (("A", {"waist": 81.9}), ("B", {"waist": 82.0}), ("C", {"waist": 88.0}))
+
+
+class RecommendSizeTests(SimpleTestCase):
+    """Bottoms and dresses through recommend_size's ease table."""
+
+    CASES = [
+        # (description, chart, user_cm, expected label)
+        ("waist exactly at minimum ease", chart("jeans", *WAIST_82_88), {"waist": 80}, "B"),
+        ("just under minimum ease skips the closer size", chart("jeans", *WAIST_82_88), {"waist": 80.1}, "C"),
+        ("stretch lowers the ease", chart("jeans", *WAIST_82_88, stretch=True), {"waist": 82}, "B"),
+        ("nothing meets the minimum: closest", chart("jeans", *WAIST_82_88), {"waist": 90}, "C"),
+        ("hip gate", chart("pants", ("A", {"waist": 84, "hip": 95}), ("B", {"waist": 86, "hip": 110})),
+         {"waist": 80, "hip": 100}, "B"),
+        ("inseam from height", chart("pants", ("A", {"waist": 84, "inseam": 76}), ("B", {"waist": 84, "inseam": 80})),
+         {"waist": 80, "height": 175}, "B"),
+        ("given inseam wins over height",
+         chart("pants", ("A", {"waist": 84, "inseam": 76}), ("B", {"waist": 84, "inseam": 80})),
+         {"waist": 80, "inseam": 75, "height": 175}, "A"),
+        ("skirts ignore inseam", chart("skirt", ("A", {"waist": 84, "inseam": 10}), ("B", {"waist": 85, "inseam": 76})),
+         {"waist": 80, "inseam": 76}, "A"),
+        ("sizes without the primary dim are skipped", chart("jeans", ("A", {"hip": 100}), ("B", {"waist": 90})),
+         {"waist": 80}, "B"),
+        ("dress hip gate", chart("dress", ("A", {"chest": 100, "hip": 100}), ("B", {"chest": 104, "hip": 108})),
+         {"chest": 92, "hip": 100}, "B"),
+        ("dress waist is not gated",
+         chart("dress", ("A", {"chest": 100, "waist": 70, "hip": 108}), ("B", {"chest": 110, "waist": 90, "hip": 120})),
+         {"chest": 92, "waist": 80, "hip": 100}, "A"),
+    ]
+
+    def test_cases(self):
+        for description, product, user_cm, expected in self.CASES:
+            with self.subTest(description):
+                self.assertEqual(recommend_size(user_cm, product)[0], expected)
+
+    def test_missing_primary_dim(self):
+        for product, user_cm, dim in (
+            (chart("jeans", *WAIST_82_88), {"hip": 100}, "waist"),
+            (chart("dress", ("A", {"chest": 100, "hip": 100})), {"hip": 100}, "chest"),
+        ):
+            label, blurb = recommend_size(user_cm, product)
+            self.assertIsNone(label)
+            self.assertIn(f"Add your {dim}", blurb)
+
+    def test_fallback_is_noted(self):
+        self.assertIn("No size met minimum ease", recommend_size({"waist": 90}, chart("jeans", *WAIST_82_88))[1])
+        self.assertNotIn("No size met", recommend_size({"waist": 80}, chart("jeans", *WAIST_82_88))[1])
+
+    def test_no_size_data(self):
+        self.assertEqual(recommend_size({"waist": 80}, chart("jeans", ("A", {"hip": 100})))[0], None)
+
+    def test_tops_use_recommend_top_size(self):
+        product = chart("top_woven", ("M", {"chest": 100}), ("L", {"chest": 106}))
+        self.assertEqual(recommend_size({"chest": 95}, product), recommend_top_size({"chest": 95}, product))
+
+
+def random_chart(rng, i, category):
+    sizes = []
+    for j in range(int(rng.integers(1, 7))):
+        dims = {d: (None if rng.random() < 0.15 else round(float(rng.uniform(60, 130)), 1))
+                for d in ("chest", "shoulder", "waist", "hip", "inseam")}
+        sizes.append(SizeRow(label=f"S{j}", **dims))
+    return ProductChart(sku=f"sku{i}", name="", category=category, stretch=bool(rng.random() < 0.5),
+                        units="cm", sizes=sizes)
+
+
+class BatchSizeRecommenderTests(SimpleTestCase):
+    """The vectorized batch path must pick the same size as the scalar recommenders."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        categories = ["top_knit", "top_woven", "shirt", "bottom", "jeans", "skirt", "dress"]
+        self.charts = [random_chart(rng, i, categories[i % len(categories)]) for i in range(40)]
+        users = rng.uniform(60, 190, (300, len(USER_COLUMNS))).round(1)
+        users[rng.random(users.shape) < 0.2] = 0   # unknown, including chest 0
+        self.users = users
+        self.index = compile_charts(self.charts)
+
+    def test_matches_recommend_size(self):
+        fit = recommend_sizes_batch(self.users, self.index)
+        for u, row in enumerate(self.users):
+            user_cm = dict(zip(USER_COLUMNS, row.tolist()))
+            for c, chart in enumerate(self.charts):
+                self.assertEqual(self.index.label(c, fit.size_idx[u, c]), recommend_size(user_cm, chart)[0], (u, c))
+
+    def test_top_batch_matches_recommend_top_size(self):
+        self.users[:5, 0] = 0
+        fit = recommend_top_sizes_batch(self.users[:, :2], self.index)
+        for u, (chest, shoulder) in enumerate(self.users[:, :2].tolist()):
+            for c, chart in enumerate(self.charts):
+                if not self.index.top[c]:
+                    continue
+                expected = recommend_top_size({"chest": chest, "shoulder": shoulder}, chart)[0]
+                self.assertEqual(self.index.label(c, fit.size_idx[u, c]), expected, (u, c))
+
+
+class TryonFormParsingTests(TestCase):
+    """The multipart body is parsed on a worker thread, and CSRF is still enforced after it."""
+
+    def setUp(self):
+        self.client = AsyncClient(enforce_csrf_checks=True)
+        self.parsed_in = []
+        real_load = HttpRequest._load_post_and_files
+
+        def load(request):
+            self.parsed_in.append(threading.current_thread().name)
+            return real_load(request)
+
+        patcher = mock.patch.object(HttpRequest, "_load_post_and_files", load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def post(self, **headers):
+        return await self.client.post("/tryon_api/", {"garment": ""}, secure=True, headers=headers)
+
+    async def test_missing_token_is_rejected(self):
+        response = await self.post()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "CSRF verification failed.")
+
+    async def test_parsed_off_the_sync_thread(self):
+        token = _get_new_csrf_string()
+        self.client.cookies["csrftoken"] = token
+        response = await self.post(X_CSRFToken=token, Origin="https://testserver")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Please attach", response.json()["error"])
+        self.assertEqual(len(self.parsed_in), 1)
+        self.assertTrue(self.parsed_in[0].startswith("asyncio"), self.parsed_in)
@@ -0,0 +1,196 @@
+"""
+Per-stage timing of try-on requests.
+
+A view opens a trace with `with trace("tryon_api") as t:` and returns t.id to
+the client. Code running inside the trace, including asyncio.to_thread
+workers since they copy the context, wraps its stages in `with span("name"):`.
+Outside a trace, span() does nothing. When the trace closes it is appended
+as one JSON line to TRYON_TRACE_FILE:
+
+    {"trace_id", "name", "started_at", "total_ms", "error"?, "spans": [{"name", "start_ms", "ms", ...}]}
+
+It is also observed into the tryon_stage_duration_seconds metric when
+core.metrics is enabled. Writing never blocks the request's event loop:
+export() only queues the line, and a background QueueListener appends it
+through a RotatingFileHandler. That handler caps the file at
+TRYON_TRACE_MAX_BYTES and keeps TRYON_TRACE_BACKUPS old files.
+stage_summary() reads back the tail of the current file as p50/p95 per
+stage. That shows whether time goes to our side (read_form, normalize.*,
+save_outputs) or to the Space (upload.*, remote.queue, remote.inference).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import numpy as np
+from django.conf import settings
+
+from core import metrics
+
+_current = ContextVar("tryon_trace", default=None)
+_writer_lock = threading.Lock()
+_writer = None   # (path, QueueHandler, QueueListener)
+
+
+class Trace:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.attrs = {}
+        self.spans = []
+        self._t0 = time.perf_counter()
+
+    def add(self, name, start, end, **attrs):
+        """Records a span from perf_counter() timestamps."""
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self._t0) * 1e3, 3),
+            "ms": round((end - start) * 1e3, 3),
+            **attrs,
+        })
+
+    def as_dict(self):
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": round((time.perf_counter() - self._t0) * 1e3, 3),
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def trace(name):
+    t = Trace(name)
+    token = _current.set(t)
+    try:
+        yield t
+    except BaseException as e:
+        t.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        export(t.as_dict())
+
+
+@contextmanager
+def span(name, **attrs):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        t.add(name, start, time.perf_counter(), **attrs)
+
+
+def _trace_file():
+    return getattr(settings, "TRYON_TRACE_FILE", None)
+
+
+def _queue_for(path):
+    """The QueueHandler feeding `path`'s writer thread, started on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer[0] != path:
+            if _writer is not None:
+                _writer[2].stop()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            handler = RotatingFileHandler(
+                path, encoding="utf-8", delay=True,
+                maxBytes=getattr(settings, "TRYON_TRACE_MAX_BYTES", 10 * 1024 * 1024),
+                backupCount=getattr(settings, "TRYON_TRACE_BACKUPS", 3),
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            listener = QueueListener(queue.SimpleQueue(), handler)
+            listener.start()
+            _writer = (path, QueueHandler(listener.queue), listener)
+        return _writer[1]
+
+
+def flush():
+    """Waits until every exported trace is on disk."""
+    with _writer_lock:
+        if _writer is not None:
+            _writer[2].stop()    # drains the queue
+            _writer[2].start()
+
+
+@atexit.register
+def _close():
+    with _writer_lock:
+        if _writer is not None:
+            _writer[2].stop()
+
+
+def export(record):
+    if metrics.enabled():
+        for s in record["spans"]:
+            metrics.observe("tryon_stage_duration_seconds", s["ms"] / 1e3, stage=s["name"])
+        metrics.observe("tryon_stage_duration_seconds", record["total_ms"] / 1e3, stage="total")
+    path = _trace_file()
+    if not path:
+        return
+    line = json.dumps(record, separators=(",", ":"))
+    _queue_for(path).handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+
+
+def _tail(path, n, block=64 * 1024):
+    """The last n lines of a file, reading backwards from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos, data = f.tell(), b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return data.decode(errors="replace").splitlines()[-n:]
+
+
+def stage_summary(limit=1000):
+    """{stage: {"count", "p50_ms", "p95_ms", "mean_ms"}} over the last `limit` exported traces."""
+    path = _trace_file()
+    if not path or not os.path.exists(path):
+        return {"traces": 0, "stages": {}}
+    durations = defaultdict(list)
+    n = 0
+    for line in _tail(path, limit):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue   # a line cut short by a crash
+        n += 1
+        durations["total"].append(record["total_ms"])
+        for s in record.get("spans", ()):
+            durations[s["name"]].append(s["ms"])
+    stages = {}
+    for name, values in sorted(durations.items()):
+        v = np.asarray(values)
+        stages[name] = {
+            "count": len(v),
+            "p50_ms": round(float(np.percentile(v, 50)), 1),
+            "p95_ms": round(float(np.percentile(v, 95)), 1),
+            "mean_ms": round(float(v.mean()), 1),
+        }
+    return {"traces": n, "stages": stages}
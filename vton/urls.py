@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import vton_demo, vton_tryon_api
+from .views import tryon_trace_summary, vton_demo, vton_tryon_api
 
 urlpatterns = [
     path("demo/", vton_demo, name="vton_demo"),
     path("tryon_api/", vton_tryon_api, name="tryon_api"),
+    path("tryon_api/traces/", tryon_trace_summary, name="tryon_trace_summary"),
 ]
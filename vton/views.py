@@ -1,39 +1,106 @@
 # vton/views.py
-import json, pathlib, os, tempfile, traceback
+import asyncio, json, pathlib, traceback
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.middleware.csrf import CsrfViewMiddleware
 from django.shortcuts import render
-from .hf_tryon import run_tryon
-from .services.size_recommender import ProductChart, SizeRow, recommend_top_size
-from core.models import UserProfile
-from core.encryption import decrypt
+from django.views.decorators.csrf import csrf_exempt
+from .hf_tryon import arun_tryon
+from .tracing import span, stage_summary, trace
+from .services.size_recommender import ProductChart, SizeRow, recommend_size
+from core.measurements import aget_measurements
+from core.images import aget_profile_photo, check_upload
 from django.http import JsonResponse
 
-def vton_tryon_api(request):
+def _wants_profile_photo(request):
+    return (request.POST.get("use_profile_photo") or "").strip().lower() in ("1", "true", "on")
+
+
+async def _profile_person(request, user):
+    """Storage name of the user's profile photo if they asked to use it, else None."""
+    if not _wants_profile_photo(request):
+        return None
+    photo = await aget_profile_photo(user)
+    return photo["name"] if photo else None
+
+
+_csrf = CsrfViewMiddleware(lambda request: None)
+
+async def _read_form(request):
+    """
+    Parses the multipart body on a worker thread, then runs the CSRF check.
+    Views that call this are csrf_exempt: otherwise CsrfViewMiddleware reads
+    request.POST first, parsing every upload in the one thread all sync
+    middleware shares. Returns the 403 response if the check fails, else None.
+    """
+    with span("read_form"):
+        await asyncio.to_thread(lambda: request.FILES)
+    return _csrf.process_view(request, _read_form, (), {})
+
+
+def _check_uploads(*uploads):
+    """Size/type limits on the raw uploads; returns an error message or None."""
+    try:
+        for upload in uploads:
+            if upload: check_upload(upload)
+    except ValidationError as e:
+        return e.messages[0]
+    return None
+
+
+@csrf_exempt   # checked in _read_form, after the threaded parse
+async def vton_tryon_api(request):
     if request.method != "POST":
         return JsonResponse({"ok": False, "error": "POST required"}, status=405)
 
-    person  = request.FILES.get("person")
-    garment = request.FILES.get("garment")
-    if not (person and garment):
-        return JsonResponse({"ok": False, "error": "Please attach person and garment images."}, status=400)
+    # every stage is traced; the id lets a slow result be looked up in TRYON_TRACE_FILE
+    with trace("tryon_api") as t:
+        payload, status = await _tryon_api(request)
+        t.attrs["status"] = status
+    response = JsonResponse({**payload, "trace_id": t.id}, status=status)
+    response["X-Trace-Id"] = t.id
+    return response
 
-    def save_tmp(fobj):
-        suffix = pathlib.Path(fobj.name).suffix or ".png"
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        for chunk in fobj.chunks(): tmp.write(chunk)
-        tmp.flush(); tmp.close()
-        return tmp.name
 
-    p_path = save_tmp(person); g_path = save_tmp(garment)
+async def _tryon_api(request):
+    if await _read_form(request) is not None:
+        return {"ok": False, "error": "CSRF verification failed."}, 403
+    user = await request.auser()
+    person  = request.FILES.get("person")
+    garment = request.FILES.get("garment")
+    # "use my profile photo": reuse the stored, pre-normalized photo instead of an upload
+    stored = await _profile_person(request, user) if not person else None
+    if _wants_profile_photo(request) and not (person or stored):
+        return {"ok": False, "error": "No profile photo on file; please upload a person image."}, 400
+    if not ((person or stored) and garment):
+        return {"ok": False, "error": "Please attach person and garment images."}, 400
+
+    error = _check_uploads(person, garment)
+    if error:
+        return {"ok": False, "error": error}, 400
+
+    # uploads go straight to normalization (Django's temp file or memory, no copy)
     try:
-        out_url, _mask_url = run_tryon(p_path, g_path)
-        return JsonResponse({"ok": True, "out_url": out_url})
+        out_url, _mask_url = await arun_tryon(person, garment, human_stored=stored)
+        return {"ok": True, "out_url": out_url}, 200
+    except ValidationError as e:
+        return {"ok": False, "error": e.messages[0]}, 400
     except Exception as e:
         print("TRY-ON ERROR:", e); print(traceback.format_exc())
-        return JsonResponse({"ok": False, "error": str(e)}, status=500)
-    finally:
-        for p in (p_path, g_path):
-            try: os.remove(p)
-            except: pass
+        return {"ok": False, "error": str(e)}, 500
+
+
+def tryon_trace_summary(request):
+    """p50/p95 per try-on stage over the last `limit` traces (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"ok": False, "error": "Staff only"}, status=403)
+    try:
+        limit = int(request.GET.get("limit", 1000))
+    except ValueError:
+        limit = 1000
+    # the file is capped anyway (TRYON_TRACE_MAX_BYTES); this bounds one request's read
+    limit = max(1, min(limit, 10000))
+    return JsonResponse({"ok": True, **stage_summary(limit)})
 
 
 
@@ -59,36 +126,23 @@ def load_charts():
     return _CHARTS
 
 
-def vton_demo(request):
+@csrf_exempt   # checked in _read_form, after the threaded parse
+async def vton_demo(request):
     ctx = {}
     charts = load_charts()
-    
-    profile_data_avaliable = False
-    try:
-        user = request.user 
-        print("Existing profile found")
-        profile_data_avaliable = True
-    except UserProfile.DoesNotExist:
-        print("Profile not found")
-        profile_data_avaliable = False
-        
-    if profile_data_avaliable and request.user.is_authenticated:
-        profile = UserProfile.objects.get(user=user)
-        chest = profile.chest
-        chest = decrypt(chest)
-        waist = profile.waist_circumference
-        waist = decrypt(waist)
-        hip = profile.hip_circumference
-        hip = decrypt(hip)
-        inseam = profile.Inseam_length
-        inseam = decrypt(inseam)
-        height = profile.height
-        height = decrypt(height)
-        weight = profile.weight
-        weight = decrypt(weight)
+    user = await request.auser()
 
+    # decoded profile measurements, cached per user (see core.measurements)
+    measurements = await aget_measurements(user) or {}
+    # profile form collects inches; the fit engine works in cm
+    profile_cm = {
+        key: measurements[key] * 2.54
+        for key in ("waist", "hip", "inseam", "height") if measurements.get(key)
+    }
 
     if request.method == "POST":
+        if (rejected := await _read_form(request)) is not None:
+            return rejected
         action   = (request.POST.get("action") or "").strip().lower()
         company  = (request.POST.get("company") or "").strip().lower()
         product  = (request.POST.get("product_id") or "").strip()
@@ -98,6 +152,7 @@ def vton_demo(request):
             try: return float(val)
             except Exception: return default
         user_cm = {
+            **profile_cm,
             "chest": _float_or(request.POST.get("chest"), 92.0),
             "shoulder": _float_or(request.POST.get("shoulder"), 42.0),
         }
@@ -105,36 +160,32 @@ def vton_demo(request):
         person  = request.FILES.get("person")
         garment = request.FILES.get("garment")
 
-        def save_tmp(fobj):
-            suffix = pathlib.Path(fobj.name).suffix or ".png"
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-            for chunk in fobj.chunks(): tmp.write(chunk)
-            tmp.flush(); tmp.close()
-            return tmp.name
+        stored = await _profile_person(request, user) if not person else None
 
         # ---- Try-On path ----
         if action == "tryon" or (person and garment):
-            if not (person and garment):
+            if not ((person or stored) and garment):
                 ctx["error"] = "Please add a person image and a garment image, then click Try On."
+            elif error := _check_uploads(person, garment):
+                ctx["error"] = error
             else:
-                p_path = save_tmp(person); g_path = save_tmp(garment)
-                try:
-                    out_url, _mask_url = run_tryon(p_path, g_path)
-                    ctx["out_url"] = out_url
-                except Exception as e:
-                    print("TRY-ON ERROR:", e)
-                    print(traceback.format_exc())
-                    ctx["error"] = f"Try-on failed: {e}"
-                finally:
-                    for p in (p_path, g_path):
-                        try: os.remove(p)
-                        except: pass
+                with trace("tryon_demo") as t:
+                    try:
+                        out_url, _mask_url = await arun_tryon(person, garment, human_stored=stored)
+                        ctx["out_url"] = out_url
+                    except ValidationError as e:
+                        ctx["error"] = e.messages[0]
+                    except Exception as e:
+                        print("TRY-ON ERROR:", e)
+                        print(traceback.format_exc())
+                        ctx["error"] = f"Try-on failed: {e}"
+                ctx["trace_id"] = t.id
 
         # ---- Size-check path ----
         elif action == "check_size":
             chart = charts.get((company, product))
             if chart:
-                size_label, blurb = recommend_top_size(user_cm, chart)
+                size_label, blurb = recommend_size(user_cm, chart)
                 ctx["size_blurb"] = f"We recommend size {size_label}. {blurb}" if size_label else blurb
             else:
                 ctx["size_blurb"] = (
@@ -150,6 +201,8 @@ def vton_demo(request):
             "shoulder": user_cm["shoulder"],
         })
 
+    ctx["profile_photo"] = await aget_profile_photo(user)
     ctx["companies"] = ["Uniqlo"]
     ctx["demo_product_hint"] = "12345"
-    return render(request, "vton_demo.html", ctx)
+    # the auth context processor touches request.user, which is a sync ORM lookup
+    return await sync_to_async(render)(request, "vton_demo.html", ctx)